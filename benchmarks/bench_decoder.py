@@ -0,0 +1,38 @@
+"""
+Measures ReadDecoder time for stanzas of growing size. Decode cost should grow
+linearly with the stanza, i.e. the per-KB column should stay roughly flat.
+
+    python benchmarks/bench_decoder.py
+"""
+import timeit
+
+from yowsup.layers.coder.decoder import ReadDecoder
+from yowsup.layers.coder.encoder import WriteEncoder
+from yowsup.layers.coder.tokendictionary import TokenDictionary
+from yowsup.structs import ProtocolTreeNode
+
+
+def buildStanza(children):
+    return ProtocolTreeNode("iq", {"id": "1", "type": "result", "from": "s.whatsapp.net"}, [
+        ProtocolTreeNode("message", {"from": "%d@s.whatsapp.net" % (491234567 + i), "id": "m%d" % i, "t": "1500000000"},
+                         [ProtocolTreeNode("body", data="x" * 200)])
+        for i in range(0, children)
+    ])
+
+
+def main():
+    tokenDictionary = TokenDictionary()
+    encoder = WriteEncoder(tokenDictionary)
+    decoder = ReadDecoder(tokenDictionary)
+    decoder.streamStarted = True
+
+    print("%10s %12s %12s" % ("bytes", "ms/decode", "us/KB"))
+    for children in (10, 100, 1000, 5000):
+        data = bytearray(encoder.protocolTreeNodeToBytes(buildStanza(children)))
+        runs = max(1, 2000 // children)
+        elapsed = timeit.timeit(lambda: decoder.getProtocolTreeNode(data), number=runs) / runs
+        print("%10d %12.3f %12.2f" % (len(data), elapsed * 1000, elapsed * 1e6 / (len(data) / 1024.0)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Compares the legacy list output of WriteEncoder with the bytearray path used by
+YowCoderLayer for a text message and a media-sized payload.
+
+    python benchmarks/bench_encoder.py
+"""
+import timeit
+
+from yowsup.layers.coder.encoder import WriteEncoder
+from yowsup.layers.coder.tokendictionary import TokenDictionary
+from yowsup.structs import ProtocolTreeNode
+
+
+def buildMessage(payloadSize):
+    return ProtocolTreeNode("message", {"to": "491234567890@s.whatsapp.net", "type": "text", "id": "1500000000-1"}, [
+        ProtocolTreeNode("enc", {"v": "2", "type": "msg"}, data=b"\x01" * payloadSize)
+    ])
+
+
+def main():
+    encoder = WriteEncoder(TokenDictionary())
+    print("%10s %14s %14s" % ("payload", "list us/op", "bytearray us/op"))
+    for payloadSize in (64, 4096, 65536):
+        node = buildMessage(payloadSize)
+        runs = 200000 // (payloadSize // 64 + 50)
+        legacy = timeit.timeit(lambda: bytearray(encoder.protocolTreeNodeToBytes(node)), number=runs) / runs
+        direct = timeit.timeit(lambda: encoder.protocolTreeNodeToBytearray(node), number=runs) / runs
+        print("%10d %14.2f %14.2f" % (payloadSize, legacy * 1e6, direct * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Measures how many outgoing message entities can be constructed per second.
+
+    python benchmarks/bench_entities.py
+"""
+import timeit
+
+from yowsup.layers.protocol_messages.protocolentities import TextMessageProtocolEntity, \
+    ImageMessageProtocolEntity
+
+
+def buildText():
+    return TextMessageProtocolEntity(text="hello", destination="491234567890@s.whatsapp.net")
+
+
+def buildImage():
+    return ImageMessageProtocolEntity(destination="491234567890@s.whatsapp.net", url="https://mmg.whatsapp.net/x",
+                                      mimetype="image/jpeg", file_length=1024, height=100, width=100,
+                                      caption="hi")
+
+
+def main():
+    print("%10s %14s" % ("entity", "entities/s"))
+    for name, build in (("text", buildText), ("image", buildImage)):
+        runs = 5000
+        elapsed = timeit.timeit(build, number=runs)
+        print("%10s %14.0f" % (name, runs / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Simulates a reconnect storm: every account derives its login keys, then does so again on reconnect
+with the same stored nonce, which is served from the KeyStream cache.
+
+    python benchmarks/bench_keyderivation.py
+"""
+import os
+import time
+
+from yowsup.layers.auth.keystream import KeyStream
+
+ACCOUNTS = 2000
+
+
+def main():
+    accounts = [(os.urandom(20), os.urandom(20)) for _ in range(0, ACCOUNTS)]
+    print("%12s %10s %12s" % ("login", "accounts", "us/login"))
+    for name in ("first", "reconnect"):
+        start = time.time()
+        for password, nonce in accounts:
+            KeyStream.generateKeys(password, nonce)
+        elapsed = time.time() - start
+        print("%12s %10d %12.2f" % (name, ACCOUNTS, elapsed * 1e6 / ACCOUNTS))
+
+
+if __name__ == "__main__":
+    main()
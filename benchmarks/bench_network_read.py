@@ -0,0 +1,59 @@
+"""
+Reads a 16 MB burst of small frames through an asyncore YowNetworkLayer into the stanza regulator,
+with fixed 1 KB recv() calls and with recv_into an adaptively sized reusable buffer.
+
+    python benchmarks/bench_network_read.py
+"""
+import socket
+import threading
+import time
+
+from yowsup.layers import YowLayer, YowLayerEvent
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.stanzaregulator import YowStanzaRegulator
+from yowsup.stacks import YowStack
+
+BURST = 16 << 20
+
+
+class CountingLayer(YowLayer):
+    frames = 0
+
+    def receive(self, data):
+        self.frames += 1
+
+
+def run(readInto):
+    stack = YowStack((YowNetworkLayer, YowStanzaRegulator, CountingLayer), reversed=False)
+    stack.setProp(YowNetworkLayer.PROP_NET_READ_INTO, readInto)
+    network = stack.getLayer(0)
+    sock, peer = socket.socketpair()
+    network.set_socket(sock)
+    network.connected = True
+    network.state = YowNetworkLayer.STATE_CONNECTED
+    network.emitEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_CONNECTED))
+
+    frame = b"\x00\x00\xc8" + b"x" * 200
+    writer = threading.Thread(target=peer.sendall, args=(frame * (BURST // len(frame)),))
+    writer.start()
+    reads = 0
+    start = time.time()
+    while stack.getLayer(2).frames < BURST // len(frame):
+        network.handle_read()
+        reads += 1
+    elapsed = time.time() - start
+    writer.join()
+    sock.close()
+    peer.close()
+    return BURST / elapsed / (1 << 20), reads
+
+
+def main():
+    print("%10s %10s %10s" % ("mode", "MB/s", "reads"))
+    for name, readInto in (("recv", False), ("recv_into", True)):
+        throughput, reads = run(readInto)
+        print("%10s %10.1f %10d" % (name, throughput, reads))
+
+
+if __name__ == "__main__":
+    main()
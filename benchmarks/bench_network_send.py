@@ -0,0 +1,103 @@
+"""
+Queues frames on an asyncore YowNetworkLayer whose peer does not read, so everything past the socket
+buffer waits in the send queue. With the former out_buffer concatenation the cost per frame grew with
+the queue; it should now stay flat. Also counts socket writes while the peer drains the queue, and
+when it keeps up: frames sent within a loop iteration used to be written one sendmsg each, they are now
+written by one handle_write.
+
+    python benchmarks/bench_network_send.py
+"""
+import socket
+import time
+
+from yowsup.layers.network import YowNetworkLayer
+
+
+class CountingSocket(object):
+    def __init__(self, sock):
+        self.sock = sock
+        self.calls = 0
+
+    def sendmsg(self, buffers):
+        self.calls += 1
+        return self.sock.sendmsg(buffers)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def run(frames, frameSize=512):
+    layer = YowNetworkLayer()
+    sock, peer = socket.socketpair()
+    sock.setblocking(False)
+    layer.set_socket(sock)
+    counting = CountingSocket(sock)
+    layer.socket = counting
+    layer.connected = True
+
+    data = bytearray(frameSize)
+    start = time.time()
+    for _ in range(0, frames):
+        layer.send(data)
+    enqueued = time.time() - start
+
+    counting.calls = 0
+    while layer.writable():
+        layer.handle_write()
+        peer.recv(1 << 20)
+    sock.close()
+    peer.close()
+    return enqueued * 1e6 / frames, counting.calls
+
+
+def runTicks(framesPerTick, perFrame, ticks=2000, frameSize=512):
+    """
+    :param perFrame: write every frame as it is sent, as before, instead of once per loop iteration
+    :return: (us per frame, sendmsg calls per frame)
+    """
+    layer = YowNetworkLayer()
+    sock, peer = socket.socketpair()
+    sock.setblocking(False)
+    peer.setblocking(False)
+    layer.set_socket(sock)
+    counting = CountingSocket(sock)
+    layer.socket = counting
+    layer.connected = True
+
+    data = bytearray(frameSize)
+    start = time.time()
+    for _ in range(0, ticks):
+        for _ in range(0, framesPerTick):
+            layer.send(data)
+            if perFrame:
+                layer.initiate_send()
+        if layer.writable():
+            layer.handle_write()
+        try:
+            while peer.recv(1 << 20):
+                pass
+        except BlockingIOError:
+            pass
+    elapsed = time.time() - start
+    sock.close()
+    peer.close()
+    frames = ticks * framesPerTick
+    return elapsed * 1e6 / frames, counting.calls / float(frames)
+
+
+def main():
+    print("%10s %14s %16s" % ("frames", "us/send", "drain sendmsg()s"))
+    for frames in (1000, 10000, 100000):
+        perFrame, calls = run(frames)
+        print("%10d %14.2f %16d" % (frames, perFrame, calls))
+
+    print("")
+    print("%11s %10s %14s %16s" % ("frames/tick", "writes", "us/frame", "sendmsg()/frame"))
+    for framesPerTick in (1, 8, 64):
+        for name, perFrame in (("per frame", True), ("per tick", False)):
+            usPerFrame, calls = runTicks(framesPerTick, perFrame)
+            print("%11d %10s %14.2f %16.3f" % (framesPerTick, name, usPerFrame, calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Measures memory held by 10k decoded message stanzas waiting in a queue, compared to nodes
+that each carry a __dict__ and their own empty {} / [] (the former ProtocolTreeNode layout).
+
+    python benchmarks/bench_nodes_memory.py
+"""
+import tracemalloc
+
+from yowsup.layers.coder.decoder import ReadDecoder
+from yowsup.layers.coder.encoder import WriteEncoder
+from yowsup.layers.coder.tokendictionary import TokenDictionary
+from yowsup.structs import ProtocolTreeNode
+
+COUNT = 10000
+
+
+class DictProtocolTreeNode(object):
+    def __init__(self, tag, attributes=None, children=None, data=None):
+        self.tag = tag
+        self.attributes = attributes or {}
+        self.children = children or []
+        self.data = data
+
+
+def buildMessage(i):
+    return ProtocolTreeNode("message", {"from": "%d@s.whatsapp.net" % (491234567 + i), "id": "m%d" % i,
+                                        "type": "text", "t": "1500000000"}, [
+        ProtocolTreeNode("enc", {"v": "2", "type": "msg"}, data="x" * 40),
+        ProtocolTreeNode("multicast"),
+        ProtocolTreeNode("meta")
+    ])
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    queue = [build(i) for i in range(0, COUNT)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del queue
+    return after - before
+
+
+def main():
+    tokenDictionary = TokenDictionary()
+    encoder = WriteEncoder(tokenDictionary)
+    decoder = ReadDecoder(tokenDictionary)
+    decoder.streamStarted = True
+    stanzas = [bytearray(encoder.protocolTreeNodeToBytes(buildMessage(i))) for i in range(0, COUNT)]
+
+    def toDictNode(node):
+        return DictProtocolTreeNode(node.tag, dict(node.attributes), [toDictNode(c) for c in node.children],
+                                    node.data)
+
+    legacyBytes = measure(lambda i: toDictNode(decoder.getProtocolTreeNode(stanzas[i])))
+    slottedBytes = measure(lambda i: decoder.getProtocolTreeNode(stanzas[i]))
+
+    print("%16s %14s %14s" % ("layout", "bytes/10k", "bytes/stanza"))
+    print("%16s %14d %14d" % ("dict", legacyBytes, legacyBytes // COUNT))
+    print("%16s %14d %14d" % ("slots", slottedBytes, slottedBytes // COUNT))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Measures YowParallelLayer dispatch of inbound stanzas over the default protocol layers.
+"dispatch" uses a tag no layer handles, so it is the routing cost alone.
+
+    python benchmarks/bench_parallel.py
+"""
+import timeit
+
+from yowsup.layers import YowParallelLayer
+from yowsup.stacks import YowStack, YowStackBuilder
+from yowsup.structs import ProtocolTreeNode
+
+
+def main():
+    stack = YowStack((YowParallelLayer(YowStackBuilder.getProtocolLayers()),), reversed=False)
+    layer = stack.getLayer(0)
+    nodes = (
+        ("receipt", ProtocolTreeNode("receipt", {"from": "491234567890@s.whatsapp.net", "id": "1", "t": "1500000000"})),
+        ("ack", ProtocolTreeNode("ack", {"from": "491234567890@s.whatsapp.net", "id": "1", "class": "message",
+                                         "t": "1500000000"})),
+        ("dispatch", ProtocolTreeNode("unhandled", {"id": "1"})),
+    )
+    print("%10s %12s" % ("stanza", "us/receive"))
+    for name, node in nodes:
+        runs = 50000
+        elapsed = timeit.timeit(lambda: layer.receive(node), number=runs) / runs
+        print("%10s %12.2f" % (name, elapsed * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Measures the per stanza cost of going through the default core and protocol layers of a stack, logging at INFO:
+"send" hands a text message entity from the top of the stack down to the socket, "receive" hands an ack node
+decoded by the coder up to the top.
+
+    python benchmarks/bench_pipeline.py
+"""
+import logging
+import timeit
+
+from yowsup.layers import YowLayer, YowParallelLayer
+from yowsup.layers.auth import YowCryptLayer
+from yowsup.layers.coder import YowCoderLayer
+from yowsup.layers.logger import YowLoggerLayer
+from yowsup.layers.protocol_messages.protocolentities import TextMessageProtocolEntity
+from yowsup.layers.stanzaregulator import YowStanzaRegulator
+from yowsup.stacks import YowStack, YowStackBuilder
+from yowsup.structs import ProtocolTreeNode
+
+
+class SinkLayer(YowLayer):
+    def send(self, data):
+        pass
+
+
+class TopLayer(YowLayer):
+    def receive(self, data):
+        pass
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    stack = YowStack((SinkLayer, YowStanzaRegulator, YowCryptLayer, YowCoderLayer, YowLoggerLayer,
+                      YowParallelLayer(YowStackBuilder.getProtocolLayers()), TopLayer), reversed=False)
+    top = stack.getLayer(6)
+    coder = stack.getLayer(3)
+    message = TextMessageProtocolEntity(text="hello", destination="491234567890@s.whatsapp.net")
+    ack = ProtocolTreeNode("ack", {"from": "491234567890@s.whatsapp.net", "id": "1", "class": "message",
+                                   "t": "1500000000"})
+    runs = 20000
+    print("%10s %12s" % ("path", "us/stanza"))
+    for name, fn in (("send", lambda: top.toLower(message)), ("receive", lambda: coder.toUpper(ack))):
+        elapsed = min(timeit.repeat(fn, number=runs, repeat=3)) / runs
+        print("%10s %12.2f" % (name, elapsed * 1e6))
+
+
+if __name__ == "__main__":
+    main()
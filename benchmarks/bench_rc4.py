@@ -0,0 +1,29 @@
+"""
+Measures KeyStream RC4 throughput for the pycryptodome engine (when installed) and the pure python one.
+
+    python benchmarks/bench_rc4.py
+"""
+import os
+import timeit
+
+from yowsup.layers.auth.keystream import RC4, ARC4
+
+
+def main():
+    key = os.urandom(20)
+    engines = [("python", False)]
+    if ARC4 is not None:
+        engines.insert(0, ("pycryptodome", True))
+
+    print("%14s %10s %10s" % ("engine", "payload", "MB/s"))
+    for name, native in engines:
+        rc4 = RC4(key, 0x300, native=native)
+        for payloadSize in (64, 1024, 65536):
+            data = bytearray(os.urandom(payloadSize))
+            runs = max(10, (4 << 20 if native else 1 << 20) // payloadSize)
+            elapsed = timeit.timeit(lambda: rc4.cipher(data, 0, payloadSize), number=runs)
+            print("%14s %10d %10.2f" % (name, payloadSize, payloadSize * runs / elapsed / (1 << 20)))
+
+
+if __name__ == "__main__":
+    main()
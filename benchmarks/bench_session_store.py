@@ -0,0 +1,41 @@
+"""
+Measures what the session store costs an encrypted 1:1 message: a loadSession followed by a storeSession,
+like SessionCipher does, with sessions read and written straight from sqlite and through the session cache.
+
+    PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=python python benchmarks/bench_session_store.py
+"""
+import os
+import shutil
+import tempfile
+import timeit
+
+from axolotl.state.sessionrecord import SessionRecord
+
+from yowsup.layers.axolotl.store.sqlite.liteaxolotlstore import LiteAxolotlStore
+
+
+def main():
+    tmpDir = tempfile.mkdtemp()
+    try:
+        runs = 2000
+        recipients = 16
+        print("%10s %12s" % ("sessions", "us/message"))
+        for name, cacheSize in (("sqlite", 0), ("cached", 1024)):
+            store = LiteAxolotlStore(os.path.join(tmpDir, "%s.db" % name), sessionCacheSize=cacheSize)
+            for recipientId in range(0, recipients):
+                store.storeSession(recipientId, 1, SessionRecord())
+            counter = iter(range(0, runs * 3))
+
+            def message():
+                recipientId = next(counter) % recipients
+                store.storeSession(recipientId, 1, store.loadSession(recipientId, 1))
+
+            elapsed = min(timeit.repeat(message, number=runs, repeat=3)) / runs
+            store.flush()
+            print("%10s %12.2f" % (name, elapsed * 1e6))
+    finally:
+        shutil.rmtree(tmpDir)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,8 @@ import sys
 deps = ['python-dateutil', 'argparse', 'python-axolotl>=0.1.39', 'six', 'requests', 'preview-generator', 'audioread',
         'protobuf', 'Crypto']
 
-if sys.version_info < (3,0):
-    print("Python2 is not supported!")
+if sys.version_info < (3,7):
+    print("Python 3.7 or newer is required!")
     sys.exit()
 if platform.system().lower() == "windows":
     deps.append('pyreadline')
@@ -27,6 +27,7 @@ setup(
     author='Tarek Galal, AragurDEV',
     tests_require=[],
     install_requires = deps,
+    python_requires='>=3.7',
     dependency_links = ['https://github.com/AragurDEV/python-axolotl/tarball/master'],
     scripts = ['yowsup-cli'],
     #cmdclass={'test': PyTest},
@@ -40,6 +41,7 @@ setup(
     #test_suite='',
     classifiers = [
         'Programming Language :: Python',
+        'Programming Language :: Python :: 3 :: Only',
         'Development Status :: 4 - Beta',
         'Natural Language :: English',
         'Intended Audience :: Developers',
@@ -82,6 +82,11 @@ class HttpProxyHandler:
         pass
 
     def connect(self, socket, pair):
+        self.state = 'connect'
+        self.data = self.getConnectRequest(pair)
+        socket.connect(self.proxy.address)
+
+    def getConnectRequest(self, pair):
         proxy = self.proxy
         authHeader = None
         if proxy.username and proxy.password:
@@ -93,9 +98,7 @@ class HttpProxyHandler:
         if authHeader:
             data += authHeader
         data += b'\r\n'
-        self.state = 'connect'
-        self.data = data
-        socket.connect(proxy.address)
+        return data
 
     def send(self, socket):
         if self.state == 'connect':
@@ -106,9 +109,13 @@ class HttpProxyHandler:
         if self.state == 'sent':
             data = socket.recv(size)
             data = data.decode('ascii')
-            status = data.split(' ', 2)
-            if status[1] != '200':
-                raise Exception('%s' % (data[:data.index('\r\n')]))
+            self.checkConnectResponse(data)
             self.state = 'end'
             self.onConnect()
             return data
+
+    @staticmethod
+    def checkConnectResponse(data):
+        status = data.split(' ', 2)
+        if len(status) < 2 or status[1] != '200':
+            raise Exception('%s' % (data[:data.index('\r\n')] if '\r\n' in data else data))
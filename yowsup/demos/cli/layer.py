@@ -589,7 +589,7 @@ class YowsupCliLayer(Cli, YowInterfaceLayer):
             mediaUploader = MediaUploader(jid, self.getOwnJid(), filePath,
                                           resultRequestUploadIqProtocolEntity.getUrl(),
                                           resultRequestUploadIqProtocolEntity.getResumeOffset(),
-                                          successFn, self.onUploadError, self.onUploadProgress, async=False)
+                                          successFn, self.onUploadError, self.onUploadProgress, async_=False)
             mediaUploader.start()
 
     def onRequestUploadError(self, jid, path, errorRequestUploadIqProtocolEntity, requestUploadIqProtocolEntity):
@@ -1,13 +1,11 @@
 # -*- coding utf-8 -*-
 
+import collections
 import inspect
-import threading
+import logging
 import unittest
 
-try:
-    import Queue
-except ImportError:
-    import queue as Queue
+from yowsup.structs import ProtocolTreeNode
 
 
 class YowLayerEvent:
@@ -41,8 +39,9 @@ class EventCallback(object):
 class YowLayer(object):
     __upper = None
     __lower = None
-    _props = {}
-    __detachedQueue = Queue.Queue()
+    # what toUpper/toLower hand data to, set up by setLayers and by YowStack.compile
+    __upperReceive = None
+    __lowerSend = None
 
     # def __init__(self, upperLayer, lowerLayer):
     #     self.setLayers(upperLayer, lowerLayer)
@@ -52,7 +51,6 @@ class YowLayer(object):
         self.interface = None
         self.event_callbacks = {}
         self.__stack = None
-        self.lock = threading.Lock()
         members = inspect.getmembers(self, predicate=inspect.ismethod)
         for m in members:
             if hasattr(m[1], "event_callback"):
@@ -72,6 +70,23 @@ class YowLayer(object):
     def setLayers(self, upper, lower):
         self.__upper = upper
         self.__lower = lower
+        self.setTargets(upper.receive if upper else None, lower.send if lower else None)
+
+    def setTargets(self, upperReceive, lowerSend):
+        """
+        :param upperReceive: callable toUpper hands data to, None to drop it
+        :param lowerSend: callable toLower hands data to, None to drop it
+        """
+        self.__upperReceive = upperReceive
+        self.__lowerSend = lowerSend
+
+    def isTransparent(self, method):
+        """
+        Transparent layers pass what they get through "send" or "receive" on untouched, the stack leaves them
+        out of the path data takes in that direction. By default layers that don't override the method are.
+        :param method: "send" or "receive"
+        """
+        return method not in self.__dict__ and getattr(type(self), method) is getattr(YowLayer, method)
 
     def send(self, data):
         self.toLower(data)
@@ -80,14 +95,16 @@ class YowLayer(object):
         self.toUpper(data)
 
     def toUpper(self, data):
-        if self.__upper:
-            self.__upper.receive(data)
+        if self.__upperReceive:
+            self.__upperReceive(data)
 
     def toLower(self, data):
-        self.lock.acquire()
-        if self.__lower:
-            self.__lower.send(data)
-        self.lock.release()
+        if self.__lowerSend:
+            if self.__stack is None or self.__stack.isLoopThread():
+                self.__lowerSend(data)
+            else:
+                # sent from another thread, handed to the stack's loop thread so layers don't need locking
+                self.__stack.execInLoop(self.__lowerSend, data)
 
     def emitEvent(self, yowLayerEvent):
         if self.__upper and not self.__upper.onEvent(yowLayerEvent):
@@ -121,11 +138,156 @@ class YowLayer(object):
         return self.getStack().setProp(key, val)
 
 
+class YowIqRegistry(object):
+    """
+    Iqs a layer sent and awaits the result of. An iq without a result within its timeout, or still pending
+    when the connection is lost, fails with an error iq of code CODE_TIMEOUT or CODE_DISCONNECTED handed
+    to its error callback. With maxPending iqs outstanding, further iqs are held back until results come in,
+    up to maxWaiting of them: beyond that they fail right away with CODE_OVERLOADED, telling the caller to
+    slow down.
+    """
+
+    # seconds an iq waits for its result, 0 to wait forever
+    PROP_IQ_TIMEOUT = "org.openwhatsapp.yowsup.prop.iq.timeout"
+    # max iqs awaiting their result per layer, 0 for no limit
+    PROP_IQ_MAX_PENDING = "org.openwhatsapp.yowsup.prop.iq.maxPending"
+    # max iqs held back by maxPending per layer, 0 for no limit
+    PROP_IQ_MAX_WAITING = "org.openwhatsapp.yowsup.prop.iq.maxWaiting"
+
+    CODE_TIMEOUT = "408"
+    CODE_OVERLOADED = "429"
+    CODE_DISCONNECTED = "503"
+
+    def __init__(self, layer, toError=None):
+        """
+        :param layer: owning layer, its stack runs the timers and provides the props
+        :param toError: builds what the error callbacks get from an error iq node, the node itself if omitted
+        """
+        self.layer = layer
+        self.toError = toError
+        # not a module level logger, the yowsup.layers.logger package would shadow it
+        self.__logger = logging.getLogger(__name__)
+        # iq id -> (iq, onSuccess, onError, timer)
+        self.pending = {}
+        # (iq, onSuccess, onError, send) held back by maxPending
+        self.waiting = collections.deque()
+        # iq id -> layer, shared by all sublayers of a YowParallelLayer so it can route iq results
+        self.index = None
+
+    def __contains__(self, iqId):
+        return iqId in self.pending
+
+    def __len__(self):
+        return len(self.pending)
+
+    def getProp(self, key, default):
+        stack = self.layer.getStack()
+        return stack.getProp(key, default) if stack is not None else default
+
+    def add(self, iqEntity, onSuccess, onError, send):
+        """
+        Sends the iq with send(iqEntity), right away or once fewer than maxPending iqs await their result
+        """
+        stack = self.layer.getStack()
+        if stack is not None and not stack.isLoopThread():
+            stack.execInLoop(self.add, iqEntity, onSuccess, onError, send)
+            return
+        maxPending = self.getProp(self.__class__.PROP_IQ_MAX_PENDING, 1024)
+        if self.waiting or (maxPending and len(self.pending) >= maxPending):
+            maxWaiting = self.getProp(self.__class__.PROP_IQ_MAX_WAITING, 4096)
+            if maxWaiting and len(self.waiting) >= maxWaiting:
+                self.__logger.warning("%s iqs held back already, dropping iq %s" % (len(self.waiting),
+                                                                                   iqEntity.getId()))
+                self.fail((iqEntity, onSuccess, onError), self.__class__.CODE_OVERLOADED, "overloaded")
+                return
+            self.__logger.debug("%s iqs pending, holding back iq %s" % (len(self.pending), iqEntity.getId()))
+            self.waiting.append((iqEntity, onSuccess, onError, send))
+        else:
+            self.register(iqEntity, onSuccess, onError)
+            send(iqEntity)
+
+    def register(self, iqEntity, onSuccess, onError):
+        iqId = iqEntity.getId()
+        timeout = self.getProp(self.__class__.PROP_IQ_TIMEOUT, 60)
+        stack = self.layer.getStack()
+        timer = stack.callLater(timeout, self.expire, iqId) if timeout and stack is not None else None
+        self.pending[iqId] = (iqEntity, onSuccess, onError, timer)
+        if self.index is not None:
+            self.index[iqId] = self.layer
+
+    def pop(self, iqId):
+        """
+        :return: (iq, onSuccess, onError), None if the iq isn't pending
+        """
+        if iqId not in self.pending:
+            return None
+        iqEntity, onSuccess, onError, timer = self.pending.pop(iqId)
+        if timer is not None:
+            timer.cancel()
+        if self.index is not None:
+            self.index.pop(iqId, None)
+        self.flush()
+        return iqEntity, onSuccess, onError
+
+    def flush(self):
+        maxPending = self.getProp(self.__class__.PROP_IQ_MAX_PENDING, 1024)
+        while self.waiting and (not maxPending or len(self.pending) < maxPending):
+            iqEntity, onSuccess, onError, send = self.waiting.popleft()
+            self.register(iqEntity, onSuccess, onError)
+            send(iqEntity)
+
+    def expire(self, iqId):
+        entry = self.pop(iqId)
+        if entry is not None:
+            self.__logger.warning("Iq %s timed out" % iqId)
+            self.fail(entry, self.__class__.CODE_TIMEOUT, "timeout")
+
+    def clear(self):
+        """
+        Fails all pending and held back iqs, the connection they were sent on is gone
+        """
+        entries = [entry[:3] for entry in self.pending.values()] + [entry[:3] for entry in self.waiting]
+        for _, _, _, timer in self.pending.values():
+            if timer is not None:
+                timer.cancel()
+        if self.index is not None:
+            for iqId in self.pending:
+                self.index.pop(iqId, None)
+        self.pending.clear()
+        self.waiting.clear()
+        for entry in entries:
+            self.fail(entry, self.__class__.CODE_DISCONNECTED, "disconnected")
+
+    def fail(self, entry, code, text):
+        iqEntity, _, onError = entry
+        if onError:
+            to = iqEntity.getTo() if hasattr(iqEntity, "getTo") else None
+            error = ProtocolTreeNode("iq", {"id": iqEntity.getId(), "type": "error", "from": to or "s.whatsapp.net"},
+                                     [ProtocolTreeNode("error", {"code": code, "text": text})])
+            onError(self.toError(error) if self.toError else error, iqEntity)
+
+
 class YowProtocolLayer(YowLayer):
+    # YowNetworkLayer.EVENT_STATE_DISCONNECTED, the network layer imports this module
+    EVENT_DISCONNECTED = "org.openwhatsapp.yowsup.event.network.disconnected"
+
     def __init__(self, handleMap=None):
         super(YowProtocolLayer, self).__init__()
         self.handleMap = handleMap or {}
-        self.iqRegistry = {}
+        self.iqRegistry = YowIqRegistry(self)
+
+    @property
+    def iqIndex(self):
+        return self.iqRegistry.index
+
+    @iqIndex.setter
+    def iqIndex(self, iqIndex):
+        self.iqRegistry.index = iqIndex
+
+    def onEvent(self, yowLayerEvent):
+        if yowLayerEvent.getName() == self.__class__.EVENT_DISCONNECTED:
+            self.iqRegistry.clear()
+        return super(YowProtocolLayer, self).onEvent(yowLayerEvent)
 
     def receive(self, node):
         if not self.processIqRegistry(node):
@@ -151,15 +313,13 @@ class YowProtocolLayer(YowLayer):
         raise ValueError("Unimplemented notification type %s " % node)
 
     def _sendIq(self, iqEntity, onSuccess=None, onError=None):
-        self.iqRegistry[iqEntity.getId()] = (iqEntity, onSuccess, onError)
-        self.toLower(iqEntity.toProtocolTreeNode())
+        self.iqRegistry.add(iqEntity, onSuccess, onError, lambda iq: self.toLower(iq.toProtocolTreeNode()))
 
     def processIqRegistry(self, protocolTreeNode):
         if protocolTreeNode.tag == "iq":
             iq_id = protocolTreeNode["id"]
             if iq_id in self.iqRegistry:
-                originalIq, successClbk, errorClbk = self.iqRegistry[iq_id]
-                del self.iqRegistry[iq_id]
+                originalIq, successClbk, errorClbk = self.iqRegistry.pop(iq_id)
 
                 if protocolTreeNode["type"] == "result" and successClbk:
                     successClbk(protocolTreeNode, originalIq)
@@ -171,16 +331,44 @@ class YowProtocolLayer(YowLayer):
 
 
 class YowParallelLayer(YowLayer):
+    """
+    Stanzas and entities are only handed to the sublayers whose handleMap declares their tag, iq results
+    go straight to the sublayer that sent the iq. Sublayers that override receive/send get everything.
+    """
+
     def __init__(self, sublayers=None):
         super(YowParallelLayer, self).__init__()
         self.sublayers = sublayers or []
         self.sublayers = tuple([sublayer() for sublayer in sublayers])
+        self.iqIndex = {}
         for s in self.sublayers:
             # s.setLayers(self, self)
             s.toLower = self.toLower
             s.toUpper = self.toUpper
             s.broadcastEvent = self.subBroadcastEvent
             s.emitEvent = self.subEmitEvent
+            if isinstance(s, YowProtocolLayer):
+                s.iqIndex = self.iqIndex
+        self.receiveRoutes, self.receiveDefault = self.buildRoutes(0, "receive")
+        self.sendRoutes, self.sendDefault = self.buildRoutes(1, "send")
+
+    def buildRoutes(self, handlerIndex, method):
+        """
+        :return: ({tag: sublayers}, sublayers for any other tag), sublayers keep their order
+        """
+        def isRouted(s):
+            return isinstance(s, YowProtocolLayer) and getattr(type(s), method) is getattr(YowProtocolLayer, method)
+
+        tags = set()
+        for s in self.sublayers:
+            if isRouted(s):
+                tags.update(tag for tag, handlers in s.handleMap.items() if handlers[handlerIndex])
+
+        routes = {}
+        for tag in tags:
+            routes[tag] = tuple(s for s in self.sublayers
+                                if not isRouted(s) or (tag in s.handleMap and s.handleMap[tag][handlerIndex]))
+        return routes, tuple(s for s in self.sublayers if not isRouted(s))
 
     def getLayerInterface(self, YowLayerClass):
         for s in self.sublayers:
@@ -193,11 +381,22 @@ class YowParallelLayer(YowLayer):
             s.setStack(self.getStack())
 
     def receive(self, data):
-        for s in self.sublayers:
+        tag = getattr(data, "tag", None)
+        if tag is None:
+            targets = self.sublayers
+        else:
+            if tag == "iq" and self.iqIndex:
+                owner = self.iqIndex.pop(data["id"], None)
+                if owner is not None and data["id"] in owner.iqRegistry:
+                    owner.receive(data)
+                    return
+            targets = self.receiveRoutes.get(tag, self.receiveDefault)
+        for s in targets:
             s.receive(data)
 
     def send(self, data):
-        for s in self.sublayers:
+        tag = getattr(data, "tag", None)
+        for s in self.sublayers if tag is None else self.sendRoutes.get(tag, self.sendDefault):
             s.send(data)
 
     def subBroadcastEvent(self, yowLayerEvent):
@@ -1,43 +1,66 @@
+import functools
 import hashlib, hmac, sys
-from struct import pack
-from operator import xor
-from itertools import starmap
+from struct import Struct
+
+try:
+    from Crypto.Cipher import ARC4
+except ImportError:
+    ARC4 = None
+
 
 class RC4:
-    def __init__(self, key, drop):
-        self.s = []
-        self.i = 0;
-        self.j = 0;
+    """
+    RC4 that discards the first `drop` bytes of keystream. Runs on the ARC4 cipher of pycryptodome when it
+    is installed, in pure python otherwise; both produce the same output.
+    """
 
-        self.s = [0] * 256
+    def __init__(self, key, drop, native=True):
+        self.arc4 = ARC4.new(bytes(key)) if native and ARC4 is not None else None
+        if self.arc4 is not None:
+            self.arc4.encrypt(bytes(drop))
+            return
 
-        for i in range(0, len(self.s)):
-            self.s[i] = i
+        self.i = 0
+        self.j = 0
+        self.s = list(range(0, 256))
 
         for i in range(0, len(self.s)):
             self.j = (self.j + self.s[i] + key[i % len(key)]) % 256
             RC4.swap(self.s, i, self.j)
 
-        self.j = 0;
-        self.cipher(bytearray(drop), 0, drop)
-
+        self.j = 0
+        self.keystream(drop)
 
     def cipher(self, data, offset, length):
-        while True:
-            num = length
-            length = num - 1
-
-            if num == 0: break
-
-            self.i = (self.i+1) % 256
-            self.j = (self.j + self.s[self.i]) % 256
-
-            RC4.swap(self.s, self.i, self.j)
-
-            num2 = offset
-            offset = num2 + 1
-
-            data[num2] = (data[num2] ^ self.s[(self.s[self.i] + self.s[self.j]) % 256])
+        """
+        XORs data[offset:offset + length] with the next length bytes of keystream, in place
+        """
+        if length <= 0:
+            return
+        chunk = bytes(data[offset:offset + length])
+        if self.arc4 is not None:
+            data[offset:offset + length] = self.arc4.encrypt(chunk)
+        else:
+            # xor the whole chunk at once as big ints instead of byte by byte
+            data[offset:offset + length] = (int.from_bytes(chunk, 'big') ^
+                                            int.from_bytes(self.keystream(length), 'big')).to_bytes(length, 'big')
+
+    def keystream(self, length):
+        s = self.s
+        i = self.i
+        j = self.j
+        out = bytearray(length)
+        for n in range(0, length):
+            i = (i + 1) & 0xFF
+            si = s[i]
+            j = (j + si) & 0xFF
+            sj = s[j]
+            s[i] = sj
+            s[j] = si
+            out[n] = s[(si + sj) & 0xFF]
+        self.i = i
+        self.j = j
+        return out
 
     @staticmethod
     def swap(arr, i, j):
@@ -47,92 +70,58 @@ class RC4:
 
 
 class KeyStream:
+    SEQ = Struct(">I")
 
     def __init__(self, key, macKey):
         self.key = key if sys.version_info < (3, 0) else bytes(key)
         self.rc4 = RC4(self.key, 0x300)
         self.macKey = str(macKey) if sys.version_info < (3, 0) else bytes(macKey)
+        # keyed once, copied for every frame
+        self.mac = hmac.new(self.macKey, None, hashlib.sha1)
         self.seq = 0
 
     def computeMac(self, bytes_buffer, int_offset, int_length):
-        mac = hmac.new(self.macKey, None, hashlib.sha1)
-        updateData = bytes_buffer[int_offset:] + bytearray([self.seq >> 24, (self.seq >> 16) % 256, (self.seq >> 8) % 256, self.seq % 256])
-
-        try:
-            mac.update(updateData)
-        except TypeError: #python3 support
-            mac.update(bytes(updateData))
+        mac = self.mac.copy()
+        mac.update(memoryview(bytes_buffer)[int_offset:int_offset + int_length])
+        mac.update(self.__class__.SEQ.pack(self.seq))
 
         self.seq += 1
         return bytearray(mac.digest())
 
     def decodeMessage(self, bufdata, macOffset, offset, length):
-        buf = bufdata[:-4]
-        hashed = bufdata[-4:]
-        numArray = self.computeMac(buf, 0, len(buf))
+        size = len(bufdata) - 4
+        numArray = self.computeMac(bufdata, 0, size)
+        if not hmac.compare_digest(numArray[macOffset:macOffset + 4], bufdata[size:]):
+            raise Exception("INVALID MAC")
 
-        num = 0
-        while num < 4:
-            if numArray[macOffset + num] == hashed[num]:
-                num += 1
-            else:
-                raise Exception("INVALID MAC")
-
-        self.rc4.cipher(buf, 0, len(buf))
+        buf = bufdata[:size]
+        self.rc4.cipher(buf, 0, size)
 
         return buf
 
     def encodeMessage(self, buf, macOffset, offset, length):
+        """
+        Ciphers buf[offset:offset + length] and writes the first 4 bytes of its mac at macOffset, in place.
+        Preallocate buf up to macOffset + 4 to keep it from growing.
+        :return: buf
+        """
         self.rc4.cipher(buf, offset, length)
         mac = self.computeMac(buf, offset, length)
-        output = buf[0:macOffset] + mac[0:4] + buf[macOffset+4:]
-        return output
+        buf[macOffset:macOffset + 4] = mac[0:4]
+        return buf
+
+    # derived keys of that many (password, nonce) pairs are kept, so a reconnect storm doesn't re-derive them
+    DERIVED_KEYS_CACHE_SIZE = 4096
 
     @staticmethod
     def generateKeys(password, nonce):
-        resultBytes = []
-
-        for i in range(1, 5):
-            currNonce = nonce + bytearray([i])
-            resultBytes.append(KeyStream.pbkdf2(password, currNonce, 2, 20))
+        return [bytearray(key) for key in KeyStream.deriveKeys(bytes(password), bytes(nonce))]
 
-        return resultBytes
-
-    #@staticmethod  ##use if drop python-2.6 support
-    #def pbkdf2( password, salt, itercount, keylen):
-    #    return bytearray(hashlib.pbkdf2_hmac('sha1', password, salt, itercount, keylen))
+    @staticmethod
+    @functools.lru_cache(maxsize=DERIVED_KEYS_CACHE_SIZE)
+    def deriveKeys(password, nonce):
+        return tuple(hashlib.pbkdf2_hmac('sha1', password, nonce + bytes([i]), 2, 20) for i in range(1, 5))
 
     @staticmethod
-    def pbkdf2( password, salt, itercount, keylen, hashfn = hashlib.sha1 ):
-        def pbkdf2_F( h, salt, itercount, blocknum ):
-            def prf( h, data ):
-                hm = h.copy()
-                try:
-                    hm.update(bytearray(data))
-                except TypeError: #python 3 support
-                    hm.update(bytes(data))
-
-                d = hm.digest()
-                return bytearray(d)
-
-            U = prf( h, salt + pack('>i',blocknum ) )
-            T = U
-
-            for i in range(2, itercount + 1):
-                U = prf( h, U )
-                T = starmap(xor, zip(T, U))
-            return T
-
-        digest_size = hashfn().digest_size
-        l = int(keylen / digest_size)
-        if keylen % digest_size != 0:
-            l += 1
-        
-        h = hmac.new(bytes(password), None, hashfn )
-
-        T = bytearray()
-        for i in range(1, l+1):
-            tmp = pbkdf2_F( h, salt, itercount, i )
-            T.extend(tmp)
-        
-        return T[0: keylen]
\ No newline at end of file
+    def pbkdf2(password, salt, itercount, keylen, hashfn=hashlib.sha1):
+        return bytearray(hashlib.pbkdf2_hmac(hashfn().name, bytes(password), bytes(salt), itercount, keylen))
@@ -19,6 +19,8 @@ class YowAuthenticationProtocolLayer(YowProtocolLayer):
     PROP_CREDENTIALS = "org.openwhatsapp.yowsup.prop.auth.credentials"
     PROP_PASSIVE = "org.openwhatsapp.yowsup.prop.auth.passive"
 
+    _nonce = None  # last nonce from the server, saves reading it back on reconnect
+
     def __init__(self):
         handleMap = {
             "stream:features": (self.handleStreamFeatures, None),
@@ -45,6 +47,7 @@ class YowAuthenticationProtocolLayer(YowProtocolLayer):
     def setCredentials(self, credentials):
         self.setProp(YowAuthenticationProtocolLayer.PROP_CREDENTIALS, credentials)  # keep for now
         self._credentials = self.__getCredentials(credentials)
+        self._nonce = None
 
     def getUsername(self, full=False):
         if self._credentials:
@@ -70,7 +73,9 @@ class YowAuthenticationProtocolLayer(YowProtocolLayer):
         self.toUpper(nodeEntity)
 
     def handleSuccess(self, node):
-        if (node.data != None): StorageTools.writeNonce(self.credentials[0], node.data)
+        if (node.data != None):
+            StorageTools.writeNonce(self.credentials[0], node.data)
+            self._nonce = node.data.encode("latin-1")
         successEvent = YowLayerEvent(self.__class__.EVENT_AUTHED, passive=self.getProp(self.__class__.PROP_PASSIVE))
         self.broadcastEvent(successEvent)
         nodeEntity = SuccessProtocolEntity.fromProtocolTreeNode(node)
@@ -101,7 +106,9 @@ class YowAuthenticationProtocolLayer(YowProtocolLayer):
 
     def _sendAuth(self):
         passive = self.getProp(self.__class__.PROP_PASSIVE, False)
-        nonce = StorageTools.getNonce(self.credentials[0])
+        if self._nonce is None:
+            self._nonce = StorageTools.getNonce(self.credentials[0])
+        nonce = self._nonce
 
         if nonce == None:
             self.entityToLower(AuthProtocolEntity(self.credentials[0], passive=passive))
@@ -1,5 +1,6 @@
 from yowsup.layers import YowLayer, EventCallback
 from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.coder import YowStreamPreamble
 class YowCryptLayer(YowLayer):
     '''
         send:       bytearray -> bytearray
@@ -23,29 +24,29 @@ class YowCryptLayer(YowLayer):
 
     def send(self, data):
         outputKey = self.keys[1]
-        length1 = len(data)
-        if length1 > 1:
+        length = len(data)
+        if isinstance(data, YowStreamPreamble):
+            data = bytearray(data)
+        elif length > 1:
             if outputKey:
-                length1 += 4
-                buf = outputKey.encodeMessage(data, len(data), 0, len(data))
-                res = [0,0,0]
-                res.extend(buf)
-                res[0] = ((8 << 4) | (length1 & 16711680) >> 16) % 256
-                res[1] = ((length1 & 65280) >> 8) % 256
-                res[2] = (length1 & 255) % 256
-                
-
-                data = res
-
+                # header, payload and mac laid out in one buffer, encoded in place
+                frame = bytearray(3 + length + 4)
+                frame[3:3 + length] = data
+                outputKey.encodeMessage(frame, 3 + length, 3, length)
+                self.writeHeader(frame, 8, length + 4)
             else:
-                prep = [0,0,0]
-                prep.extend(data)
-                prep[0] = ((0 << 4) | (length1 & 16711680) >> 16) % 256
-                prep[1] = ((length1 & 65280) >> 8) % 256
-                prep[2] = (length1 & 255) % 256
-                data = prep
+                frame = bytearray(3 + length)
+                frame[3:] = data
+                self.writeHeader(frame, 0, length)
+            data = frame
+
+        self.toLower(bytearray(data) if type(data) is not bytearray else data)
 
-        self.toLower(bytearray(data))
+    @staticmethod
+    def writeHeader(frame, flag, size):
+        frame[0] = ((flag << 4) | (size & 16711680) >> 16) % 256
+        frame[1] = ((size & 65280) >> 8) % 256
+        frame[2] = (size & 255) % 256
 
     def receive(self, data):
         inputKey = self.keys[0]
@@ -2,6 +2,8 @@ from yowsup.layers import YowLayerEvent, YowLayerTest
 from yowsup.structs import ProtocolTreeNode
 from yowsup.layers.auth import YowCryptLayer
 from yowsup.layers.auth.keystream import KeyStream
+from yowsup.layers.coder import YowStreamPreamble
+from yowsup.layers.network import YowNetworkLayer
 
 class CryptLayerTest(YowLayerTest, YowCryptLayer):
     def setUp(self):
@@ -26,3 +28,13 @@ class CryptLayerTest(YowLayerTest, YowCryptLayer):
         self.send(self.inputMessage)
         self.assertEqual(self.lowerSink.pop(), self.inputMessageCrypted)
 
+    def test_01preamble(self):
+        self.onEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_CONNECTED))
+        self.send(YowStreamPreamble(b"WA\x01\x05"))
+        sent = self.lowerSink.pop()
+        self.assertEqual(sent, bytearray(b"WA\x01\x05"))
+        self.assertIs(type(sent), bytearray)
+        # what is not marked is framed, first write after connecting or not
+        self.onEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_CONNECTED))
+        self.send(bytearray(b"WA\x01\x05"))
+        self.assertEqual(self.lowerSink.pop(), bytearray(b"\x00\x00\x04WA\x01\x05"))
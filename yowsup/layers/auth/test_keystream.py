@@ -1,5 +1,5 @@
 import unittest
-from yowsup.layers.auth.keystream import KeyStream
+from yowsup.layers.auth.keystream import KeyStream, RC4
 class KeyStreamTest(unittest.TestCase):
 
     def setUp(self):
@@ -50,4 +50,32 @@ class KeyStreamTest(unittest.TestCase):
         keys = self.keysTarget
         kstream = KeyStream(keys[2], keys[3])
         for i in range(0, 300):
-            encoded = kstream.encodeMessage(self.inputMessage, 0, 4, len(self.inputMessage) - 4)
\ No newline at end of file
+            encoded = kstream.encodeMessage(self.inputMessage, 0, 4, len(self.inputMessage) - 4)
+
+    def test_rc4_engines(self):
+        native = RC4(self.keysTarget[2], 0x300)
+        python = RC4(self.keysTarget[2], 0x300, native=False)
+        for size in (0, 1, 9, 500, 4096):
+            data = bytearray(range(0, 256)) * (size // 256 + 1)
+            a, b = bytearray(data), bytearray(data)
+            native.cipher(a, 3, size)
+            python.cipher(b, 3, size)
+            self.assertEqual(a, b)
+
+    def test_encode_decode(self):
+        keys = self.keysTarget
+        encoder = KeyStream(keys[2], keys[3])
+        decoder = KeyStream(keys[2], keys[3])
+        for size in (2, 100, 70000):
+            payload = bytearray(range(0, 256)) * (size // 256 + 1)
+            frame = bytearray(len(payload) + 4)
+            frame[:len(payload)] = payload
+            self.assertIs(encoder.encodeMessage(frame, len(payload), 0, len(payload)), frame)
+            self.assertEqual(decoder.decodeMessage(frame, 0, 4, len(frame) - 4), payload)
+
+    def test_generateKeys_cached(self):
+        hits = KeyStream.deriveKeys.cache_info().hits
+        keys = KeyStream.generateKeys(self.password, self.salt)
+        keys[0][0] ^= 0xFF
+        self.assertEqual(KeyStream.generateKeys(self.password, self.salt), self.keysTarget)
+        self.assertEqual(KeyStream.deriveKeys.cache_info().hits, hits + 2)
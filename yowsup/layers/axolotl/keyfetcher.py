@@ -0,0 +1,122 @@
+# -*- coding utf-8 -*-
+
+import logging
+
+from yowsup.layers import YowIqRegistry
+from yowsup.layers.axolotl.props import PROP_KEYS_FETCH_WINDOW, PROP_KEYS_FETCH_MAX
+from yowsup.layers.axolotl.protocolentities import GetKeysIqProtocolEntity, ResultGetKeysIqProtocolEntity
+
+logger = logging.getLogger(__name__)
+
+
+class AxolotlKeysRequest(object):
+    def __init__(self, jids, resultClbk, errorClbk):
+        self.jids = jids
+        self.pending = set(jids)
+        self.successJids = []
+        self.errorJids = {}  # jid -> exception
+        self.resultClbk = resultClbk
+        self.errorClbk = errorClbk
+        self.errorNode = None
+        self.errorEntity = None
+
+    def resolve(self, jid, success=False, exception=None, errorNode=None, errorEntity=None):
+        """
+        :return: True once all jids are resolved
+        """
+        if success:
+            self.successJids.append(jid)
+        elif exception is not None:
+            self.errorJids[jid] = exception
+        elif errorNode is not None and self.errorNode is None:
+            self.errorNode = errorNode
+            self.errorEntity = errorEntity
+        self.pending.discard(jid)
+        return not self.pending
+
+    def finish(self):
+        if self.errorNode is not None:
+            if self.errorClbk:
+                self.errorClbk(self.errorNode, self.errorEntity)
+        else:
+            self.resultClbk(self.successJids, self.errorJids)
+
+
+class AxolotlKeyFetcher(object):
+    """
+    Fetches prekey bundles for AxolotlBaseLayer.getKeysFor. Jids requested within PROP_KEYS_FETCH_WINDOW
+    seconds of each other are asked for in one iq, of at most PROP_KEYS_FETCH_MAX jids. Requests for jids whose
+    keys are already being fetched wait for that fetch instead of fetching them again.
+    """
+
+    def __init__(self, layer):
+        """
+        :type layer: AxolotlBaseLayer
+        """
+        self.layer = layer
+        self.waiters = {}  # jid -> [AxolotlKeysRequest]
+        self.queued = []
+        self.flushTimer = None
+
+    def fetch(self, jids, resultClbk, errorClbk=None):
+        jids = list(dict.fromkeys(jids))
+        request = AxolotlKeysRequest(jids, resultClbk, errorClbk)
+        if not jids:
+            request.finish()
+            return
+        for jid in jids:
+            if jid in self.waiters:
+                self.waiters[jid].append(request)
+            else:
+                self.waiters[jid] = [request]
+                self.queued.append(jid)
+
+        window = self.layer.getProp(PROP_KEYS_FETCH_WINDOW, 0.05)
+        if window <= 0 or len(self.queued) >= self.layer.getProp(PROP_KEYS_FETCH_MAX, 100):
+            self.flush()
+        elif self.queued and self.flushTimer is None:
+            self.flushTimer = self.layer.getStack().callLater(window, self.flush)
+
+    def flush(self):
+        if self.flushTimer is not None:
+            self.flushTimer.cancel()
+            self.flushTimer = None
+        maxJids = self.layer.getProp(PROP_KEYS_FETCH_MAX, 100)
+        queued, self.queued = self.queued, []
+        for i in range(0, len(queued), maxJids):
+            entity = GetKeysIqProtocolEntity(queued[i:i + maxJids])
+            logger.debug("Fetching keys for %d jids" % len(entity.getJids()))
+            self.layer._sendIq(entity, self.onSuccess, self.onError)
+
+    def clear(self):
+        """
+        Fails the requests for jids whose keys were not asked for yet, like the iq registry fails those asked for
+        """
+        if self.flushTimer is not None:
+            self.flushTimer.cancel()
+            self.flushTimer = None
+        queued, self.queued = self.queued, []
+        if queued:
+            entry = (GetKeysIqProtocolEntity(queued), self.onSuccess, self.onError)
+            self.layer.iqRegistry.fail(entry, YowIqRegistry.CODE_DISCONNECTED, "disconnected")
+
+    def onSuccess(self, resultNode, getKeysEntity):
+        try:
+            resultEntity = ResultGetKeysIqProtocolEntity.fromProtocolTreeNode(resultNode)
+            successJids, errorJids = self.layer.processKeys(resultEntity, getKeysEntity.getJids())
+        except Exception as e:
+            # every jid has to be resolved, or later requests for it would wait on this fetch forever
+            logger.error("Could not process keys for %d jids: %s" % (len(getKeysEntity.getJids()), e))
+            successJids, errorJids = [], dict((jid, e) for jid in getKeysEntity.getJids())
+        successJids = set(successJids)
+        for jid in getKeysEntity.getJids():
+            self.resolve(jid, success=jid in successJids, exception=errorJids.get(jid))
+
+    def onError(self, errorNode, getKeysEntity):
+        for jid in getKeysEntity.getJids():
+            self.resolve(jid, errorNode=errorNode, errorEntity=getKeysEntity)
+
+    def resolve(self, jid, **kwargs):
+        for request in self.waiters.pop(jid, []):
+            if request.resolve(jid, **kwargs):
+                request.finish()
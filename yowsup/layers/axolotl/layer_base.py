@@ -5,10 +5,12 @@ from yowsup.layers import YowProtocolLayer
 from yowsup.common.tools import StorageTools
 from yowsup.layers.auth.layer_authentication import YowAuthenticationProtocolLayer
 from yowsup.layers.axolotl.protocolentities import *
+from yowsup.layers.axolotl.keyfetcher import AxolotlKeyFetcher
 
 from axolotl.sessionbuilder import SessionBuilder
 from axolotl.untrustedidentityexception import UntrustedIdentityException
-from yowsup.layers.axolotl.props import PROP_IDENTITY_AUTOTRUST
+from yowsup.layers.axolotl.props import PROP_IDENTITY_AUTOTRUST, PROP_SESSION_CACHE_SIZE, \
+    PROP_SESSION_FLUSH_INTERVAL, PROP_SESSION_FLUSH_DIRTY
 
 import logging
 
@@ -22,10 +24,19 @@ class AxolotlBaseLayer(YowProtocolLayer):
         super(AxolotlBaseLayer, self).__init__()
         self._store = None
         self.skipEncJids = []
+        self.keyFetcher = AxolotlKeyFetcher(self)
 
     def onNewStoreSet(self, store):
         pass
 
+    def onEvent(self, yowLayerEvent):
+        if yowLayerEvent.getName() == self.__class__.EVENT_DISCONNECTED:
+            self.keyFetcher.clear()
+            if self._store is not None:
+                # sessions written back lazily must not be lost with the connection
+                self._store.flush()
+        return super(AxolotlBaseLayer, self).onEvent(yowLayerEvent)
+
     def send(self, node):
         pass
 
@@ -41,7 +52,11 @@ class AxolotlBaseLayer(YowProtocolLayer):
                         self.getProp(
                             YowAuthenticationProtocolLayer.PROP_CREDENTIALS)[0],
                         self.__class__._DB
-                    )
+                    ),
+                    sessionCacheSize=self.getProp(PROP_SESSION_CACHE_SIZE, 1024),
+                    sessionFlushInterval=self.getProp(PROP_SESSION_FLUSH_INTERVAL, 1.0),
+                    sessionFlushDirty=self.getProp(PROP_SESSION_FLUSH_DIRTY, 64),
+                    callLater=self.getStack().callLater
                 )
             return self._store
         except AttributeError:
@@ -53,38 +68,46 @@ class AxolotlBaseLayer(YowProtocolLayer):
         self.onNewStoreSet(self._store)
 
     def getKeysFor(self, jids, resultClbk, errorClbk=None):
-        def onSuccess(resultNode, getKeysEntity):
-            entity_ = ResultGetKeysIqProtocolEntity.fromProtocolTreeNode(resultNode)
-            resultJids = entity_.getJids()
-            successJids = []
-            errorJids = {}  # jid -> exception
-
-            for jid in getKeysEntity.getJids():
-                if jid not in resultJids:
-                    self.skipEncJids.append(jid)
-                    continue
-
-                recipient_id = jid.split('@')[0]
-                preKeyBundle = entity_.getPreKeyBundleFor(jid)
-                sessionBuilder = SessionBuilder(self.store, self.store, self.store, self.store, recipient_id, 1)
-                try:
+        """
+        Fetches the prekey bundles of jids and builds sessions from them. Fetches are batched and shared with
+        other calls, see AxolotlKeyFetcher.
+        :param resultClbk: resultClbk(successJids, errorJids {jid: exception}), once all jids were fetched
+        :param errorClbk: errorClbk(errorNode, getKeysEntity) if fetching failed
+        """
+        self.keyFetcher.fetch(jids, resultClbk, errorClbk)
+
+    def processKeys(self, resultEntity, jids):
+        """
+        :type resultEntity: ResultGetKeysIqProtocolEntity
+        :return: (successJids, errorJids {jid: exception})
+        """
+        resultJids = resultEntity.getJids()
+        successJids = []
+        errorJids = {}  # jid -> exception
+
+        for jid in jids:
+            if jid not in resultJids:
+                self.skipEncJids.append(jid)
+                continue
+
+            recipient_id = jid.split('@')[0]
+            preKeyBundle = resultEntity.getPreKeyBundleFor(jid)
+            sessionBuilder = SessionBuilder(self.store, self.store, self.store, self.store, recipient_id, 1)
+            try:
+                with self.store.transaction():
                     sessionBuilder.processPreKeyBundle(preKeyBundle)
+                successJids.append(jid)
+            except UntrustedIdentityException as e:
+                if self.getProp(PROP_IDENTITY_AUTOTRUST, False):
+                    logger.warning("Autotrusting identity for %s" % e.getName())
+                    self.store.saveIdentity(e.getName(), e.getIdentityKey())
                     successJids.append(jid)
-                except UntrustedIdentityException as e:
-                    if self.getProp(PROP_IDENTITY_AUTOTRUST, False):
-                        logger.warning("Autotrusting identity for %s" % e.getName())
-                        self.store.saveIdentity(e.getName(), e.getIdentityKey())
-                        successJids.append(jid)
-                    else:
-                        errorJids[jid] = e
-                        logger.error(e)
-                        logger.warning("Ignoring message with untrusted identity")
-
-                resultClbk(successJids, errorJids)
-
-        def onError(errorNode, getKeysEntity):
-            if errorClbk:
-                errorClbk(errorNode, getKeysEntity)
-
-        entity = GetKeysIqProtocolEntity(jids)
-        self._sendIq(entity, onSuccess, onError=onError)
+                else:
+                    errorJids[jid] = e
+                    logger.error(e)
+                    logger.warning("Ignoring message with untrusted identity")
+            except Exception as e:
+                errorJids[jid] = e
+                logger.error("Could not process keys for %s: %s" % (jid, e))
+
+        return successJids, errorJids
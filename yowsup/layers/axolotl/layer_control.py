@@ -11,7 +11,6 @@ from axolotl.util.hexutil import HexUtil
 from axolotl.ecc.curve import Curve
 import logging
 import binascii
-import sys
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +32,9 @@ class AxolotlControlLayer(AxolotlBaseLayer):
             self.state = self.__class__._STATE_HASKEYS if store.getLocalRegistrationId() is not None \
                 else self.__class__._STATE_INIT
 
+    def isTransparent(self, method):
+        return method == "send"
+
     def send(self, node):
         self.toLower(node)
 
@@ -107,24 +109,12 @@ class AxolotlControlLayer(AxolotlBaseLayer):
         self._sendIq(setKeysIq, onResult, self.onSentKeysError)
 
     def persistKeys(self, registrationId, identityKeyPair, preKeys, signedPreKey, fresh):
-        total = len(preKeys)
-        curr = 0
-        prevPercentage = 0
-
-        if fresh:
-            self.store.storeLocalData(registrationId, identityKeyPair)
-        self.store.storeSignedPreKey(signedPreKey.getId(), signedPreKey)
-
-        for preKey in preKeys:
-            self.store.storePreKey(preKey.getId(), preKey)
-            curr += 1
-            currPercentage = int((curr * 100) / total)
-            if currPercentage == prevPercentage:
-                continue
-            prevPercentage = currPercentage
-            # logger.debug("%s" % currPercentage + "%")
-            sys.stdout.write("Storing prekeys %d%% \r" % (currPercentage))
-            sys.stdout.flush()
+        with self.store.transaction():
+            if fresh:
+                self.store.storeLocalData(registrationId, identityKeyPair)
+            self.store.storeSignedPreKey(signedPreKey.getId(), signedPreKey)
+            self.store.storePreKeys(preKeys)
+        logger.debug("Stored %d prekeys" % len(preKeys))
 
         if fresh:
             self.state = self.__class__._STATE_GENKEYS
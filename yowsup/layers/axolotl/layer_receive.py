@@ -137,7 +137,8 @@ class AxolotlReceivelayer(AxolotlBaseLayer):
         enc_ = pkMessageProtocolEntity.getEnc(EncProtocolEntity.TYPE_PKMSG)
         preKeyWhisperMessage = PreKeyWhisperMessage(serialized=enc_.getData())
         sessionCipher = self.getSessionCipher(Jid.denormalize(pkMessageProtocolEntity.getAuthor()))
-        plaintext = sessionCipher.decryptPkmsg(preKeyWhisperMessage)
+        with self.store.transaction():
+            plaintext = sessionCipher.decryptPkmsg(preKeyWhisperMessage)
         if enc_.getVersion() == 2:
             paddingByte = plaintext[-1] if type(plaintext[-1]) is int else ord(plaintext[-1])
             padding = paddingByte & 0xFF
@@ -151,7 +152,8 @@ class AxolotlReceivelayer(AxolotlBaseLayer):
 
         whisperMessage = WhisperMessage(serialized=enc_.getData())
         sessionCipher = self.getSessionCipher(Jid.denormalize(encMessageProtocolEntity.getAuthor()))
-        plaintext = sessionCipher.decryptMsg(whisperMessage)
+        with self.store.transaction():
+            plaintext = sessionCipher.decryptMsg(whisperMessage)
 
         if enc_.getVersion() == 2:
             paddingByte = plaintext[-1] if type(plaintext[-1]) is int else ord(plaintext[-1])
@@ -168,7 +170,8 @@ class AxolotlReceivelayer(AxolotlBaseLayer):
                                       AxolotlAddress(Jid.denormalize(encMessageProtocolEntity.participant), 0))
         groupCipher = GroupCipher(self.store, senderKeyName)
         try:
-            plaintext = groupCipher.decrypt(enc_.getData())
+            with self.store.transaction():
+                plaintext = groupCipher.decrypt(enc_.getData())
             paddingByte = plaintext[-1] if type(plaintext[-1]) is int else ord(plaintext[-1])
             padding = paddingByte & 0xFF
             self.parseAndHandleMessageProto(encMessageProtocolEntity, plaintext[:-padding])
@@ -12,6 +12,7 @@ from yowsup.common.protobuf_to_dict.convertor import dict_to_protobuf
 from yowsup.common.tools import Jid
 from yowsup.layers.auth.layer_authentication import YowAuthenticationProtocolLayer
 from yowsup.layers.axolotl.protocolentities import *
+from yowsup.layers.protocol_groups.groupscache import YowGroupsCache
 from yowsup.layers.protocol_groups.protocolentities import InfoGroupsIqProtocolEntity, InfoGroupsResultIqProtocolEntity
 from yowsup.layers.protocol_messages.proto.wa_pb2 import *
 from .layer_base import AxolotlBaseLayer
@@ -49,22 +50,8 @@ class AxolotlSendLayer(AxolotlBaseLayer):
         v2 = node["to"]
         if node.getChild("enc"):  # media enc is only for v2 messsages
             if '-' in recipient_id:  # Handle Groups
-                def getResultNodes(resultNode, _requestEntity):
-                    groupInfo = InfoGroupsResultIqProtocolEntity.fromProtocolTreeNode(resultNode)
-                    jids = list(groupInfo.getParticipants().keys())  # keys in py3 returns dict_keys
-                    jids.remove(self.getLayerInterface(YowAuthenticationProtocolLayer).getUsername(True))
-                    jidsNoSession = []
-                    for jid in jids:
-                        if not self.store.containsSession(jid.split('@')[0], 1):
-                            jidsNoSession.append(jid)
-                    if len(jidsNoSession):
-                        self.getKeysFor(jidsNoSession,
-                                        lambda successJids, b: self.sendToGroupWithSessions(node, successJids))
-                    else:
-                        self.sendToGroupWithSessions(node, jids)
-
-                groupInfoIq = InfoGroupsIqProtocolEntity(Jid.normalize(node["to"]))
-                self._sendIq(groupInfoIq, getResultNodes)
+                self.getGroupParticipants(Jid.normalize(node["to"]),
+                                          lambda jids: self.ensureSessionsAndSendToGroup(node, jids))
             else:
                 messageData = self.serializeToProtobuf(node)
                 if messageData:
@@ -75,11 +62,12 @@ class AxolotlSendLayer(AxolotlBaseLayer):
                             else:
                                 self.toLower(node)
 
-                        self.getKeysFor([node["to"]], on_get_keys, lambda: self.toLower(node))
+                        self.getKeysFor([node["to"]], on_get_keys, lambda errorNode, getKeysEntity: self.toLower(node))
                     else:
                         sessionCipher = self.getSessionCipher(recipient_id)
                         messageData = messageData + self.getPadding()
-                        ciphertext = sessionCipher.encrypt(messageData)
+                        with self.store.transaction():
+                            ciphertext = sessionCipher.encrypt(messageData)
                         mediaType = node.getChild("enc")["type"] if node.getChild("enc") else None
                         if ciphertext.__class__ == WhisperMessage:
                             enc_type = EncProtocolEntity.TYPE_MSG
@@ -152,7 +140,7 @@ class AxolotlSendLayer(AxolotlBaseLayer):
         else:
             self.getKeysFor([node["to"]],
                             lambda successJids, b: self.sendToContact(node) if len(successJids) == 1 else self.toLower(
-                                node), lambda: self.toLower(node))
+                                node), lambda errorNode, getKeysEntity: self.toLower(node))
 
     def enqueueSent(self, node):
         if len(self.sentQueue) >= self.__class__.MAX_SENT_QUEUE:
@@ -176,7 +164,8 @@ class AxolotlSendLayer(AxolotlBaseLayer):
         recipient_id = node["to"].split('@')[0]
         cipher = self.getSessionCipher(recipient_id)
         messageData = self.serializeToProtobuf(node) + self.getPadding()
-        ciphertext = cipher.encrypt(messageData)
+        with self.store.transaction():
+            ciphertext = cipher.encrypt(messageData)
         mediaType = node.getChild("body")["mediatype"] if node.getChild("body") else None
 
         return self.sendEncEntities(node, [EncProtocolEntity(
@@ -190,32 +179,32 @@ class AxolotlSendLayer(AxolotlBaseLayer):
         senderKeyName = SenderKeyName(groupJid, AxolotlAddress(ownNumber, 0))
         cipher = self.getGroupCipher(groupJid, ownNumber)
         encEntities = []
-        if len(jidsNeedSenderKey):
-            senderKeyDistributionMessage = self.groupSessionBuilder.create(senderKeyName)
-            for jid in jidsNeedSenderKey:
-                sessionCipher = self.getSessionCipher(jid.split('@')[0])
-                skdm = self.serializeSKDM(node["to"], senderKeyDistributionMessage)
-                message = self.serializeToProtobuf(node if retryCount > 0 else None, skdm)
-                ciphertext = sessionCipher.encrypt(message + self.getPadding())
-                if ciphertext.__class__ == WhisperMessage:
-                    enc_type = EncProtocolEntity.TYPE_MSG
-                else:
-                    enc_type = EncProtocolEntity.TYPE_PKMSG
-                encEntities.append(EncProtocolEntity(enc_type, 2, ciphertext.serialize(), jid=jid))
-
-        if not retryCount:
-            messageData = self.serializeToProtobuf(node)
-            ciphertext = cipher.encrypt(messageData + self.getPadding())
-            mediaType = node.getChild("body")["mediatype"] if node.getChild("body") else None
-            encEntities.append(EncProtocolEntity(EncProtocolEntity.TYPE_SKMSG, 2, ciphertext, mediaType))
+        # one commit for the sessions and the sender key
+        with self.store.transaction():
+            if len(jidsNeedSenderKey):
+                senderKeyDistributionMessage = self.groupSessionBuilder.create(senderKeyName)
+                for jid in jidsNeedSenderKey:
+                    sessionCipher = self.getSessionCipher(jid.split('@')[0])
+                    skdm = self.serializeSKDM(node["to"], senderKeyDistributionMessage)
+                    message = self.serializeToProtobuf(node if retryCount > 0 else None, skdm)
+                    ciphertext = sessionCipher.encrypt(message + self.getPadding())
+                    if ciphertext.__class__ == WhisperMessage:
+                        enc_type = EncProtocolEntity.TYPE_MSG
+                    else:
+                        enc_type = EncProtocolEntity.TYPE_PKMSG
+                    encEntities.append(EncProtocolEntity(enc_type, 2, ciphertext.serialize(), jid=jid))
+
+            if not retryCount:
+                messageData = self.serializeToProtobuf(node)
+                ciphertext = cipher.encrypt(messageData + self.getPadding())
+                mediaType = node.getChild("body")["mediatype"] if node.getChild("body") else None
+                encEntities.append(EncProtocolEntity(EncProtocolEntity.TYPE_SKMSG, 2, ciphertext, mediaType))
 
         self.sendEncEntities(node, encEntities)
 
     def ensureSessionsAndSendToGroup(self, node, jids):
-        jidsNoSession = []
-        for jid in jids:
-            if not self.store.containsSession(jid.split('@')[0], 1):
-                jidsNoSession.append(jid)
+        withSession = self.store.containsSessions([jid.split('@')[0] for jid in jids])
+        jidsNoSession = [jid for jid in jids if jid.split('@')[0] not in withSession]
 
         if len(jidsNoSession):
             self.getKeysFor(jidsNoSession, lambda successJids, b: self.sendToGroupWithSessions(node, successJids))
@@ -225,19 +214,11 @@ class AxolotlSendLayer(AxolotlBaseLayer):
     def sendToGroup(self, node, retryReceiptEntity=None):
         groupJid = node["to"]
         ownNumber = self.getLayerInterface(YowAuthenticationProtocolLayer).getUsername(False)
-        ownJid = self.getLayerInterface(YowAuthenticationProtocolLayer).getUsername(True)
         senderKeyName = SenderKeyName(node["to"], AxolotlAddress(ownNumber, 0))
         senderKeyRecord = self.store.loadSenderKey(senderKeyName)
 
-        def sendToGroup(resultNode, _requestEntity):
-            groupInfo = InfoGroupsResultIqProtocolEntity.fromProtocolTreeNode(resultNode)
-            jids = list(groupInfo.getParticipants().keys())  # keys in py3 returns dict_keys
-            jids.remove(ownJid)
-            return self.ensureSessionsAndSendToGroup(node, jids)
-
         if senderKeyRecord.isEmpty():
-            groupInfoIq = InfoGroupsIqProtocolEntity(groupJid)
-            self._sendIq(groupInfoIq, sendToGroup)
+            self.getGroupParticipants(groupJid, lambda jids: self.ensureSessionsAndSendToGroup(node, jids))
         else:
             retryCount = 0
             jidsNeedSenderKey = []
@@ -246,6 +227,25 @@ class AxolotlSendLayer(AxolotlBaseLayer):
                 jidsNeedSenderKey.append(retryReceiptEntity.getRetryJid())
             self.sendToGroupWithSessions(node, jidsNeedSenderKey, retryCount)
 
+    def getGroupParticipants(self, groupJid, callback):
+        """
+        Calls callback with the jids of the group's participants but us, right away if the groups cache
+        knows them, else once the server told
+        """
+        ownJid = self.getLayerInterface(YowAuthenticationProtocolLayer).getUsername(True)
+        groupsCache = YowGroupsCache.fromLayer(self)
+        groupInfo = groupsCache.get(groupJid) if groupsCache is not None else None
+        if groupInfo is not None:
+            return callback([jid for jid in groupInfo.getParticipants() if jid != ownJid])
+
+        def onResult(resultNode, _requestEntity):
+            entity = InfoGroupsResultIqProtocolEntity.fromProtocolTreeNode(resultNode)
+            if groupsCache is not None:
+                groupsCache.putInfo(entity)
+            callback([jid for jid in entity.getParticipants() if jid != ownJid])
+
+        self._sendIq(InfoGroupsIqProtocolEntity(groupJid), onResult)
+
     def getSessionCipher(self, recipientId):
         if recipientId in self.sessionCiphers:
             sessionCipher = self.sessionCiphers[recipientId]
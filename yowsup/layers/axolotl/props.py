@@ -1 +1,6 @@
-PROP_IDENTITY_AUTOTRUST =  "org.openwhatsapp.yowsup.prop.axolotl.INDENTITY_AUTOTRUST"
\ No newline at end of file
+PROP_IDENTITY_AUTOTRUST =  "org.openwhatsapp.yowsup.prop.axolotl.INDENTITY_AUTOTRUST"
+PROP_SESSION_CACHE_SIZE = "org.openwhatsapp.yowsup.prop.axolotl.SESSION_CACHE_SIZE"
+PROP_SESSION_FLUSH_INTERVAL = "org.openwhatsapp.yowsup.prop.axolotl.SESSION_FLUSH_INTERVAL"
+PROP_SESSION_FLUSH_DIRTY = "org.openwhatsapp.yowsup.prop.axolotl.SESSION_FLUSH_DIRTY"
+PROP_KEYS_FETCH_WINDOW = "org.openwhatsapp.yowsup.prop.axolotl.KEYS_FETCH_WINDOW"
+PROP_KEYS_FETCH_MAX = "org.openwhatsapp.yowsup.prop.axolotl.KEYS_FETCH_MAX"
@@ -12,6 +12,7 @@ class RetryIncomingReceiptProtocolEntity(IncomingReceiptProtocolEntity):
         </registration>
     </receipt>
     '''
+    __slots__ = ("remoteRegistrationId", "v", "count", "retryTimestamp")
 
     def __init__(self, _id, jid, remoteRegistrationId, receiptTimestamp, retryTimestamp, v = 1, count = 1, participant = None, offline = None):
         super(RetryIncomingReceiptProtocolEntity, self).__init__(_id, jid, receiptTimestamp, offline=offline, type="retry", participant=participant)
@@ -49,9 +50,15 @@ class RetryIncomingReceiptProtocolEntity(IncomingReceiptProtocolEntity):
 
     @staticmethod
     def fromProtocolTreeNode(node):
-        entity = IncomingReceiptProtocolEntity.fromProtocolTreeNode(node)
-        entity.__class__ = RetryIncomingReceiptProtocolEntity
         retryNode = node.getChild("retry")
-        entity.setRetryData(ResultGetKeysIqProtocolEntity._bytesToInt(node.getChild("registration").data), retryNode["v"], retryNode["count"], retryNode["t"])
-
-        return entity
+        return RetryIncomingReceiptProtocolEntity(
+            node["id"],
+            node["from"],
+            ResultGetKeysIqProtocolEntity._bytesToInt(node.getChild("registration").data),
+            node["t"],
+            retryNode["t"],
+            retryNode["v"],
+            retryNode["count"],
+            node["participant"],
+            node["offline"]
+        )
@@ -13,6 +13,7 @@ class RetryOutgoingReceiptProtocolEntity(OutgoingReceiptProtocolEntity):
         </registration>
     </receipt>
     '''
+    __slots__ = ("localRegistrationId", "v", "count", "retryTimestamp")
 
     def __init__(self, _id, jid, localRegistrationId, retryTimestamp, v=1, count=1, participant=None):
         super(RetryOutgoingReceiptProtocolEntity, self).__init__(_id, jid, participant=participant)
@@ -51,13 +52,16 @@ class RetryOutgoingReceiptProtocolEntity(OutgoingReceiptProtocolEntity):
 
     @staticmethod
     def fromProtocolTreeNode(node):
-        entity = OutgoingReceiptProtocolEntity.fromProtocolTreeNode(node)
-        entity.__class__ = RetryOutgoingReceiptProtocolEntity
         retryNode = node.getChild("retry")
-        entity.setRetryData(ResultGetKeysIqProtocolEntity._bytesToInt(node.getChild("registration").data),
-                            retryNode["v"], retryNode["count"], retryNode["t"])
-
-        return entity
+        return RetryOutgoingReceiptProtocolEntity(
+            node["id"],
+            node["to"],
+            ResultGetKeysIqProtocolEntity._bytesToInt(node.getChild("registration").data),
+            retryNode["t"],
+            retryNode["v"],
+            retryNode["count"],
+            node["participant"]
+        )
 
     @staticmethod
     def fromMessageNode(messageNodeToBeRetried, localRegistrationId):
@@ -4,18 +4,70 @@ from .liteprekeystore import LitePreKeyStore
 from .litesessionstore import LiteSessionStore
 from .litesignedprekeystore import LiteSignedPreKeyStore
 from .litesenderkeystore import LiteSenderKeyStore
+from .litesessioncache import LiteSessionCache
+from .liteconnection import LiteConnection
+import os
 import sqlite3
+import threading
+import weakref
 
 
 class LiteAxolotlStore(AxolotlStore):
-    def __init__(self, db):
-        conn = sqlite3.connect(db, check_same_thread=False)
-        conn.text_factory = bytes
-        self.identityKeyStore = LiteIdentityKeyStore(conn)
-        self.preKeyStore = LitePreKeyStore(conn)
-        self.signedPreKeyStore = LiteSignedPreKeyStore(conn)
-        self.sessionStore = LiteSessionStore(conn)
-        self.senderKeyStore = LiteSenderKeyStore(conn)
+    # stores of the same db share their connection, so that their writes join the same transactions,
+    # and their session cache, or they would hand out diverging sessions
+    _connections = weakref.WeakValueDictionary()
+    _sessionCaches = weakref.WeakValueDictionary()
+    _sharedLock = threading.Lock()
+
+    def __init__(self, db, sessionCacheSize=1024, sessionFlushInterval=1.0, sessionFlushDirty=64, callLater=None,
+                 journalMode="WAL", synchronous="NORMAL"):
+        """
+        :param sessionCacheSize: max number of sessions cached in memory, 0 to read and write them straight from db
+        :param sessionFlushInterval: max seconds a stored session stays in memory only, see LiteSessionCache
+        :param sessionFlushDirty: max number of sessions in memory only
+        :param callLater: callLater(delay, fn) flushes of idle sessions are scheduled with
+        :param journalMode: sqlite journal_mode, None to keep the db's
+        :param synchronous: sqlite synchronous, None to keep the default
+        """
+        # every in memory db is a db of its own
+        key = os.path.abspath(db) if db != ":memory:" else None
+        with self.__class__._sharedLock:
+            conn = self.__class__._connections.get(key)
+            if conn is None:
+                conn = sqlite3.connect(db, check_same_thread=False, factory=LiteConnection)
+                conn.text_factory = bytes
+                conn.configure(journalMode, synchronous)
+                if key is not None:
+                    self.__class__._connections[key] = conn
+            self.dbConn = conn
+            self.identityKeyStore = LiteIdentityKeyStore(conn)
+            self.preKeyStore = LitePreKeyStore(conn)
+            self.signedPreKeyStore = LiteSignedPreKeyStore(conn)
+            self.sessionStore = LiteSessionStore(conn)
+            self.senderKeyStore = LiteSenderKeyStore(conn)
+            if sessionCacheSize > 0:
+                sessionCache = self.__class__._sessionCaches.get(key)
+                if sessionCache is None:
+                    sessionCache = LiteSessionCache(self.sessionStore, sessionCacheSize, sessionFlushInterval,
+                                                    sessionFlushDirty, callLater)
+                    if key is not None:
+                        self.__class__._sessionCaches[key] = sessionCache
+                self.sessionStore = sessionCache
+
+    def transaction(self):
+        """
+        Groups the writes made within into one commit:
+
+            with store.transaction():
+                plaintext = sessionCipher.decryptPkmsg(preKeyWhisperMessage)
+        """
+        return self.dbConn.transaction()
+
+    def flush(self):
+        """
+        Writes sessions only held in memory to db
+        """
+        self.sessionStore.flush()
 
     def getIdentityKeyPair(self):
         return self.identityKeyStore.getIdentityKeyPair()
@@ -41,6 +93,9 @@ class LiteAxolotlStore(AxolotlStore):
     def storePreKey(self, preKeyId, preKeyRecord):
         self.preKeyStore.storePreKey(preKeyId, preKeyRecord)
 
+    def storePreKeys(self, preKeyRecords):
+        self.preKeyStore.storePreKeys(preKeyRecords)
+
     def containsPreKey(self, preKeyId):
         return self.preKeyStore.containsPreKey(preKeyId)
 
@@ -59,6 +114,12 @@ class LiteAxolotlStore(AxolotlStore):
     def containsSession(self, recepientId, deviceId):
         return self.sessionStore.containsSession(recepientId, deviceId)
 
+    def containsSessions(self, recepientIds, deviceId=1):
+        """
+        :return: set of the recepientIds there is a session with
+        """
+        return self.sessionStore.containsSessions(recepientIds, deviceId)
+
     def deleteSession(self, recepientId, deviceId):
         self.sessionStore.deleteSession(recepientId, deviceId)
 
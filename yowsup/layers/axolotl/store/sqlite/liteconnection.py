@@ -0,0 +1,70 @@
+import contextlib
+import sqlite3
+
+
+class LiteConnection(sqlite3.Connection):
+    """
+    Connection the lite stores share. Commits they make within transaction() are held back until it ends,
+    so that the writes for one message hit the disk at once.
+
+    State kept outside the db, like LiteSessionCache's, joins the transaction in progress with joinTransaction
+    to be told whether it was committed or rolled back.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(LiteConnection, self).__init__(*args, **kwargs)
+        self.transactionDepth = 0
+        self.participants = []
+
+    def configure(self, journalMode="WAL", synchronous="NORMAL"):
+        """
+        :param journalMode: sqlite journal_mode, WAL lets a commit append to the log instead of rewriting pages
+        :param synchronous: sqlite synchronous, NORMAL in WAL mode only syncs at checkpoints and stays consistent
+        on power loss, though the last commits may be lost
+        """
+        if journalMode is not None:
+            self.execute("PRAGMA journal_mode=%s" % journalMode)
+        if synchronous is not None:
+            self.execute("PRAGMA synchronous=%s" % synchronous)
+
+    def joinTransaction(self, participant):
+        """
+        :param participant: has onTransactionCommitted() called once the transaction in progress is committed,
+        onTransactionRolledBack() if it is rolled back
+        :return: False if there is no transaction in progress to join
+        """
+        if not self.transactionDepth:
+            return False
+        if participant not in self.participants:
+            self.participants.append(participant)
+        return True
+
+    def commit(self):
+        if not self.transactionDepth:
+            super(LiteConnection, self).commit()
+            participants, self.participants = self.participants, []
+            for participant in participants:
+                participant.onTransactionCommitted()
+
+    def rollback(self):
+        # at any depth, sqlite rolls back all of the outermost transaction
+        super(LiteConnection, self).rollback()
+        participants, self.participants = self.participants, []
+        for participant in participants:
+            participant.onTransactionRolledBack()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Groups the writes made within into one commit. Nested transactions join the outermost one, an error
+        rolls back everything written since it began.
+        """
+        self.transactionDepth += 1
+        try:
+            yield self
+        except BaseException:
+            self.transactionDepth -= 1
+            self.rollback()
+            raise
+        self.transactionDepth -= 1
+        self.commit()
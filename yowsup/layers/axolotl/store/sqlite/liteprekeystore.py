@@ -38,6 +38,14 @@ class LitePreKeyStore(PreKeyStore):
         cursor.execute(q, (preKeyId, buffer(serialized) if sys.version_info < (2,7) else serialized))
         self.dbConn.commit()
 
+    def storePreKeys(self, preKeyRecords):
+        q = "INSERT INTO prekeys (prekey_id, record) VALUES(?,?)"
+        cursor = self.dbConn.cursor()
+        cursor.executemany(q, ((preKeyRecord.getId(),
+                                buffer(preKeyRecord.serialize()) if sys.version_info < (2,7) else preKeyRecord.serialize())
+                               for preKeyRecord in preKeyRecords))
+        self.dbConn.commit()
+
     def containsPreKey(self, preKeyId):
         q = "SELECT record FROM prekeys WHERE prekey_id = ?"
         cursor = self.dbConn.cursor()
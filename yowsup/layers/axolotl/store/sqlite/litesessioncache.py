@@ -0,0 +1,202 @@
+from axolotl.state.sessionstore import SessionStore
+from axolotl.state.sessionrecord import SessionRecord
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LiteSessionCache(SessionStore):
+    """
+    LRU of serialized session records in front of a LiteSessionStore.
+
+    Stored sessions are written back: they are kept dirty in memory and written in a single transaction once
+    flushDirty of them piled up, flushInterval seconds after the first of them was stored, or on flush().
+    Dirty records are never evicted before they are written. A flush either writes all dirty records or,
+    if the transaction fails, none of them, which stay dirty for the next flush. Flushes are put off while
+    a LiteConnection.transaction is open, and sessions stored or deleted within one are restored if it is
+    rolled back, so that the cache and the db agree on them.
+
+    Like the records read from db, those handed out by loadSession are copies: changes made to one, by a
+    decryption that fails halfway for instance, are not seen by anyone until it is stored.
+
+    Besides the records, it remembers which sessions exist, whether their record is still cached or not,
+    so containsSession(s) rarely has to query the db.
+    """
+
+    def __init__(self, sessionStore, size=1024, flushInterval=1.0, flushDirty=64, callLater=None):
+        """
+        :param sessionStore: LiteSessionStore records are read from and written back to
+        :param size: max number of clean records kept
+        :param flushInterval: max seconds a stored session stays unwritten, 0 to write sessions as they are stored
+        :param flushDirty: max number of unwritten sessions
+        :param callLater: callLater(delay, fn) used to flush idle caches on time, like YowStack.callLater.
+        Without it, due flushes happen on the next access
+        """
+        self.sessionStore = sessionStore
+        self.size = size
+        self.flushInterval = flushInterval
+        self.flushDirty = flushDirty
+        self.callLater = callLater
+        self.records = collections.OrderedDict()
+        self.dirty = set()
+        # (recipientId, deviceId) of sessions known to exist
+        self.known = set()
+        self.dirtySince = None
+        self.flushTimer = None
+        # key -> (serialized record, dirty, known) as before the transaction in progress changed it
+        self.undo = {}
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def loadSession(self, recipientId, deviceId):
+        key = (recipientId, deviceId)
+        with self.lock:
+            self.flushIfDue()
+            serialized = self.records.get(key)
+            if serialized is not None:
+                self.records.move_to_end(key)
+                return SessionRecord(serialized=serialized)
+            serialized = self.sessionStore.getSerializedSession(recipientId, deviceId)
+            if serialized is None:
+                # not cached, containsSession has to keep telling it doesn't exist
+                return SessionRecord()
+            self.records[key] = serialized
+            self.known.add(key)
+            self.evict()
+            return SessionRecord(serialized=serialized)
+
+    def getSubDeviceSessions(self, recipientId):
+        with self.lock:
+            deviceIds = set(self.sessionStore.getSubDeviceSessions(recipientId))
+            deviceIds.update(deviceId for _recipientId, deviceId in self.dirty if _recipientId == recipientId)
+            return list(deviceIds)
+
+    def storeSession(self, recipientId, deviceId, sessionRecord):
+        key = (recipientId, deviceId)
+        with self.lock:
+            self.remember([key])
+            self.records[key] = sessionRecord.serialize()
+            self.records.move_to_end(key)
+            self.dirty.add(key)
+            self.known.add(key)
+            if self.dirtySince is None:
+                self.dirtySince = time.monotonic()
+                if self.callLater is not None and self.flushInterval > 0:
+                    self.flushTimer = self.callLater(self.flushInterval, self.flush)
+            if len(self.dirty) >= self.flushDirty or self.flushInterval <= 0:
+                self.flush()
+            else:
+                self.flushIfDue()
+            self.evict()
+
+    def containsSession(self, recipientId, deviceId):
+        key = (recipientId, deviceId)
+        with self.lock:
+            if key in self.known:
+                return True
+            if self.sessionStore.containsSession(recipientId, deviceId):
+                self.known.add(key)
+                return True
+            return False
+
+    def containsSessions(self, recipientIds, deviceId=1):
+        """
+        :return: set of the recipientIds there is a session with, looked up in one query
+        """
+        with self.lock:
+            found = set(recipientId for recipientId in recipientIds if (recipientId, deviceId) in self.known)
+            unknown = [recipientId for recipientId in recipientIds if recipientId not in found]
+            if unknown:
+                for recipientId in self.sessionStore.containsSessions(unknown, deviceId):
+                    self.known.add((recipientId, deviceId))
+                    found.add(recipientId)
+            return found
+
+    def deleteSession(self, recipientId, deviceId):
+        key = (recipientId, deviceId)
+        with self.lock:
+            self.remember([key])
+            self.records.pop(key, None)
+            self.dirty.discard(key)
+            self.known.discard(key)
+            self.sessionStore.deleteSession(recipientId, deviceId)
+
+    def deleteAllSessions(self, recipientId):
+        with self.lock:
+            self.remember(set(key for key in self.records if key[0] == recipientId) |
+                          set(key for key in self.known if key[0] == recipientId))
+            for key in [key for key in self.records if key[0] == recipientId]:
+                del self.records[key]
+                self.dirty.discard(key)
+            self.known = set(key for key in self.known if key[0] != recipientId)
+            self.sessionStore.deleteAllSessions(recipientId)
+
+    def remember(self, keys):
+        joinTransaction = getattr(self.sessionStore.dbConn, "joinTransaction", None)
+        if joinTransaction is None or not joinTransaction(self):
+            return
+        for key in keys:
+            if key not in self.undo:
+                self.undo[key] = (self.records.get(key), key in self.dirty, key in self.known)
+
+    def onTransactionCommitted(self):
+        with self.lock:
+            self.undo.clear()
+
+    def onTransactionRolledBack(self):
+        with self.lock:
+            for key, (serialized, dirty, known) in self.undo.items():
+                if serialized is not None:
+                    self.records[key] = serialized
+                else:
+                    self.records.pop(key, None)
+                for keys, present in ((self.dirty, dirty), (self.known, known)):
+                    if present:
+                        keys.add(key)
+                    else:
+                        keys.discard(key)
+            self.undo.clear()
+
+    def flushIfDue(self):
+        if self.dirtySince is not None and time.monotonic() - self.dirtySince >= self.flushInterval:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all dirty sessions in one transaction
+        """
+        with self.lock:
+            if getattr(self.sessionStore.dbConn, "transactionDepth", 0):
+                # records written within a transaction that is rolled back would be lost, the timer or the next
+                # access after the transaction flushes them
+                return
+            if self.flushTimer is not None:
+                self.flushTimer.cancel()
+                self.flushTimer = None
+            if not self.dirty:
+                self.dirtySince = None
+                return
+            dirty = list(self.dirty)
+            try:
+                self.sessionStore.storeSerializedSessions([key + (self.records[key],) for key in dirty])
+            except Exception as e:
+                logger.error("Could not write %d sessions, will retry on next flush: %s" % (len(dirty), e))
+                return
+            logger.debug("Wrote %d sessions" % len(dirty))
+            self.dirty.clear()
+            self.dirtySince = None
+            self.evict()
+
+    def evict(self):
+        if len(self.records) <= self.size:
+            return
+        for key in list(self.records):
+            if len(self.records) <= self.size:
+                break
+            if key not in self.dirty:
+                del self.records[key]
@@ -2,6 +2,9 @@ from axolotl.state.sessionstore import SessionStore
 from axolotl.state.sessionrecord import SessionRecord
 import sys
 class LiteSessionStore(SessionStore):
+    # host parameters per query, old sqlite builds allow no more than 999
+    MAX_VARIABLES = 500
+
     def __init__(self, dbConn):
         """
         :type dbConn: Connection
@@ -12,15 +15,27 @@ class LiteSessionStore(SessionStore):
 
 
     def loadSession(self, recipientId, deviceId):
+        return self.getSession(recipientId, deviceId) or SessionRecord()
+
+    def getSession(self, recipientId, deviceId):
+        """
+        :return: the stored SessionRecord, None if there is none
+        """
+        serialized = self.getSerializedSession(recipientId, deviceId)
+        if serialized is not None:
+            return SessionRecord(serialized=serialized)
+
+    def getSerializedSession(self, recipientId, deviceId):
+        """
+        :return: the stored record as serialized, None if there is none
+        """
         q = "SELECT record FROM sessions WHERE recipient_id = ? AND device_id = ?"
         c = self.dbConn.cursor()
         c.execute(q, (recipientId, deviceId))
         result = c.fetchone()
 
         if result:
-            return SessionRecord(serialized=result[0])
-        else:
-            return SessionRecord()
+            return result[0]
 
     def getSubDeviceSessions(self, recipientId):
         q = "SELECT device_id from sessions WHERE recipient_id = ?"
@@ -32,22 +47,64 @@ class LiteSessionStore(SessionStore):
         return deviceIds
 
     def storeSession(self, recipientId, deviceId, sessionRecord):
-        self.deleteSession(recipientId, deviceId)
+        self.storeSessions([(recipientId, deviceId, sessionRecord)])
+
+    def storeSessions(self, sessions):
+        """
+        Stores all sessions in one transaction
+        :param sessions: (recipientId, deviceId, sessionRecord) tuples
+        """
+        self.storeSerializedSessions([(recipientId, deviceId, sessionRecord.serialize())
+                                      for recipientId, deviceId, sessionRecord in sessions])
 
+    def storeSerializedSessions(self, sessions):
+        """
+        :param sessions: (recipientId, deviceId, serialized record) tuples
+        """
+        d = "DELETE FROM sessions WHERE recipient_id = ? AND device_id = ?"
         q = "INSERT INTO sessions(recipient_id, device_id, record) VALUES(?,?,?)"
         c = self.dbConn.cursor()
-        serialized = sessionRecord.serialize()
-        c.execute(q, (recipientId, deviceId, buffer(serialized) if sys.version_info < (2,7) else serialized))
+        try:
+            for recipientId, deviceId, serialized in sessions:
+                c.execute(d, (recipientId, deviceId))
+                c.execute(q, (recipientId, deviceId, buffer(serialized) if sys.version_info < (2,7) else serialized))
+        except Exception:
+            self.dbConn.rollback()
+            raise
         self.dbConn.commit()
 
+    def flush(self):
+        # sessions are written as they are stored
+        pass
+
     def containsSession(self, recipientId, deviceId):
-        q = "SELECT record FROM sessions WHERE recipient_id = ? AND device_id = ?"
+        q = "SELECT 1 FROM sessions WHERE recipient_id = ? AND device_id = ?"
         c = self.dbConn.cursor()
         c.execute(q, (recipientId, deviceId))
         result = c.fetchone()
 
         return result is not None
 
+    def containsSessions(self, recipientIds, deviceId=1):
+        """
+        :return: set of the recipientIds there is a session with
+        """
+        # recipient ids come back as stored, numbers as ints
+        byKey = dict((str(recipientId), recipientId) for recipientId in recipientIds)
+        pending = list(byKey.values())
+        found = set()
+        c = self.dbConn.cursor()
+        for i in range(0, len(pending), self.__class__.MAX_VARIABLES):
+            chunk = pending[i:i + self.__class__.MAX_VARIABLES]
+            q = "SELECT recipient_id FROM sessions WHERE device_id = ? AND recipient_id IN (%s)" % \
+                ",".join("?" * len(chunk))
+            c.execute(q, [deviceId] + chunk)
+            for row in c.fetchall():
+                key = row[0].decode() if type(row[0]) is bytes else str(row[0])
+                if key in byKey:
+                    found.add(byKey[key])
+        return found
+
     def deleteSession(self, recipientId, deviceId):
         q = "DELETE FROM sessions WHERE recipient_id = ? AND device_id = ?"
         self.dbConn.cursor().execute(q, (recipientId, deviceId))
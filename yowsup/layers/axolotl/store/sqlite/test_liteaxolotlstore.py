@@ -0,0 +1,114 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from axolotl.state.sessionrecord import SessionRecord
+from axolotl.util.keyhelper import KeyHelper
+
+from yowsup.layers.axolotl.store.sqlite.liteaxolotlstore import LiteAxolotlStore
+
+
+class LiteAxolotlStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmpDir, "axolotl.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def count(self, table):
+        conn = sqlite3.connect(self.db)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM %s" % table).fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_configure(self):
+        store = LiteAxolotlStore(self.db)
+        self.assertEqual(store.dbConn.execute("PRAGMA journal_mode").fetchone()[0], b"wal")
+        # NORMAL
+        self.assertEqual(store.dbConn.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+    def test_store_prekeys(self):
+        store = LiteAxolotlStore(self.db)
+        preKeys = KeyHelper.generatePreKeys(1, 20)
+        store.storePreKeys(preKeys)
+        self.assertEqual(self.count("prekeys"), 20)
+        self.assertEqual(store.loadPreKey(preKeys[5].getId()).serialize(), preKeys[5].serialize())
+
+    def test_transaction(self):
+        store = LiteAxolotlStore(self.db, sessionCacheSize=0)
+        identityKeyPair = KeyHelper.generateIdentityKeyPair()
+        with store.transaction():
+            store.storeLocalData(1, identityKeyPair)
+            with store.transaction():
+                store.storePreKeys(KeyHelper.generatePreKeys(1, 2))
+            store.storeSession(1, 1, SessionRecord())
+            # other connections see nothing before the outermost transaction ends
+            self.assertEqual(self.count("prekeys"), 0)
+        self.assertEqual((self.count("identities"), self.count("prekeys"), self.count("sessions")), (1, 2, 1))
+
+        with self.assertRaises(ValueError):
+            with store.transaction():
+                store.removePreKey(1)
+                store.deleteSession(1, 1)
+                raise ValueError()
+        self.assertEqual((self.count("prekeys"), self.count("sessions")), (2, 1))
+        self.assertEqual(store.dbConn.transactionDepth, 0)
+
+    def test_flush_after_transaction(self):
+        store = LiteAxolotlStore(self.db, sessionFlushDirty=1)
+        with store.transaction():
+            store.storeSession(1, 1, SessionRecord())
+            self.assertEqual(self.count("sessions"), 0)
+        self.assertTrue(store.containsSession(1, 1))
+        store.flush()
+        self.assertEqual(self.count("sessions"), 1)
+
+    def test_rollback_sessions(self):
+        store = LiteAxolotlStore(self.db, sessionFlushInterval=60)
+        kept, changed = SessionRecord(), SessionRecord()
+        store.storeSession(1, 1, kept)
+        store.storeSession(2, 1, changed)
+        store.flush()
+        changed.archiveCurrentState()
+        store.storeSession(2, 1, changed)
+        with self.assertRaises(ValueError):
+            with store.transaction():
+                store.storeSession(2, 1, SessionRecord())
+                store.storeSession(3, 1, SessionRecord())
+                store.deleteAllSessions(1)
+                store.storePreKeys(KeyHelper.generatePreKeys(1, 2))
+                raise ValueError()
+        self.assertEqual(store.containsSessions([1, 2, 3]), set([1, 2]))
+        self.assertEqual(store.loadSession(1, 1).serialize(), kept.serialize())
+        self.assertEqual(store.loadSession(2, 1).serialize(), changed.serialize())
+        store.flush()
+        # cache and db agree
+        conn = sqlite3.connect(self.db)
+        try:
+            rows = dict(conn.execute("SELECT recipient_id, record FROM sessions").fetchall())
+        finally:
+            conn.close()
+        self.assertEqual(rows, {1: kept.serialize(), 2: changed.serialize()})
+        self.assertEqual(self.count("prekeys"), 0)
+
+    def test_contains_sessions(self):
+        store = LiteAxolotlStore(self.db, sessionCacheSize=0)
+        recipientIds = ["49%010d" % i for i in range(0, 1200)] + ["491000000000-1500000000"]
+        for recipientId in recipientIds[::3]:
+            store.storeSession(recipientId, 1, SessionRecord())
+        store.storeSession(recipientIds[1], 2, SessionRecord())
+        self.assertEqual(store.containsSessions(recipientIds), set(recipientIds[::3]))
+        self.assertEqual(store.containsSessions([]), set())
+
+    def test_shared_connection(self):
+        stores = [LiteAxolotlStore(self.db) for _ in range(0, 2)]
+        self.assertIs(stores[0].dbConn, stores[1].dbConn)
+        self.assertIsNot(LiteAxolotlStore(":memory:").dbConn, LiteAxolotlStore(":memory:").dbConn)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from axolotl.state.sessionrecord import SessionRecord
+
+from yowsup.layers.axolotl.store.sqlite.liteaxolotlstore import LiteAxolotlStore
+from yowsup.layers.axolotl.store.sqlite.litesessioncache import LiteSessionCache
+from yowsup.layers.axolotl.store.sqlite.litesessionstore import LiteSessionStore
+
+
+class CountingConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super(CountingConnection, self).__init__(*args, **kwargs)
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+        super(CountingConnection, self).commit()
+
+
+class LiteSessionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmpDir, "axolotl.db")
+        self.conn = sqlite3.connect(self.db, factory=CountingConnection)
+        self.conn.text_factory = bytes
+        self.sessionStore = LiteSessionStore(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.tmpDir)
+
+    def getStoredIds(self):
+        conn = sqlite3.connect(self.db)
+        try:
+            return sorted(r[0] for r in conn.execute("SELECT recipient_id FROM sessions"))
+        finally:
+            conn.close()
+
+    def test_write_back(self):
+        cache = LiteSessionCache(self.sessionStore, flushInterval=60, flushDirty=3)
+        records = [SessionRecord() for _ in range(0, 3)]
+        cache.storeSession(1, 1, records[0])
+        cache.storeSession(2, 1, records[1])
+        self.assertEqual(cache.loadSession(1, 1).serialize(), records[0].serialize())
+        self.assertTrue(cache.containsSession(2, 1))
+        self.assertEqual(self.getStoredIds(), [])
+
+        commits = self.conn.commits
+        cache.storeSession(3, 1, records[2])
+        self.assertEqual(self.getStoredIds(), [1, 2, 3])
+        self.assertEqual(self.conn.commits - commits, 1)
+
+    def test_copies(self):
+        cache = LiteSessionCache(self.sessionStore, flushInterval=60)
+        record = SessionRecord()
+        cache.storeSession(1, 1, record)
+        serialized = record.serialize()
+        record.archiveCurrentState()
+        loaded = cache.loadSession(1, 1)
+        self.assertIsNot(loaded, record)
+        self.assertEqual(loaded.serialize(), serialized)
+        # like a decryption that fails after processing the record
+        loaded.archiveCurrentState()
+        self.assertEqual(cache.loadSession(1, 1).serialize(), serialized)
+
+    def test_flush_interval(self):
+        calls = []
+        cache = LiteSessionCache(self.sessionStore, flushInterval=0.05, callLater=lambda *args: calls.append(args))
+        cache.storeSession(1, 1, SessionRecord())
+        cache.storeSession(2, 1, SessionRecord())
+        self.assertEqual(calls, [(0.05, cache.flush)])
+        time.sleep(0.06)
+        cache.loadSession(3, 1)
+        self.assertEqual(self.getStoredIds(), [1, 2])
+
+    def test_lru(self):
+        cache = LiteSessionCache(self.sessionStore, size=2, flushInterval=60, flushDirty=2)
+        for recipientId in range(1, 4):
+            cache.storeSession(recipientId, 1, SessionRecord())
+        self.assertEqual(self.getStoredIds(), [1, 2])
+        # dirty records stay until written
+        self.assertEqual(list(cache.records), [(2, 1), (3, 1)])
+        cache.flush()
+        cache.loadSession(1, 1)
+        self.assertEqual(list(cache.records), [(3, 1), (1, 1)])
+        self.assertFalse(cache.containsSession(4, 1))
+        self.assertNotIn((4, 1), cache.records)
+
+    def test_contains_sessions(self):
+        self.sessionStore.storeSession("491000000001", 1, SessionRecord())
+        cache = LiteSessionCache(self.sessionStore, size=1, flushInterval=60)
+        cache.storeSession("491000000002", 1, SessionRecord())
+        cache.storeSession("491000000003", 1, SessionRecord())
+        recipientIds = ["491000000001", "491000000002", "491000000003", "491000000004"]
+        self.assertEqual(cache.containsSessions(recipientIds), set(recipientIds[:3]))
+        self.assertEqual(cache.known, set((recipientId, 1) for recipientId in recipientIds[:3]))
+
+        self.conn.execute("DELETE FROM sessions")
+        # answered from memory
+        self.assertEqual(cache.containsSessions(recipientIds[:3]), set(recipientIds[:3]))
+        self.assertTrue(cache.containsSession("491000000001", 1))
+        cache.deleteAllSessions("491000000001")
+        self.assertEqual(cache.containsSessions(recipientIds), set(recipientIds[1:3]))
+
+    def test_delete(self):
+        cache = LiteSessionCache(self.sessionStore, flushInterval=60)
+        cache.storeSession(1, 1, SessionRecord())
+        cache.storeSession(1, 2, SessionRecord())
+        self.assertEqual(sorted(cache.getSubDeviceSessions(1)), [1, 2])
+        cache.deleteSession(1, 2)
+        cache.flush()
+        self.assertEqual(cache.getSubDeviceSessions(1), [1])
+        cache.deleteAllSessions(1)
+        self.assertFalse(cache.containsSession(1, 1))
+        self.assertEqual(self.getStoredIds(), [])
+
+    def test_failed_flush(self):
+        cache = LiteSessionCache(self.sessionStore, flushInterval=60)
+        cache.storeSession(1, 1, SessionRecord())
+        self.conn.execute("DROP TABLE sessions")
+        cache.flush()
+        self.assertEqual(cache.dirty, {(1, 1)})
+        # recreates the table
+        LiteSessionStore(self.conn)
+        cache.flush()
+        self.assertEqual(cache.dirty, set())
+        self.assertEqual(self.getStoredIds(), [1])
+
+    def test_shared_by_stores(self):
+        stores = [LiteAxolotlStore(self.db, sessionFlushInterval=60) for _ in range(0, 2)]
+        record = SessionRecord()
+        stores[0].storeSession(1, 1, record)
+        self.assertEqual(stores[1].loadSession(1, 1).serialize(), record.serialize())
+        stores[1].flush()
+        self.assertEqual(self.getStoredIds(), [1])
+        self.assertIsInstance(LiteAxolotlStore(self.db, sessionCacheSize=0).sessionStore, LiteSessionStore)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import time
+import unittest
+
+from yowsup.layers import YowProtocolLayer
+from yowsup.layers.axolotl.keyfetcher import AxolotlKeyFetcher
+from yowsup.layers.axolotl.props import PROP_KEYS_FETCH_MAX, PROP_KEYS_FETCH_WINDOW
+from yowsup.stacks import YowStack
+from yowsup.structs import ProtocolTreeNode
+
+
+class KeysLayer(YowProtocolLayer):
+    """
+    Stands in for an axolotl layer: records the iqs sent and succeeds for every jid but untrusted ones
+    """
+
+    def __init__(self):
+        super(KeysLayer, self).__init__()
+        self.iqs = []
+        self.processed = []
+
+    def _sendIq(self, entity, onSuccess, onError):
+        self.iqs.append((entity, onSuccess, onError))
+
+    def processKeys(self, resultEntity, jids):
+        self.processed.extend(jids)
+        return [jid for jid in jids if "untrusted" not in jid], \
+            dict((jid, Exception()) for jid in jids if "untrusted" in jid)
+
+    def respond(self, index, error=False):
+        entity, onSuccess, onError = self.iqs[index]
+        if error:
+            onError(ProtocolTreeNode("iq", {"id": entity.getId(), "type": "error"}), entity)
+        else:
+            onSuccess(ProtocolTreeNode("iq", {"id": entity.getId(), "type": "result"}, [ProtocolTreeNode("list")]),
+                      entity)
+
+
+class AxolotlKeyFetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.stack = YowStack((KeysLayer,), reversed=False)
+        self.layer = self.stack.getLayer(0)
+        self.fetcher = AxolotlKeyFetcher(self.layer)
+        self.results = []
+
+    def fetch(self, jids, name):
+        self.fetcher.fetch(jids, lambda successJids, errorJids: self.results.append((name, successJids, errorJids)),
+                           lambda errorNode, entity: self.results.append((name, "error")))
+
+    def test_coalesce(self):
+        self.stack.setProp(PROP_KEYS_FETCH_WINDOW, 60)
+        self.fetch(["a@s.whatsapp.net"], "first")
+        self.fetch(["a@s.whatsapp.net", "b@s.whatsapp.net"], "second")
+        self.assertEqual(self.layer.iqs, [])
+        self.fetcher.flush()
+        self.assertEqual(len(self.layer.iqs), 1)
+        self.assertEqual(self.layer.iqs[0][0].getJids(), ["a@s.whatsapp.net", "b@s.whatsapp.net"])
+
+        # keys for a are on their way, c gets an iq of its own
+        self.fetch(["a@s.whatsapp.net", "c@s.whatsapp.net"], "third")
+        self.fetcher.flush()
+        self.assertEqual(self.layer.iqs[1][0].getJids(), ["c@s.whatsapp.net"])
+
+        self.layer.respond(0)
+        self.assertEqual(self.results, [("first", ["a@s.whatsapp.net"], {}),
+                                        ("second", ["a@s.whatsapp.net", "b@s.whatsapp.net"], {})])
+        self.layer.respond(1)
+        self.assertEqual(self.results[2], ("third", ["a@s.whatsapp.net", "c@s.whatsapp.net"], {}))
+        self.assertEqual(self.layer.processed, ["a@s.whatsapp.net", "b@s.whatsapp.net", "c@s.whatsapp.net"])
+
+    def test_window(self):
+        self.stack.setProp(PROP_KEYS_FETCH_WINDOW, 0.01)
+        self.fetch(["a@s.whatsapp.net"], "first")
+        self.fetch(["b@s.whatsapp.net"], "second")
+        expired = self.stack.scheduler.wheel.advance(time.monotonic() + 1)
+        self.assertEqual(len(expired), 1)
+        expired[0].run()
+        self.assertEqual(len(self.layer.iqs), 1)
+
+    def test_chunks(self):
+        self.stack.setProp(PROP_KEYS_FETCH_MAX, 2)
+        self.stack.setProp(PROP_KEYS_FETCH_WINDOW, 60)
+        self.fetch(["%d@s.whatsapp.net" % i for i in range(0, 5)], "all")
+        self.assertEqual([len(entity.getJids()) for entity, _, _ in self.layer.iqs], [2, 2, 1])
+        self.layer.respond(0)
+        self.layer.respond(2, error=True)
+        self.assertEqual(self.results, [])
+        self.layer.respond(1)
+        self.assertEqual(self.results, [("all", "error")])
+
+    def test_clear(self):
+        self.stack.setProp(PROP_KEYS_FETCH_WINDOW, 60)
+        self.fetch(["a@s.whatsapp.net"], "first")
+        self.fetcher.clear()
+        self.assertEqual(self.results, [("first", "error")])
+        self.assertEqual(self.fetcher.waiters, {})
+
+    def test_errors(self):
+        self.stack.setProp(PROP_KEYS_FETCH_WINDOW, 0)
+        self.fetch(["a@s.whatsapp.net", "untrusted@s.whatsapp.net"], "first")
+        self.layer.respond(0)
+        self.assertEqual(self.results[0][1], ["a@s.whatsapp.net"])
+        self.assertEqual(list(self.results[0][2]), ["untrusted@s.whatsapp.net"])
+        self.fetch([], "none")
+        self.assertEqual(self.results[1], ("none", [], {}))
+
+    def test_process_error(self):
+        self.stack.setProp(PROP_KEYS_FETCH_WINDOW, 0)
+
+        def processKeys(resultEntity, jids):
+            raise ValueError("bad signature")
+        self.layer.processKeys = processKeys
+        self.fetch(["a@s.whatsapp.net", "b@s.whatsapp.net"], "first")
+        self.layer.respond(0)
+        self.assertEqual(self.results[0][1], [])
+        self.assertEqual(sorted(self.results[0][2]), ["a@s.whatsapp.net", "b@s.whatsapp.net"])
+        self.assertEqual(self.fetcher.waiters, {})
+        # not stuck behind the failed fetch
+        self.fetch(["a@s.whatsapp.net"], "second")
+        self.assertEqual(len(self.layer.iqs), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
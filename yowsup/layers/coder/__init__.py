@@ -1 +1 @@
-from .layer import YowCoderLayer
\ No newline at end of file
+from .layer import YowCoderLayer, YowStreamPreamble
\ No newline at end of file
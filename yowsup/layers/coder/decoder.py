@@ -1,26 +1,44 @@
 from yowsup.structs import ProtocolTreeNode
-import math
-import binascii
-import sys
 
 
 class ReadDecoder:
+    """
+    Decodes a single stanza by walking a memoryview of it with an integer offset,
+    so reading never shifts or copies the underlying buffer.
+    """
+
     def __init__(self, tokenDictionary):
         self.streamStarted = False
         self.tokenDictionary = tokenDictionary
+        self.data = None
+        self.offset = 0
 
     def reset(self):
         self.streamStarted = False
 
     def getProtocolTreeNode(self, data):
-        if not self.streamStarted:
-            return self.streamStart(data)
-        return self.nextTreeInternal(data)
+        self.data = self.toMemoryView(data)
+        self.offset = 0
+        try:
+            if not self.streamStarted:
+                return self.streamStart()
+            return self.nextTreeInternal()
+        finally:
+            # drop our reference so the caller is free to resize/reuse its buffer
+            self.data = None
 
-    def getToken(self, index, data):
+    @staticmethod
+    def toMemoryView(data):
+        if type(data) is memoryview:
+            return data if data.format == 'B' else data.cast('B')
+        if type(data) in (bytes, bytearray):
+            return memoryview(data)
+        return memoryview(bytearray(data))
+
+    def getToken(self, index):
         token = self.tokenDictionary.getToken(index)
         if not token:
-            index = self.readInt8(data)
+            index = self.readInt8()
             token = self.tokenDictionary.getToken(index, True)
             if not token:
                 raise ValueError("Invalid token %s" % token)
@@ -35,29 +53,29 @@ class ReadDecoder:
 
         return token
 
-    def streamStart(self, data):
+    def streamStart(self):
         self.streamStarted = True
-        tag = data.pop(0)
-        size = self.readListSize(tag, data)
-        tag = data.pop(0)
+        tag = self.readInt8()
+        size = self.readListSize(tag)
+        tag = self.readInt8()
 
         if tag != 1:
             if tag == 236:
-                tag = data.pop(0) + 237
-            token = self.getToken(tag, data)
+                tag = self.readInt8() + 237
+            token = self.getToken(tag)
             raise Exception("expecting STREAM_START in streamStart, instead got token: %s" % token)
         attribCount = (size - 2 + size % 2) / 2
-        self.readAttributes(attribCount, data)
+        self.readAttributes(attribCount)
 
-    def readNibble(self, data):
-        _byte = self.readInt8(data)
+    def readNibble(self):
+        _byte = self.readInt8()
         ignoreLastNibble = bool(_byte & 0x80)
         size = (_byte & 0x7f)
         nrOfNibbles = size * 2 - int(ignoreLastNibble)
-        dataArr = self.readArray(size, data)
+        dataArr = self.readArray(size)
         string = ''
         for i in range(0, nrOfNibbles):
-            _byte = dataArr[int(math.floor(i / 2))]
+            _byte = dataArr[i // 2]
             _shift = 4 * (1 - i % 2)
             dec = (_byte & (15 << _shift)) >> _shift
 
@@ -69,27 +87,23 @@ class ReadDecoder:
                 raise Exception("Bad nibble %s" % dec)
         return string
 
-    def readPacked8(self, n, data):
-        size = self.readInt8(data)
+    def readPacked8(self, n):
+        size = self.readInt8()
         remove = 0
         if (size & 0x80) != 0 and n == 251:
             remove = 1
         size = size & 0x7F
-        text = bytearray(self.readArray(size, data))
-        hexData = binascii.hexlify(str(text) if sys.version_info < (2, 7) else text).upper()
-        dataSize = len(hexData)
-        out = []
-        if remove == 0:
-            for i in range(0, dataSize):
-                char = chr(hexData[i]) if type(hexData[i]) is int else hexData[i]  # python2/3 compat
-                val = ord(binascii.unhexlify("0%s" % char))
-                if i == (dataSize - 1) and val > 11 and n != 251:
-                    continue
-                out.append(self.unpackByte(n, val))
-        else:
-            out = map(ord, list(hexData[0: -remove])) if sys.version_info < (3, 0) else list(hexData[0: -remove])
+        nibbles = []
+        for _byte in self.readArray(size):
+            nibbles.append(_byte >> 4)
+            nibbles.append(_byte & 0x0F)
 
-        return out
+        if remove:
+            nibbles = nibbles[:-remove]
+        elif nibbles and nibbles[-1] > 11 and n != 251:
+            nibbles = nibbles[:-1]
+
+        return "".join([chr(self.unpackByte(n, nibble)) for nibble in nibbles])
 
     def unpackByte(self, n, n2):
         if n == 251:
@@ -100,16 +114,16 @@ class ReadDecoder:
 
     @staticmethod
     def unpackHex(n):
-        if n in range(0, 10):
+        if 0 <= n < 10:
             return n + 48
-        if n in range(10, 16):
+        if 10 <= n < 16:
             return 65 + (n - 10)
 
         raise ValueError("bad hex %s" % n)
 
     @staticmethod
     def unpackNibble(n):
-        if n in range(0, 10):
+        if 0 <= n < 10:
             return n + 48
         if n in (10, 11):
             return 45 + (n - 10)
@@ -126,80 +140,60 @@ class ReadDecoder:
 
         return ret
 
-    @staticmethod
-    def readInt8(data):
-        return data.pop(0)
+    def readInt8(self):
+        value = self.data[self.offset]
+        self.offset += 1
+        return value
 
-    @staticmethod
-    def readInt16(data):
-        intTop = data.pop(0)
-        intBot = data.pop(0)
-        value = (intTop << 8) + intBot
-        if value is not None:
-            return value
-        else:
-            return ""
+    def readInt16(self):
+        return int.from_bytes(self.readArray(2), 'big')
 
-    @staticmethod
-    def readInt20(data):
-        int1 = data.pop(0)
-        int2 = data.pop(0)
-        int3 = data.pop(0)
-        return ((int1 & 0xF) << 16) | (int2 << 8) | int3
+    def readInt20(self):
+        return int.from_bytes(self.readArray(3), 'big') & 0xFFFFF
 
-    @staticmethod
-    def readInt24(data):
-        int1 = data.pop(0)
-        int2 = data.pop(0)
-        int3 = data.pop(0)
-        value = (int1 << 16) + (int2 << 8) + (int3 << 0)
-        return value
+    def readInt24(self):
+        return int.from_bytes(self.readArray(3), 'big')
 
-    @staticmethod
-    def readInt31(data):
-        data.pop(0)
-        int1 = data.pop(0)
-        int2 = data.pop(0)
-        int3 = data.pop(0)
-        return (int1 << 24) | (int1 << 16) | int2 << 8 | int3
-
-    def readListSize(self, token, data):
+    def readInt31(self):
+        return int.from_bytes(self.readArray(4), 'big') & 0x7FFFFFFF
+
+    def readListSize(self, token):
         if token == 0:
             size = 0
         else:
             if token == 248:
-                size = self.readInt8(data)
+                size = self.readInt8()
             else:
                 if token == 249:
-                    size = self.readInt16(data)
+                    size = self.readInt16()
                 else:
                     raise Exception("invalid list size in readListSize: token " + str(token))
         return size
 
-    def readAttributes(self, attribCount, data):
+    def readAttributes(self, attribCount):
         attribs = {}
         for i in range(0, int(attribCount)):
-            key = self.readString(self.readInt8(data), data)
-            value = self.readString(self.readInt8(data), data)
+            key = self.readString(self.readInt8())
+            value = self.readString(self.readInt8())
             attribs[key] = value
         return attribs
 
-    def readString(self, token, data):
+    def readString(self, token):
         if token == -1:
             raise Exception("-1 token in readString")
 
         if 2 < token < 236:
-            return self.getToken(token, data)
+            return self.getToken(token)
 
         if token == 0:
             return None
 
         if token in (236, 237, 238, 239):
-            return self.getTokenDouble(token - 236, self.readInt8(data))
+            return self.getTokenDouble(token - 236, self.readInt8())
 
         if token == 250:
-            user = self.readString(data.pop(0), data)
-            server = self.readString(data.pop(0), data)
+            user = self.readString(self.readInt8())
+            server = self.readString(self.readInt8())
             if user is not None and server is not None:
                 return user + "@" + server
             if server is not None:
@@ -207,82 +201,74 @@ class ReadDecoder:
             raise Exception("readString couldn't reconstruct jid")
 
         if token in (251, 255):
-            return "".join(map(chr, self.readPacked8(token, data)))
+            return self.readPacked8(token)
 
         if token == 252:
-            size8 = self.readInt8(data)
-            buf8 = self.readArray(size8, data)
-            return "".join(map(chr, buf8))
+            return self.readLatin1(self.readInt8())
 
         if token == 253:
-            size20 = self.readInt20(data)
-            buf20 = self.readArray(size20, data)
-            return "".join(map(chr, buf20))
+            return self.readLatin1(self.readInt20())
 
         if token == 254:
-            size31 = self.readInt31(data)
-            buf31 = self.readArray(size31, data)
-            return "".join(map(chr, buf31))
+            return self.readLatin1(self.readInt31())
 
         raise Exception("readString couldn't match token " + str(token))
 
-    @staticmethod
-    def readArray(length, data):
-        out = []
-        for i in range(0, length):
-            out.append(data.pop(0))
-
-        return out
-
-    def nextTreeInternal(self, data):
-        size = self.readListSize(self.readInt8(data), data)
-        token = self.readInt8(data)
+    def readArray(self, length):
+        start = self.offset
+        end = start + length
+        if end > len(self.data):
+            raise IndexError("readArray past end of data: wanted %s bytes, %s left" % (length, len(self.data) - start))
+        self.offset = end
+        return self.data[start:end]
+
+    def readLatin1(self, length):
+        # every byte maps to the code point of the same value, decoded straight off the view
+        return str(self.readArray(length), 'latin-1')
+
+    def nextTreeInternal(self):
+        size = self.readListSize(self.readInt8())
+        token = self.readInt8()
         if token == 1:
-            token = self.readInt8(data)
+            token = self.readInt8()
 
         if token == 2:
             return None
 
-        tag = self.readString(token, data)
+        tag = self.readString(token)
 
         if size == 0 or tag is None:
             raise ValueError("nextTree sees 0 list or null tag")
 
         attribCount = (size - 2 + size % 2) / 2
-        attribs = self.readAttributes(attribCount, data)
+        attribs = self.readAttributes(attribCount)
         if size % 2 == 1:
             return ProtocolTreeNode(tag, attribs)
 
-        read2 = self.readInt8(data)
+        read2 = self.readInt8()
 
         nodeData = None
         nodeChildren = None
         if self.isListTag(read2):
-            nodeChildren = self.readList(read2, data)
+            nodeChildren = self.readList(read2)
         elif read2 == 252:
-            size = self.readInt8(data)
-            nodeData = self.readArray(size, data)
+            nodeData = self.readLatin1(self.readInt8())
         elif read2 == 253:
-            size = self.readInt20(data)
-            nodeData = self.readArray(size, data)
+            nodeData = self.readLatin1(self.readInt20())
         elif read2 == 254:
-            size = self.readInt31(data)
-            nodeData = self.readArray(size, data)
+            nodeData = self.readLatin1(self.readInt31())
         elif read2 in (255, 251):
-            nodeData = self.readPacked8(read2, data)
+            nodeData = self.readPacked8(read2)
         else:
-            nodeData = self.readString(read2, data)
-
-        if nodeData and type(nodeData) is not str:
-            nodeData = "".join(map(chr, nodeData))
+            nodeData = self.readString(read2)
 
         return ProtocolTreeNode(tag, attribs, nodeChildren, nodeData)
 
-    def readList(self, token, data):
-        size = self.readListSize(token, data)
+    def readList(self, token):
+        size = self.readListSize(token)
         listx = []
         for i in range(0, size):
-            listx.append(self.nextTreeInternal(data))
+            listx.append(self.nextTreeInternal())
 
         return listx
 
@@ -1,4 +1,14 @@
+import struct
+
+
 class WriteEncoder:
+    """
+    Encodes nodes straight into a single growable bytearray; payloads are appended
+    with one extend and multi-byte integers are packed with struct.
+    """
+
+    INT16 = struct.Struct(">H")
+    INT31 = struct.Struct(">I")
 
     def __init__(self, tokenDictionary):
         self.tokenDictionary = tokenDictionary
@@ -8,12 +18,8 @@ class WriteEncoder:
         self.streamStarted = False
 
     def getStreamStartBytes(self, domain, resource):
-        data = []
+        data = bytearray(b"WA\x01\x06")
         self.streamStarted = True
-        data.append(87)
-        data.append(65)
-        data.append(1)
-        data.append(6)
 
         streamOpenAttributes = {"to": domain, "resource": resource}
         self.writeListStart(len(streamOpenAttributes) * 2 + 1, data)
@@ -22,7 +28,15 @@ class WriteEncoder:
         return data
 
     def protocolTreeNodeToBytes(self, node):
-        outBytes = []
+        return list(self.protocolTreeNodeToBytearray(node))
+
+    def protocolTreeNodeToBytearray(self, node, outBytes=None):
+        """
+        :param node: ProtocolTreeNode
+        :param outBytes: optional bytearray to append the encoded node to
+        :return: bytearray
+        """
+        outBytes = bytearray() if outBytes is None else outBytes
         self.writeInternal(node, outBytes)
 
         return outBytes
@@ -54,15 +68,8 @@ class WriteEncoder:
                 self.writeString(value, data, True)
 
     def writeBytes(self, bytes_, data, packed=False):
-        bytes__ = []
-        for b in bytes_:
-            if type(b) is int:
-                bytes__.append(b)
-            else:
-                bytes__.append(ord(b))
-
-        size = len(bytes__)
-        toWrite = bytes__
+        bytes_ = self.toBytes(bytes_)
+        size = len(bytes_)
         if size >= 0x100000:
             data.append(254)
             self.writeInt31(size, data)
@@ -73,17 +80,26 @@ class WriteEncoder:
             r = None
             if packed:
                 if size < 128:
-                    r = self.tryPackAndWriteHeader(255, bytes__, data)
+                    r = self.tryPackAndWriteHeader(255, bytes_, data)
                     if r is None:
-                        r = self.tryPackAndWriteHeader(251, bytes__, data)
+                        r = self.tryPackAndWriteHeader(251, bytes_, data)
 
             if r is None:
                 data.append(252)
                 self.writeInt8(size, data)
             else:
-                toWrite = r
+                bytes_ = r
 
-        data.extend(toWrite)
+        data.extend(bytes_)
+
+    @staticmethod
+    def toBytes(bytes_):
+        if type(bytes_) in (bytes, bytearray, memoryview):
+            return bytes_
+        if type(bytes_) is str:
+            # str payloads carry one byte per character
+            return bytes_.encode('latin-1')
+        return bytes(bytearray([b if type(b) is int else ord(b) for b in bytes_]))
 
     @staticmethod
     def writeInt8(v, data):
@@ -91,27 +107,19 @@ class WriteEncoder:
 
     @staticmethod
     def writeInt16(v, data):
-        data.append((v & 0xFF00) >> 8)
-        data.append((v & 0xFF) >> 0)
+        data.extend(WriteEncoder.INT16.pack(v & 0xFFFF))
 
     @staticmethod
     def writeInt20(v, data):
-        data.append((0xF0000 & v) >> 16)
-        data.append((0xFF00 & v) >> 8)
-        data.append((v & 0xFF) >> 0)
+        data.extend((v & 0xFFFFF).to_bytes(3, 'big'))
 
     @staticmethod
     def writeInt24(v, data):
-        data.append((v & 0xFF0000) >> 16)
-        data.append((v & 0xFF00) >> 8)
-        data.append((v & 0xFF) >> 0)
+        data.extend((v & 0xFFFFFF).to_bytes(3, 'big'))
 
     @staticmethod
     def writeInt31(v, data):
-        data.append((0x7F000000 & v) >> 24)
-        data.append((0xFF0000 & v) >> 16)
-        data.append((0xFF00 & v) >> 8)
-        data.append((v & 0xFF) >> 0)
+        data.extend(WriteEncoder.INT31.pack(v & 0x7FFFFFFF))
 
     def writeListStart(self, i, data):
         if i == 0:
@@ -141,13 +149,9 @@ class WriteEncoder:
 
 
     def writeString(self, tag, data, packed=False):
-        tok = self.tokenDictionary.getIndex(tag)
-        if tok:
-            index, secondary = tok
-            if secondary:
-                self.writeDoubleToken(index, data)
-            else:
-                self.writeToken(index, data)
+        tokenBytes = self.tokenDictionary.getTokenBytes(tag)
+        if tokenBytes is not None:
+            data.extend(tokenBytes)
         else:
             at = '@'.encode() if type(tag) == bytes else '@'
             try:
@@ -164,15 +168,7 @@ class WriteEncoder:
 
     @staticmethod
     def encodeString(string):
-        res = []
-
-        if type(string) == bytes:
-            for char in string:
-                res.append(char)
-        else:
-            for char in string:
-                res.append(ord(char))
-        return res
+        return string if type(string) == bytes else string.encode('latin-1')
 
     def writeJid(self, user, server, data):
         data.append(250)
@@ -7,6 +7,12 @@ from .decoder import ReadDecoder
 from .tokendictionary import TokenDictionary
 
 
+class YowStreamPreamble(bytearray):
+    """
+    Start of the stream, before any stanza. Layers below send it as is, without framing it.
+    """
+
+
 class YowCoderLayer(YowLayer):
     PROP_DOMAIN = "org.openwhatsapp.yowsup.prop.domain"
     PROP_RESOURCE = "org.openwhatsapp.yowsup.prop.resource"
@@ -25,12 +31,11 @@ class YowCoderLayer(YowLayer):
             self.getProp(self.__class__.PROP_DOMAIN),
             self.getProp(self.__class__.PROP_RESOURCE)
         )
-        for i in range(0, 4):
-            self.write(streamStartBytes.pop(0))
-        self.write(streamStartBytes)
+        self.toLower(YowStreamPreamble(streamStartBytes[:4]))
+        self.write(streamStartBytes[4:])
 
     def send(self, data):
-        self.write(self.writer.protocolTreeNodeToBytes(data))
+        self.write(self.writer.protocolTreeNodeToBytearray(data))
 
     def receive(self, data):
         node = self.reader.getProtocolTreeNode(data)
@@ -38,7 +43,9 @@ class YowCoderLayer(YowLayer):
             self.toUpper(node)
 
     def write(self, i):
-        if type(i) in (list, tuple):
+        if type(i) is bytearray:
+            self.toLower(i)
+        elif type(i) in (list, tuple):
             self.toLower(bytearray(i))
         else:
             self.toLower(bytearray([i]))
@@ -13,3 +13,19 @@ class DecoderTest(unittest.TestCase):
         node = self.decoder.getProtocolTreeNode(data)
         targetNode = ProtocolTreeNode("message", {"form": "abc", "to":"xyz"}, [ProtocolTreeNode("media", {"width" : "123"}, data="123456")])
         self.assertEqual(node, targetNode)
+
+    def test_decode_bytes(self):
+        data = bytes([248, 6, 95, 179, 252, 3, 120, 121, 122, 252, 4, 102, 111, 114, 109, 252, 3, 97, 98, 99, 248, 1,
+                      248, 4, 93, 236, 104, 255, 130, 18, 63, 252, 6, 49, 50, 51, 52, 53, 54])
+        node = self.decoder.getProtocolTreeNode(memoryview(data))
+        targetNode = ProtocolTreeNode("message", {"form": "abc", "to":"xyz"}, [ProtocolTreeNode("media", {"width" : "123"}, data="123456")])
+        self.assertEqual(node, targetNode)
+
+    def test_decode_large_data(self):
+        payload = "".join(map(chr, range(0, 256))) * 20
+        data = bytearray([248, 2, 93, 253])
+        data.extend(len(payload).to_bytes(3, 'big'))
+        data.extend(map(ord, payload))
+        node = self.decoder.getProtocolTreeNode(data)
+        self.assertEqual(node, ProtocolTreeNode("media", data=payload))
+        self.assertEqual(len(data), 4 + 3 + len(payload))
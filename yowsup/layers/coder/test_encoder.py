@@ -20,3 +20,8 @@ class EncoderTest(unittest.TestCase):
             )
         )
 
+    def test_encode_bytearray(self):
+        node = ProtocolTreeNode("media", {"width": "123"}, data=b"\x00\xff" * 200)
+        result = self.encoder.protocolTreeNodeToBytearray(node)
+        self.assertEqual(type(result), bytearray)
+        self.assertEqual(result, bytearray([248, 4, 93, 236, 104, 255, 130, 18, 63, 253, 0, 1, 144]) + b"\x00\xff" * 200)
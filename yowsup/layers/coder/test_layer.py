@@ -0,0 +1,30 @@
+import unittest
+
+from yowsup.layers import YowLayer, YowLayerEvent
+from yowsup.layers.coder import YowCoderLayer, YowStreamPreamble
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.stacks import YowStack
+
+
+class SinkLayer(YowLayer):
+    def __init__(self):
+        super(SinkLayer, self).__init__()
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+class YowCoderLayerTest(unittest.TestCase):
+    def test_stream_start(self):
+        stack = YowStack((SinkLayer, YowCoderLayer), reversed=False)
+        stack.emitEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_CONNECTED))
+        sent = stack.getLayer(0).sent
+        self.assertEqual(len(sent), 2)
+        self.assertIsInstance(sent[0], YowStreamPreamble)
+        self.assertEqual(sent[0][:2], b"WA")
+        self.assertNotIsInstance(sent[1], YowStreamPreamble)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -20,3 +20,11 @@ class TokenDictionaryTest(unittest.TestCase):
 
     def test_getSecondaryIndex(self):
         self.assertEqual(self.tokenDictionary.getIndex("wmv"), (11, True))
+
+    def test_getTokenBytes(self):
+        self.assertEqual(self.tokenDictionary.getTokenBytes("iq"), b"\x50")
+        self.assertEqual(self.tokenDictionary.getTokenBytes("wmv"), b"\xec\x0b")
+        self.assertIsNone(self.tokenDictionary.getTokenBytes("not-a-token"))
+
+    def test_sharedTables(self):
+        self.assertIs(TokenDictionary().getTokenBytes("iq"), self.tokenDictionary.getTokenBytes("iq"))
@@ -4,11 +4,11 @@ import inspect
 import logging
 
 from yowsup.layers import EventCallback
-from yowsup.layers import YowLayer, YowLayerEvent
+from yowsup.layers import YowLayer, YowLayerEvent, YowIqRegistry
 from yowsup.layers.auth import YowAuthenticationProtocolLayer
 from yowsup.layers.auth.protocolentities import StreamErrorProtocolEntity
 from yowsup.layers.network.layer import YowNetworkLayer
-from yowsup.layers.protocol_iq.protocolentities import IqProtocolEntity
+from yowsup.layers.protocol_iq.protocolentities import IqProtocolEntity, ErrorIqProtocolEntity
 from yowsup.layers.protocol_messages.mediauploader import MediaUploader
 from yowsup.layers.protocol_messages.protocolentities.iq_requestupload import RequestUploadIqProtocolEntity
 
@@ -31,7 +31,7 @@ class YowInterfaceLayer(YowLayer):
         super(YowInterfaceLayer, self).__init__()
         self.reconnect = False
         self.entity_callbacks = {}
-        self.iqRegistry = {}
+        self.iqRegistry = YowIqRegistry(self, ErrorIqProtocolEntity.fromProtocolTreeNode)
         # self.receiptsRegistry = {}
         members = inspect.getmembers(self, predicate=inspect.ismethod)
         for m in members:
@@ -42,8 +42,7 @@ class YowInterfaceLayer(YowLayer):
 
     def _sendIq(self, iqEntity, onSuccess=None, onError=None):
         assert iqEntity.tag == "iq", "Expected *IqProtocolEntity in _sendIq, got %s" % iqEntity.tag
-        self.iqRegistry[iqEntity.getId()] = (iqEntity, onSuccess, onError)
-        self.toLower(iqEntity)
+        self.iqRegistry.add(iqEntity, onSuccess, onError, self.toLower)
 
     def processIqRegistry(self, entity):
         """
@@ -52,8 +51,7 @@ class YowInterfaceLayer(YowLayer):
         if entity.tag == "iq":
             iq_id = entity.getId()
             if iq_id in self.iqRegistry:
-                originalIq, successClbk, errorClbk = self.iqRegistry[iq_id]
-                del self.iqRegistry[iq_id]
+                originalIq, successClbk, errorClbk = self.iqRegistry.pop(iq_id)
 
                 if entity.getType() == IqProtocolEntity.TYPE_RESULT and successClbk:
                     successClbk(entity, originalIq)
@@ -63,6 +61,12 @@ class YowInterfaceLayer(YowLayer):
 
         return False
 
+    def onEvent(self, yowLayerEvent):
+        # not an event callback, subclasses may have their own for disconnects
+        if yowLayerEvent.getName() == YowNetworkLayer.EVENT_STATE_DISCONNECTED:
+            self.iqRegistry.clear()
+        return super(YowInterfaceLayer, self).onEvent(yowLayerEvent)
+
     def getOwnJid(self, full=True):
         return self.getLayerInterface(YowAuthenticationProtocolLayer).getUsername(full)
 
@@ -137,7 +141,7 @@ class YowInterfaceLayer(YowLayer):
             mediaUploader = MediaUploader(builder.jid, self.getOwnJid(), builder.getFilepath(),
                                           resultRequestUploadIqProtocolEntity.getUrl(),
                                           resultRequestUploadIqProtocolEntity.getResumeOffset(),
-                                          successFn, errorFn, progress, async=True)
+                                          successFn, errorFn, progress, async_=True)
             mediaUploader.start()
 
     def __onRequestUploadError(self, errorEntity, requestUploadEntity, builder, error=None):
@@ -0,0 +1,51 @@
+import time
+import unittest
+
+from yowsup.layers import YowLayer, YowLayerEvent, YowIqRegistry
+from yowsup.layers.interface import YowInterfaceLayer
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.protocol_iq.protocolentities import IqProtocolEntity
+from yowsup.stacks import YowStack
+
+
+class SinkLayer(YowLayer):
+    def __init__(self):
+        super(SinkLayer, self).__init__()
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+class YowInterfaceLayerTest(unittest.TestCase):
+    def setUp(self):
+        self.stack = YowStack((SinkLayer, YowInterfaceLayer), reversed=False)
+        self.sink = self.stack.getLayer(0)
+        self.layer = self.stack.getLayer(1)
+        self.errors = []
+
+    def sendIq(self, _id):
+        self.layer._sendIq(IqProtocolEntity("w:test", _id=_id, _type="get", to="s.whatsapp.net"),
+                           lambda entity, iq: None,
+                           lambda errorEntity, iq: self.errors.append((iq.getId(), errorEntity.code)))
+
+    def test_timeout(self):
+        self.stack.setProp(YowIqRegistry.PROP_IQ_TIMEOUT, 0.01)
+        self.sendIq("1")
+        self.assertEqual(len(self.sink.sent), 1)
+        deadline = time.monotonic() + 2
+        while not self.errors and time.monotonic() < deadline:
+            self.stack.scheduler.runReady()
+            time.sleep(0.005)
+        self.assertEqual(self.errors, [("1", YowIqRegistry.CODE_TIMEOUT)])
+        self.assertEqual(len(self.layer.iqRegistry), 0)
+
+    def test_disconnect(self):
+        self.sendIq("1")
+        self.stack.emitEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECTED))
+        self.assertEqual(self.errors, [("1", YowIqRegistry.CODE_DISCONNECTED)])
+        self.assertEqual(len(self.layer.iqRegistry), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
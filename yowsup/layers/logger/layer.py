@@ -8,14 +8,20 @@ logger = logging.getLogger(__name__)
 
 class YowLoggerLayer(YowLayer):
 
+    def isTransparent(self, method):
+        # only logs at debug level, stays out of the way otherwise
+        return not logger.isEnabledFor(logging.DEBUG)
+
     def send(self, data):
-        ldata = list(data) if type(data) is bytearray else data
-        logger.debug("tx:\n%s" % ldata)
+        if logger.isEnabledFor(logging.DEBUG):
+            ldata = list(data) if type(data) is bytearray else data
+            logger.debug("tx:\n%s" % ldata)
         self.toLower(data)
 
     def receive(self, data):
-        ldata = list(data) if type(data) is bytearray else data
-        logger.debug("rx:\n%s" % ldata)
+        if logger.isEnabledFor(logging.DEBUG):
+            ldata = list(data) if type(data) is bytearray else data
+            logger.debug("rx:\n%s" % ldata)
         self.toUpper(data)
 
     def __str__(self):
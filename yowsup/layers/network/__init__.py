@@ -1 +1,2 @@
 from .layer import YowNetworkLayer
+from .endpointselector import YowEndpointSelector
@@ -0,0 +1,225 @@
+# -*- coding utf-8 -*-
+
+import errno
+import json
+import logging
+import os
+import random
+import selectors
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class YowEndpointStats(object):
+    def __init__(self, latency=None, failures=0, lastFailure=0):
+        # exponentially weighted moving average of connect times, in seconds
+        self.latency = latency
+        self.failures = failures
+        self.lastFailure = lastFailure
+
+    def toDict(self):
+        return {"latency": self.latency, "failures": self.failures, "lastFailure": self.lastFailure}
+
+    @classmethod
+    def fromDict(cls, data):
+        return cls(data.get("latency"), data.get("failures", 0), data.get("lastFailure", 0))
+
+
+class YowEndpointSelector(object):
+    """
+    Picks the endpoint to connect to by racing connects to the best ranked ones, happy eyeballs style:
+    attempts start delay seconds apart (or right away once the previous one failed) and the first to
+    connect wins, its socket is used for the connection.
+
+    Endpoints are ranked on the EWMA of their connect times, plus a penalty per recent consecutive failure.
+    Stats are persisted to storePath, if given, so a restarted client starts off on what it learned.
+    One selector can be shared by any number of stacks:
+
+        selector = YowEndpointSelector(YowConstants.ENDPOINTS, StorageTools.constructPath("endpoints.json"))
+        stack.setProp(YowNetworkLayer.PROP_ENDPOINT_SELECTOR, selector)
+    """
+
+    def __init__(self, endpoints, storePath=None, parallel=4, delay=0.25, timeout=10,
+                 alpha=0.3, unknownLatency=1.0, failurePenalty=5.0, failureTtl=3600):
+        """
+        :param endpoints: (host, port) tuples
+        :param storePath: json file stats are loaded from and saved to, None to keep them in memory
+        :param parallel: max endpoints raced per connect, the last slot goes to a random not so well ranked one
+        so that endpoints which got better are found out about
+        :param delay: seconds between starting attempts
+        :param timeout: seconds after which a connect gives up
+        :param alpha: weight of a new connect time in the EWMA
+        :param unknownLatency: latency assumed for endpoints never connected to
+        :param failurePenalty: seconds added to the latency per consecutive failure
+        :param failureTtl: seconds after which failures are forgiven
+        """
+        self.endpoints = [tuple(endpoint) for endpoint in endpoints]
+        self.storePath = storePath
+        self.parallel = parallel
+        self.delay = delay
+        self.timeout = timeout
+        self.alpha = alpha
+        self.unknownLatency = unknownLatency
+        self.failurePenalty = failurePenalty
+        self.failureTtl = failureTtl
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def getKey(endpoint):
+        return "%s:%s" % endpoint
+
+    def getStats(self, endpoint):
+        key = self.getKey(endpoint)
+        if key not in self.stats:
+            self.stats[key] = YowEndpointStats()
+        return self.stats[key]
+
+    def getScore(self, endpoint, now=None):
+        """
+        :return: expected connect time in seconds, lower is better
+        """
+        stats = self.getStats(endpoint)
+        score = self.unknownLatency if stats.latency is None else stats.latency
+        if stats.failures and (now or time.time()) - stats.lastFailure < self.failureTtl:
+            score += self.failurePenalty * stats.failures
+        return score
+
+    def rank(self):
+        """
+        :return: endpoints, best first. Endpoints scoring the same are shuffled
+        so clients without stats spread over them
+        """
+        now = time.time()
+        with self.lock:
+            return sorted(self.endpoints, key=lambda endpoint: (self.getScore(endpoint, now), random.random()))
+
+    def getBest(self):
+        return self.rank()[0]
+
+    def getCandidates(self):
+        ranked = self.rank()
+        if len(ranked) <= self.parallel:
+            return ranked
+        return ranked[:self.parallel - 1] + [random.choice(ranked[self.parallel - 1:])]
+
+    def recordLatency(self, endpoint, latency):
+        with self.lock:
+            stats = self.getStats(endpoint)
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                stats.latency = self.alpha * latency + (1 - self.alpha) * stats.latency
+            stats.failures = 0
+
+    def recordFailure(self, endpoint):
+        with self.lock:
+            stats = self.getStats(endpoint)
+            stats.failures += 1
+            stats.lastFailure = time.time()
+
+    def connect(self, endpoints=None):
+        """
+        Races connects to the given endpoints, or the best candidates, in order. Blocks until one connected
+        or all failed, at most timeout seconds.
+        :return: (endpoint, non blocking connected socket) or None
+        """
+        candidates = list(endpoints) if endpoints is not None else self.getCandidates()
+        selector = selectors.DefaultSelector()
+        pending = {}
+        winner = None
+        deadline = time.time() + self.timeout
+        nextStart = 0
+        try:
+            while winner is None and (candidates or pending):
+                now = time.time()
+                if now >= deadline:
+                    for endpoint, _ in pending.values():
+                        logger.debug("Connecting to %s:%s timed out" % endpoint)
+                        self.recordFailure(endpoint)
+                    break
+
+                if candidates and (now >= nextStart or not pending):
+                    endpoint = candidates.pop(0)
+                    sock = self.startConnect(endpoint)
+                    if sock is not None:
+                        pending[sock] = (endpoint, now)
+                        selector.register(sock, selectors.EVENT_WRITE)
+                        nextStart = now + self.delay
+                    continue
+
+                wait = min(deadline, nextStart) if candidates else deadline
+                for key, _ in selector.select(max(wait - now, 0)):
+                    sock = key.fileobj
+                    selector.unregister(sock)
+                    endpoint, startedAt = pending.pop(sock)
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if error:
+                        logger.debug("Connecting to %s:%s failed: %s" % (endpoint + (os.strerror(error),)))
+                        sock.close()
+                        self.recordFailure(endpoint)
+                    elif winner is None:
+                        self.recordLatency(endpoint, time.time() - startedAt)
+                        winner = (endpoint, sock)
+                    else:
+                        self.recordLatency(endpoint, time.time() - startedAt)
+                        sock.close()
+        finally:
+            # attempts still running lost the race, they are not held against their endpoint
+            for sock in pending:
+                sock.close()
+            selector.close()
+
+        self.save()
+        if winner is not None:
+            logger.debug("Connected to %s:%s" % winner[0])
+        return winner
+
+    def startConnect(self, endpoint):
+        try:
+            family, socktype, proto, _, address = socket.getaddrinfo(endpoint[0], endpoint[1],
+                                                                     type=socket.SOCK_STREAM)[0]
+            sock = socket.socket(family, socktype, proto)
+        except OSError as e:
+            logger.debug("Resolving %s:%s failed: %s" % (endpoint + (e,)))
+            self.recordFailure(endpoint)
+            return None
+
+        sock.setblocking(False)
+        error = sock.connect_ex(address)
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            logger.debug("Connecting to %s:%s failed: %s" % (endpoint + (os.strerror(error),)))
+            sock.close()
+            self.recordFailure(endpoint)
+            return None
+        return sock
+
+    def load(self):
+        if self.storePath is None or not os.path.isfile(self.storePath):
+            return
+        try:
+            with open(self.storePath) as storeFile:
+                data = json.load(storeFile)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable endpoint stats %s: %s" % (self.storePath, e))
+            return
+        with self.lock:
+            for key, stats in data.items():
+                self.stats[key] = YowEndpointStats.fromDict(stats)
+
+    def save(self):
+        if self.storePath is None:
+            return
+        with self.lock:
+            data = dict((key, stats.toDict()) for key, stats in self.stats.items())
+        tmpPath = "%s.%s.%s.tmp" % (self.storePath, os.getpid(), threading.get_ident())
+        try:
+            with open(tmpPath, "w") as storeFile:
+                json.dump(data, storeFile)
+            os.replace(tmpPath, self.storePath)
+        except OSError as e:
+            logger.warning("Could not save endpoint stats to %s: %s" % (self.storePath, e))
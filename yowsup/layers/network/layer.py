@@ -1,9 +1,17 @@
 # -*- coding utf-8 -*-
 
-import asyncore
+import asyncio
+import collections
+import errno
+import itertools
 import logging
 import socket
 
+try:
+    import asyncore
+except ImportError:  # removed in python 3.12, only the asyncio transport is available there
+    asyncore = None
+
 from yowsup.common.http.httpproxy import HttpProxy
 from yowsup.layers import YowLayer, YowLayerEvent, EventCallback
 from yowsup.layers.network.layer_interface import YowNetworkLayerInterface
@@ -11,10 +19,81 @@ from yowsup.layers.network.layer_interface import YowNetworkLayerInterface
 logger = logging.getLogger(__name__)
 
 
-class YowNetworkLayer(YowLayer, asyncore.dispatcher_with_send):
+class YowNetworkProtocol(asyncio.Protocol):
+    """
+    asyncio side of YowNetworkLayer, one instance per connection attempt. When going through
+    an HttpProxy it first tunnels with CONNECT and only reports the connection once the proxy accepted it.
+    """
+
+    def __init__(self, layer, endpoint, proxyHandler=None):
+        self.layer = layer
+        self.endpoint = endpoint
+        self.proxyHandler = proxyHandler
+        self.proxyResponse = bytearray()
+        self.transport = None
+
+    def isCurrent(self):
+        return self.layer.protocol is self
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if not self.isCurrent():
+            # connection was torn down while we were still connecting
+            transport.close()
+        elif self.proxyHandler is not None:
+            logger.debug("HttpProxy connect: %s:%d" % self.endpoint)
+            transport.write(self.proxyHandler.getConnectRequest(self.endpoint))
+        else:
+            self.layer.onTransportConnected(transport)
+
+    def data_received(self, data):
+        if not self.isCurrent():
+            return
+        if self.proxyHandler is None:
+            self.layer.receive(data)
+            return
+
+        self.proxyResponse.extend(data)
+        headerEnd = self.proxyResponse.find(b"\r\n\r\n")
+        if headerEnd < 0:
+            return
+        try:
+            self.proxyHandler.checkConnectResponse(self.proxyResponse[:headerEnd].decode('ascii'))
+        except Exception as e:
+            self.layer.handle_close(e)
+            return
+        logger.debug("HttpProxy connected")
+        remaining = self.proxyResponse[headerEnd + 4:]
+        self.proxyHandler = None
+        self.proxyResponse = None
+        self.layer.onTransportConnected(self.transport)
+        if remaining:
+            self.layer.receive(remaining)
+
+    def connection_lost(self, exc):
+        if self.isCurrent():
+            self.layer.handle_close(exc or "Connection Closed")
+
+
+class YowNetworkBufferedProtocol(YowNetworkProtocol, asyncio.BufferedProtocol):
+    """
+    Has the transport read straight into the layer's reusable read buffer, see YowNetworkLayer.PROP_NET_READ_INTO
+    """
+
+    def get_buffer(self, sizehint):
+        return self.layer.getReadBuffer()
+
+    def buffer_updated(self, nbytes):
+        self.data_received(self.layer.onRead(nbytes))
+
+
+class YowNetworkLayer(YowLayer, asyncore.dispatcher_with_send if asyncore else object):
     """
         send:       bytearray -> None
         receive:    bytearray -> bytearray
+
+        Runs on asyncore by default, or on asyncio when the stack was given an event loop
+        (see YowStack.setEventLoop / YowStack.run_async)
     """
 
     EVENT_STATE_CONNECT = "org.openwhatsapp.yowsup.event.network.connect"
@@ -23,18 +102,39 @@ class YowNetworkLayer(YowLayer, asyncore.dispatcher_with_send):
     EVENT_STATE_DISCONNECTED = "org.openwhatsapp.yowsup.event.network.disconnected"
 
     PROP_ENDPOINT = "org.openwhatsapp.yowsup.prop.endpoint"
+    # YowEndpointSelector picking PROP_ENDPOINT on every connect, by racing connects to the fastest endpoints
+    PROP_ENDPOINT_SELECTOR = "org.openwhatsapp.yowsup.prop.endpointSelector"
     PROP_NET_READSIZE = "org.openwhatsapp.yowsup.prop.net.readSize"
+    # read into one reusable buffer instead of allocating for every read. Layers above get a memoryview
+    # of it which is only valid until they return; the stanza regulator copies what it receives
+    PROP_NET_READ_INTO = "org.openwhatsapp.yowsup.prop.net.readInto"
+    # reads start at PROP_NET_READSIZE and double, up to this, while the socket keeps filling them
+    PROP_NET_READSIZE_MAX = "org.openwhatsapp.yowsup.prop.net.readSizeMax"
 
     STATE_DISCONNECTED = 0
     STATE_CONNECTING = 1
     STATE_CONNECTED = 2
     STATE_DISCONNECTING = 3
 
+    # max buffers handed to a single sendmsg call
+    SEND_IOV_MAX = 64
+
     def __init__(self):
-        asyncore.dispatcher.__init__(self)
+        if asyncore:
+            asyncore.dispatcher.__init__(self)
+        self.connected = False
         self.state = self.__class__.STATE_DISCONNECTED
         YowLayer.__init__(self)
         self.interface = YowNetworkLayerInterface(self)
+        self.protocol = None
+        self.transport = None
+        self.closedFuture = None
+        # outgoing frames, written out with as few syscalls as possible
+        self.sendQueue = collections.deque()
+        self.flushScheduled = False
+        self.readBuffer = None
+        self.readView = None
+        self.readSize = None
         httpProxy = HttpProxy.getFromEnviron()
         proxyHandler = None
         if httpProxy is not None:
@@ -47,6 +147,7 @@ class YowNetworkLayer(YowLayer, asyncore.dispatcher_with_send):
 
             proxyHandler = httpProxy.handler()
             proxyHandler.onConnect = onConnect
+        self.httpProxy = httpProxy
         self.proxyHandler = proxyHandler
 
     @EventCallback(EVENT_STATE_CONNECT)
@@ -59,12 +160,38 @@ class YowNetworkLayer(YowLayer, asyncore.dispatcher_with_send):
         self.destroyConnection(ev.getArg("reason"))
         return True
 
+    def getEventLoop(self):
+        stack = self.getStack()
+        loop = stack.getEventLoop() if stack is not None else None
+        if loop is None and asyncore is None:
+            loop = asyncio.get_event_loop()
+        return loop
+
     def createConnection(self):
         self.state = self.__class__.STATE_CONNECTING
-        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.out_buffer = bytearray()
+        self.sendQueue.clear()
+        self.readSize = self.getProp(self.__class__.PROP_NET_READSIZE, 1024)
+        selector = self.getProp(self.__class__.PROP_ENDPOINT_SELECTOR)
+        if selector is not None and self.httpProxy is not None:
+            # can't race through the proxy, go with the best endpoint known so far
+            self.getStack().setProp(self.__class__.PROP_ENDPOINT, selector.getBest())
+            selector = None
+        loop = self.getEventLoop()
+        if selector is not None:
+            logger.debug("Connecting to the fastest of %s endpoints" % len(selector.endpoints))
+            if loop is not None:
+                self.createAsyncConnection(loop, None, selector)
+            else:
+                self.createSelectedConnection(selector)
+            return
+
         endpoint = self.getProp(self.__class__.PROP_ENDPOINT)
         logger.debug("Connecting to %s:%s" % endpoint)
+        if loop is not None:
+            self.createAsyncConnection(loop, endpoint)
+            return
+
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
         if self.proxyHandler is not None:
             logger.debug("HttpProxy connect: %s:%d" % endpoint)
             self.proxyHandler.connect(self, endpoint)
@@ -74,13 +201,73 @@ class YowNetworkLayer(YowLayer, asyncore.dispatcher_with_send):
             except OSError as e:
                 self.handle_close(e)
 
+    def createSelectedConnection(self, selector):
+        """
+        Blocks while the selector races the endpoints, then continues on the winning socket
+        """
+        result = selector.connect()
+        if result is None:
+            self.handle_close("No endpoint reachable")
+            return
+        endpoint, sock = result
+        self.getStack().setProp(self.__class__.PROP_ENDPOINT, endpoint)
+        self.set_socket(sock)
+        self.handle_connect()
+
+    def createAsyncConnection(self, loop, endpoint, selector=None):
+        """
+        :param selector: YowEndpointSelector to race the endpoints with in an executor thread, instead of
+        connecting to endpoint
+        """
+        proxyHandler = self.httpProxy.handler() if self.httpProxy is not None else None
+        address = self.httpProxy.address if proxyHandler is not None else endpoint
+        protocolClass = YowNetworkBufferedProtocol if self.getProp(self.__class__.PROP_NET_READ_INTO, False) \
+            else YowNetworkProtocol
+        protocol = protocolClass(self, endpoint, proxyHandler)
+        self.protocol = protocol
+        self.closedFuture = loop.create_future()
+
+        def onConnectDone(task):
+            if not task.cancelled() and task.exception() is not None and protocol.isCurrent():
+                self.handle_close(task.exception())
+
+        async def connectSelected():
+            result = await loop.run_in_executor(None, selector.connect)
+            if result is None:
+                raise ConnectionError("No endpoint reachable")
+            protocol.endpoint, sock = result
+            if protocol.isCurrent():
+                self.getStack().setProp(self.__class__.PROP_ENDPOINT, protocol.endpoint)
+            return await loop.create_connection(lambda: protocol, sock=sock)
+
+        connect = connectSelected() if selector is not None else loop.create_connection(lambda: protocol, *address)
+        loop.create_task(connect).add_done_callback(onConnectDone)
+
+    def onTransportConnected(self, transport):
+        self.transport = transport
+        self.state = self.__class__.STATE_CONNECTED
+        self.connected = True
+        self.emitEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_CONNECTED))
+
     def destroyConnection(self, reason=None):
+        if self.state == self.__class__.STATE_DISCONNECTED:
+            # never connected, or closed already
+            return
         self.state = self.__class__.STATE_DISCONNECTING
         self.handle_close(reason or "Requested")
 
     def getStatus(self):
         return self.connected
 
+    def waitClosed(self):
+        """
+        :return: awaitable resolving once the current asyncio connection is closed
+        """
+        if self.closedFuture is None:
+            self.closedFuture = self.getEventLoop().create_future()
+            self.closedFuture.set_result(None)
+        return asyncio.shield(self.closedFuture)
+
     def handle_connect(self):
         self.state = self.__class__.STATE_CONNECTED
         self.connected = True
@@ -94,9 +281,19 @@ class YowNetworkLayer(YowLayer, asyncore.dispatcher_with_send):
         if self.state != self.__class__.STATE_DISCONNECTED:
             self.state = self.__class__.STATE_DISCONNECTED
             self.connected = False
+            self.sendQueue.clear()
             logger.debug("Disconnected, reason: %s" % reason)
             self.emitEvent(YowLayerEvent(self.__class__.EVENT_STATE_DISCONNECTED, reason=reason, detached=True))
-            self.close()
+            if self.protocol is not None:
+                transport = self.transport or self.protocol.transport
+                self.protocol = None
+                self.transport = None
+                if transport is not None:
+                    transport.close()
+                if not self.closedFuture.done():
+                    self.closedFuture.set_result(reason)
+            elif asyncore is not None and self.socket is not None:
+                self.close()
 
     def handle_error(self):
         raise Exception
@@ -106,14 +303,98 @@ class YowNetworkLayer(YowLayer, asyncore.dispatcher_with_send):
         if self.proxyHandler is not None:
             data = self.proxyHandler.recv(self, readSize)
             logger.debug("HttpProxy handle read: %s" % data)
+        elif self.getProp(self.__class__.PROP_NET_READ_INTO, False):
+            try:
+                nbytes = self.socket.recv_into(self.getReadBuffer())
+            except OSError as e:
+                if e.errno in (errno.EWOULDBLOCK, errno.EAGAIN):
+                    return
+                if e.errno in asyncore._DISCONNECTED:
+                    self.handle_close(e)
+                    return
+                raise
+            if nbytes == 0:
+                self.handle_close()
+            else:
+                self.receive(self.onRead(nbytes))
         else:
             data = self.recv(readSize)
             self.receive(data)
 
+    def getReadBuffer(self):
+        """
+        :return: writable view of the next read's size, over the reusable read buffer
+        """
+        if self.readSize is None:
+            self.readSize = self.getProp(self.__class__.PROP_NET_READSIZE, 1024)
+        readSizeMax = max(self.getProp(self.__class__.PROP_NET_READSIZE_MAX, 64 * 1024), self.readSize)
+        if self.readBuffer is None or len(self.readBuffer) < readSizeMax:
+            self.readBuffer = bytearray(readSizeMax)
+            self.readView = memoryview(self.readBuffer)
+        return self.readView[:self.readSize]
+
+    def onRead(self, nbytes):
+        """
+        :return: view of the nbytes just read into the read buffer
+        """
+        if nbytes == self.readSize:
+            # socket filled the whole read, more is probably waiting
+            self.readSize = min(self.readSize * 2, len(self.readBuffer))
+        return self.readView[:nbytes]
+
     def send(self, data):
         if self.connected:
-            self.out_buffer = self.out_buffer + data
-            self.initiate_send()
+            # frames sent during this loop iteration go out together: on asyncio flush writes them once the
+            # iteration is done, on asyncore writable() has the next poll call handle_write
+            self.sendQueue.append(data)
+            if self.transport is not None and not self.flushScheduled:
+                self.flushScheduled = True
+                self.getEventLoop().call_soon(self.flush)
+
+    def flush(self):
+        self.flushScheduled = False
+        if self.transport is not None and self.sendQueue:
+            self.transport.writelines(self.sendQueue)
+            self.sendQueue.clear()
+
+    def writable(self):
+        return (not self.connected) or len(self.sendQueue) > 0
+
+    def handle_write(self):
+        self.initiate_send()
+
+    def initiate_send(self):
+        """
+        Writes out as much of sendQueue as the socket takes, several frames per sendmsg call
+        """
+        queue = self.sendQueue
+        while queue:
+            buffers = list(itertools.islice(queue, self.__class__.SEND_IOV_MAX))
+            try:
+                if hasattr(self.socket, "sendmsg"):
+                    sent = self.socket.sendmsg(buffers)
+                else:
+                    sent = self.socket.send(buffers[0])
+            except OSError as e:
+                if e.errno in (errno.EWOULDBLOCK, errno.EAGAIN):
+                    return
+                if e.errno in asyncore._DISCONNECTED:
+                    self.handle_close(e)
+                    return
+                raise
+
+            partial = sent < sum(len(b) for b in buffers)
+            while sent:
+                head = queue[0]
+                if sent >= len(head):
+                    queue.popleft()
+                    sent -= len(head)
+                else:
+                    queue[0] = memoryview(head)[sent:]
+                    sent = 0
+            if partial:
+                # socket buffer is full, handle_write continues once it drained
+                return
 
     def receive(self, data):
         self.toUpper(data)
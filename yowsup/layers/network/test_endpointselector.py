@@ -0,0 +1,180 @@
+import asyncio
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+try:
+    import asyncore
+except ImportError:
+    asyncore = None
+
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.network.endpointselector import YowEndpointSelector
+from yowsup.layers.network.test_layer import EchoTopLayer, AsyncioNetworkLayerTest
+from yowsup.stacks import YowStack
+
+
+class YowEndpointSelectorTest(unittest.TestCase):
+    def setUp(self):
+        self.listeners = []
+        self.tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for listener in self.listeners:
+            listener.close()
+        shutil.rmtree(self.tmpDir)
+
+    def listen(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(8)
+        self.listeners.append(listener)
+        return listener.getsockname()
+
+    @staticmethod
+    def getClosedEndpoint():
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        endpoint = sock.getsockname()
+        sock.close()
+        return endpoint
+
+    def test_rank(self):
+        endpoints = [("127.0.0.1", 1), ("127.0.0.1", 2), ("127.0.0.1", 3)]
+        selector = YowEndpointSelector(endpoints, alpha=0.5)
+        selector.recordLatency(endpoints[0], 0.4)
+        selector.recordLatency(endpoints[1], 0.1)
+        selector.recordLatency(endpoints[1], 0.3)
+        self.assertAlmostEqual(selector.getStats(endpoints[1]).latency, 0.2)
+        # never connected to, counts as unknownLatency
+        self.assertEqual(selector.rank(), [endpoints[1], endpoints[0], endpoints[2]])
+
+        selector.recordFailure(endpoints[1])
+        self.assertEqual(selector.rank(), [endpoints[0], endpoints[2], endpoints[1]])
+        selector.recordLatency(endpoints[1], 0.2)
+        self.assertEqual(selector.getBest(), endpoints[1])
+
+    def test_failures_forgiven(self):
+        endpoints = [("127.0.0.1", 1), ("127.0.0.1", 2)]
+        selector = YowEndpointSelector(endpoints, failureTtl=60)
+        selector.recordLatency(endpoints[0], 0.1)
+        selector.recordLatency(endpoints[1], 0.2)
+        selector.recordFailure(endpoints[0])
+        self.assertEqual(selector.getBest(), endpoints[1])
+        selector.getStats(endpoints[0]).lastFailure -= 61
+        self.assertEqual(selector.getBest(), endpoints[0])
+
+    def test_candidates(self):
+        endpoints = [("127.0.0.1", port) for port in range(1, 11)]
+        selector = YowEndpointSelector(endpoints, parallel=3)
+        for latency, endpoint in enumerate(endpoints):
+            selector.recordLatency(endpoint, latency)
+        candidates = selector.getCandidates()
+        self.assertEqual(candidates[:2], endpoints[:2])
+        self.assertIn(candidates[2], endpoints[2:])
+
+    def test_connect(self):
+        closed = self.getClosedEndpoint()
+        listening = self.listen()
+        # attempts after a failed one start right away
+        selector = YowEndpointSelector([closed, listening], delay=5)
+        startedAt = time.time()
+        endpoint, sock = selector.connect([closed, listening])
+        sock.close()
+        self.assertLess(time.time() - startedAt, 2)
+        self.assertEqual(endpoint, listening)
+        self.assertEqual(selector.getStats(closed).failures, 1)
+        self.assertIsNotNone(selector.getStats(listening).latency)
+        self.assertEqual(selector.getBest(), listening)
+
+    def test_connect_fails(self):
+        closed = self.getClosedEndpoint()
+        selector = YowEndpointSelector([closed])
+        self.assertIsNone(selector.connect())
+        self.assertEqual(selector.getStats(closed).failures, 1)
+
+    def test_persist(self):
+        storePath = os.path.join(self.tmpDir, "endpoints.json")
+        listening = self.listen()
+        closed = self.getClosedEndpoint()
+        selector = YowEndpointSelector([closed, listening], storePath=storePath)
+        selector.connect([closed, listening])[1].close()
+
+        restored = YowEndpointSelector([closed, listening], storePath=storePath)
+        self.assertEqual(restored.getStats(closed).failures, 1)
+        self.assertEqual(restored.getStats(listening).latency, selector.getStats(listening).latency)
+        self.assertEqual(restored.rank(), [listening, closed])
+
+        with open(storePath, "w") as storeFile:
+            storeFile.write("{")
+        self.assertEqual(YowEndpointSelector([closed], storePath=storePath).stats, {})
+
+
+class NetworkLayerEndpointSelectorTest(unittest.TestCase):
+    def test_asyncio(self):
+        loop = asyncio.new_event_loop()
+
+        async def run():
+            server = await asyncio.start_server(AsyncioNetworkLayerTest.echo, "127.0.0.1", 0)
+            listening = server.sockets[0].getsockname()
+            closed = YowEndpointSelectorTest.getClosedEndpoint()
+            stack = YowStack((YowNetworkLayer, EchoTopLayer), reversed=False)
+            stack.setProp(YowNetworkLayer.PROP_ENDPOINT_SELECTOR, YowEndpointSelector([closed, listening]))
+            await asyncio.wait_for(stack.run_async(), 5)
+            server.close()
+            await server.wait_closed()
+            return stack
+
+        try:
+            stack = loop.run_until_complete(run())
+        finally:
+            loop.close()
+        self.assertEqual(stack.getLayer(1).received, b"ping")
+        self.assertEqual(stack.getProp(YowNetworkLayer.PROP_ENDPOINT)[0], "127.0.0.1")
+
+    def test_asyncio_unreachable(self):
+        loop = asyncio.new_event_loop()
+
+        async def run():
+            stack = YowStack((YowNetworkLayer, EchoTopLayer), reversed=False)
+            selector = YowEndpointSelector([YowEndpointSelectorTest.getClosedEndpoint()])
+            stack.setProp(YowNetworkLayer.PROP_ENDPOINT_SELECTOR, selector)
+            await asyncio.wait_for(stack.run_async(), 5)
+            return stack.getLayer(1)
+
+        try:
+            top = loop.run_until_complete(run())
+        finally:
+            loop.close()
+        self.assertEqual(top.events, [YowNetworkLayer.EVENT_STATE_DISCONNECTED])
+
+    @unittest.skipIf(asyncore is None, "asyncore is not available")
+    def test_asyncore(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        try:
+            stack = YowStack((YowNetworkLayer, EchoTopLayer), reversed=False)
+            selector = YowEndpointSelector([YowEndpointSelectorTest.getClosedEndpoint(), listener.getsockname()])
+            stack.setProp(YowNetworkLayer.PROP_ENDPOINT_SELECTOR, selector)
+            network = stack.getLayer(0)
+            network.createConnection()
+            self.assertEqual(network.state, YowNetworkLayer.STATE_CONNECTED)
+            self.assertEqual(stack.getProp(YowNetworkLayer.PROP_ENDPOINT), listener.getsockname())
+            peer, _ = listener.accept()
+            peer.settimeout(5)
+            # written on the next poll, as the asyncore loop would
+            self.assertTrue(network.writable())
+            network.handle_write()
+            self.assertEqual(peer.recv(4), b"ping")
+            peer.close()
+            network.handle_close()
+        finally:
+            listener.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
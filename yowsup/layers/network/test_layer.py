@@ -0,0 +1,253 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+import unittest
+
+try:
+    import asyncore
+except ImportError:
+    asyncore = None
+
+from yowsup.common.http.httpproxy import HttpProxy
+from yowsup.layers import YowLayer, YowLayerEvent, EventCallback
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.stacks import YowStack
+
+
+class EchoTopLayer(YowLayer):
+    def __init__(self):
+        super(EchoTopLayer, self).__init__()
+        self.received = bytearray()
+        self.events = []
+
+    @EventCallback(YowNetworkLayer.EVENT_STATE_CONNECTED)
+    def onConnected(self, event):
+        self.events.append(event.getName())
+        self.toLower(bytearray(b"ping"))
+
+    @EventCallback(YowNetworkLayer.EVENT_STATE_DISCONNECTED)
+    def onDisconnected(self, event):
+        self.events.append(event.getName())
+
+    def receive(self, data):
+        self.received.extend(data)
+        if self.received == b"ping":
+            self.broadcastEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECT))
+
+
+class AsyncioNetworkLayerTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        HttpProxy.instance = None
+        self.loop.close()
+
+    @staticmethod
+    async def echo(reader, writer):
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                break
+            writer.write(data)
+        writer.close()
+
+    @staticmethod
+    async def proxy(reader, writer):
+        request = await reader.readuntil(b"\r\n\r\n")
+        assert request.startswith(b"CONNECT e1.whatsapp.net:443 HTTP/1.1\r\n")
+        writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+        await AsyncioNetworkLayerTest.echo(reader, writer)
+
+    def runStack(self, handler, proxied=False, props=None):
+        async def run():
+            server = await asyncio.start_server(handler, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            if proxied:
+                HttpProxy.setProxy("127.0.0.1", port)
+            stack = YowStack((YowNetworkLayer, EchoTopLayer), reversed=False)
+            if not proxied:
+                stack.setProp(YowNetworkLayer.PROP_ENDPOINT, ("127.0.0.1", port))
+            else:
+                stack.setProp(YowNetworkLayer.PROP_ENDPOINT, ("e1.whatsapp.net", 443))
+            for key, value in (props or {}).items():
+                stack.setProp(key, value)
+            await asyncio.wait_for(stack.run_async(), 5)
+            server.close()
+            await server.wait_closed()
+            return stack.getLayer(1)
+
+        return self.loop.run_until_complete(run())
+
+    def test_connect_send_receive(self):
+        top = self.runStack(self.echo)
+        self.assertEqual(top.received, b"ping")
+        self.assertEqual(top.events, [YowNetworkLayer.EVENT_STATE_CONNECTED, YowNetworkLayer.EVENT_STATE_DISCONNECTED])
+
+    def test_http_proxy(self):
+        top = self.runStack(self.proxy, proxied=True)
+        self.assertEqual(top.received, b"ping")
+
+    def test_read_into(self):
+        props = {YowNetworkLayer.PROP_NET_READ_INTO: True}
+        top = self.runStack(self.echo, props=props)
+        self.assertEqual(top.received, b"ping")
+        top = self.runStack(self.proxy, proxied=True, props=props)
+        self.assertEqual(top.received, b"ping")
+
+    def test_connection_refused(self):
+        async def run():
+            stack = YowStack((YowNetworkLayer, EchoTopLayer), reversed=False)
+            server = await asyncio.start_server(self.echo, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            server.close()
+            await server.wait_closed()
+            stack.setProp(YowNetworkLayer.PROP_ENDPOINT, ("127.0.0.1", port))
+            await asyncio.wait_for(stack.run_async(), 5)
+            return stack.getLayer(1)
+
+        top = self.loop.run_until_complete(run())
+        self.assertEqual(top.events, [YowNetworkLayer.EVENT_STATE_DISCONNECTED])
+
+    def test_coalesce_writes(self):
+        writes = []
+
+        class BurstTopLayer(EchoTopLayer):
+            @EventCallback(YowNetworkLayer.EVENT_STATE_CONNECTED)
+            def onConnected(self, event):
+                layer = self.getStack().getLayer(0)
+                writelines = layer.transport.writelines
+                layer.transport.writelines = lambda data: writes.append(len(data)) or writelines(data)
+                for i in range(0, 50):
+                    self.toLower(bytearray(b"ping"[i % 4:i % 4 + 1]) * 4)
+
+            def receive(self, data):
+                self.received.extend(data)
+                if len(self.received) == 200:
+                    self.broadcastEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECT))
+
+        async def run():
+            server = await asyncio.start_server(self.echo, "127.0.0.1", 0)
+            stack = YowStack((YowNetworkLayer, BurstTopLayer), reversed=False)
+            stack.setProp(YowNetworkLayer.PROP_ENDPOINT, ("127.0.0.1", server.sockets[0].getsockname()[1]))
+            await asyncio.wait_for(stack.run_async(), 5)
+            server.close()
+            await server.wait_closed()
+            return stack.getLayer(1)
+
+        top = self.loop.run_until_complete(run())
+        self.assertEqual(writes, [50])
+        self.assertEqual(bytes(top.received[:8]), b"ppppiiii")
+
+
+@unittest.skipIf(asyncore is None, "asyncore is not available")
+class AsyncoreSendQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.layer = YowNetworkLayer()
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+        self.layer.set_socket(self.sock)
+        self.layer.connected = True
+        self.layer.state = YowNetworkLayer.STATE_CONNECTED
+
+    def tearDown(self):
+        self.sock.close()
+        self.peer.close()
+
+    def test_read_into(self):
+        received = []
+        self.layer.setStack(YowStack())
+        self.layer.setProp(YowNetworkLayer.PROP_NET_READ_INTO, True)
+        self.layer.setProp(YowNetworkLayer.PROP_NET_READSIZE_MAX, 4096)
+        self.layer.receive = lambda data: received.append(bytes(data))
+        payload = bytes(range(0, 256)) * 64
+        self.peer.sendall(payload)
+        while sum(len(data) for data in received) < len(payload):
+            self.layer.handle_read()
+        self.assertEqual(b"".join(received), payload)
+        self.assertEqual([len(data) for data in received[:4]], [1024, 2048, 4096, 4096])
+        self.assertEqual(self.layer.readSize, 4096)
+
+        self.peer.close()
+        self.layer.handle_read()
+        self.assertFalse(self.layer.connected)
+
+    def test_send_coalesced(self):
+        calls = []
+        sock = self.layer.socket
+
+        class CountingSocket(object):
+            def sendmsg(self, buffers):
+                calls.append(len(buffers))
+                return sock.sendmsg(buffers)
+
+            def __getattr__(self, name):
+                return getattr(sock, name)
+
+        self.layer.socket = CountingSocket()
+        for i in range(0, 3):
+            self.layer.send(bytearray([i]) * 10)
+        # nothing is written before the loop polls
+        self.assertEqual(calls, [])
+        self.assertTrue(self.layer.writable())
+        self.layer.handle_write()
+        self.assertEqual(calls, [3])
+        self.assertFalse(self.layer.writable())
+        self.peer.settimeout(5)
+        self.assertEqual(self.peer.recv(1024), b"\0" * 10 + b"\1" * 10 + b"\2" * 10)
+
+    def test_send_queue(self):
+        frames = [bytearray([i % 256]) * 1000 for i in range(0, 2000)]
+        for frame in frames:
+            self.layer.send(frame)
+        self.assertTrue(self.layer.writable())
+        self.layer.handle_write()
+        # socket buffer filled up, the rest waits in the queue
+        self.assertTrue(self.layer.writable())
+
+        received = bytearray()
+        self.peer.settimeout(5)
+        while len(received) < 2000 * 1000:
+            received.extend(self.peer.recv(1 << 16))
+            self.layer.handle_write()
+        self.assertEqual(bytes(received), b"".join(frames))
+        self.assertFalse(self.layer.writable())
+
+
+class WithoutAsyncoreTest(unittest.TestCase):
+    """
+    Python 3.12 removed asyncore, the layer has to work on asyncio alone. Runs in a fresh interpreter that
+    can't import asyncore.
+    """
+
+    def test_disconnect_unconnected(self):
+        script = textwrap.dedent("""
+            import sys
+            sys.modules["asyncore"] = None
+            from yowsup.layers import YowLayer, YowLayerEvent
+            from yowsup.layers.network import YowNetworkLayer
+            from yowsup.stacks import YowStack
+
+            class EventsLayer(YowLayer):
+                events = []
+
+                def onEvent(self, event):
+                    self.events.append(event.getName())
+
+            stack = YowStack((YowNetworkLayer, EventsLayer), reversed=False)
+            network = stack.getLayer(0)
+            assert YowNetworkLayer.__bases__[-1] is object
+            stack.broadcastEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECT))
+            assert YowNetworkLayer.EVENT_STATE_DISCONNECTED not in EventsLayer.events, EventsLayer.events
+            network.state = YowNetworkLayer.STATE_CONNECTING
+            network.handle_close("failed")
+            assert network.state == YowNetworkLayer.STATE_DISCONNECTED
+        """)
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (root, os.environ.get("PYTHONPATH")))))
+        result = subprocess.run([sys.executable, "-c", script], env=env, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+        self.assertEqual(result.returncode, 0, result.stdout.decode())
@@ -5,6 +5,9 @@ class AckProtocolEntity(ProtocolEntity):
     <ack class="{{receipt | message | ?}}" id="{{message_id}}">
     </ack>
     '''
+    # Incoming/OutgoingAckProtocolEntity are retyped from this class in fromProtocolTreeNode, so their
+    # attributes live here too
+    __slots__ = ("_id", "_class", "_from", "timestamp", "_type", "_to", "_participant")
 
     def __init__(self, _id, _class):
         super(AckProtocolEntity, self).__init__("ack")
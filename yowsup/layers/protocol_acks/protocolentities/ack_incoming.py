@@ -6,6 +6,7 @@ class IncomingAckProtocolEntity(AckProtocolEntity):
     <ack t="{{TIMESTAMP}}" from="{{FROM_JID}}" id="{{MESSAGE_ID}}" class="{{message | receipt | ?}}">
     </ack>
     '''
+    __slots__ = ()
 
     def __init__(self, _id, _class, _from, timestamp):
         super(IncomingAckProtocolEntity, self).__init__(_id, _class)
@@ -9,6 +9,7 @@ class OutgoingAckProtocolEntity(AckProtocolEntity):
     </ack>
 
     '''
+    __slots__ = ()
 
     def __init__(self, _id, _class, _type, to, participant = None):
         super(OutgoingAckProtocolEntity, self).__init__(_id, _class)
@@ -1 +1,2 @@
 from .layer import YowGroupsProtocolLayer
+from .groupscache import YowGroupsCache
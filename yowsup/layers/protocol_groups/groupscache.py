@@ -0,0 +1,202 @@
+# -*- coding utf-8 -*-
+
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+from yowsup.common import YowConstants
+
+logger = logging.getLogger(__name__)
+
+
+class YowGroupInfo(object):
+    TYPE_PARTICIPANT_ADMIN = "admin"
+
+    def __init__(self, groupJid, subject, participants, fetchedAt):
+        """
+        :param participants: dict {jid => type?}, like InfoGroupsResultIqProtocolEntity's
+        :param fetchedAt: time the server last sent the whole group info
+        """
+        self.groupJid = groupJid
+        self.subject = subject
+        self.participants = participants
+        self.fetchedAt = fetchedAt
+
+    def getGroupJid(self):
+        return self.groupJid
+
+    def getSubject(self):
+        return self.subject
+
+    def getParticipants(self):
+        return self.participants
+
+    def getGroupAdmins(self):
+        return [jid for jid, _type in self.participants.items() if _type == self.__class__.TYPE_PARTICIPANT_ADMIN]
+
+    def toDict(self):
+        return {"subject": self.subject, "participants": self.participants, "fetchedAt": self.fetchedAt}
+
+    @classmethod
+    def fromDict(cls, groupJid, data):
+        return cls(groupJid, data.get("subject"), data.get("participants", {}), data.get("fetchedAt", 0))
+
+
+class YowGroupsCache(object):
+    """
+    Group info, participants admins and subject, by group jid. Filled from group info results and kept up
+    to date by the group notifications YowGroupsProtocolLayer receives, so that sending to a group does not
+    have to ask the server who is in it first.
+
+    Info is trusted for ttl seconds after the server last sent all of it, in case a notification was missed.
+    It is persisted to storePath, if given, saveInterval seconds after it first changed and when the stack
+    disconnects. Layers of a stack share the cache set in PROP_GROUPS_CACHE:
+
+        stack.setProp(YowGroupsCache.PROP_GROUPS_CACHE, YowGroupsCache(storePath=StorageTools.constructPath(
+            phone, "groups.json")))
+
+    When the prop is not set an in memory cache is used, set it to False to always ask the server.
+    """
+    PROP_GROUPS_CACHE = "org.openwhatsapp.yowsup.prop.groups.cache"
+
+    def __init__(self, ttl=3600, storePath=None, maxGroups=4096, saveInterval=5.0, callLater=None):
+        """
+        :param ttl: seconds info is used for after it was fetched
+        :param storePath: json file info is loaded from and saved to, None to keep it in memory
+        :param maxGroups: max number of groups kept, the least recently used are dropped first
+        :param saveInterval: max seconds changes stay unsaved, 0 to save on every change
+        :param callLater: callLater(delay, fn) saves are scheduled with, fromLayer sets the stack's. Without it,
+        due saves happen on the next change
+        """
+        self.ttl = ttl
+        self.storePath = storePath
+        self.maxGroups = maxGroups
+        self.saveInterval = saveInterval
+        self.callLater = callLater
+        self.groups = collections.OrderedDict()
+        self.dirtySince = None
+        self.saveTimer = None
+        self.load()
+
+    @classmethod
+    def fromLayer(cls, layer):
+        """
+        :return: the cache of layer's stack, None if caching is disabled
+        """
+        groupsCache = layer.getProp(cls.PROP_GROUPS_CACHE)
+        if groupsCache is None:
+            groupsCache = cls()
+            layer.setProp(cls.PROP_GROUPS_CACHE, groupsCache)
+        if groupsCache is not False and groupsCache.callLater is None:
+            groupsCache.callLater = layer.getStack().callLater
+        return groupsCache if groupsCache is not False else None
+
+    @staticmethod
+    def getJid(groupId):
+        return groupId if "@" in groupId else "%s@%s" % (groupId, YowConstants.WHATSAPP_GROUP_SERVER)
+
+    def get(self, groupJid):
+        """
+        :return: YowGroupInfo, None if the group is unknown or its info expired
+        """
+        groupJid = self.getJid(groupJid)
+        groupInfo = self.groups.get(groupJid)
+        if groupInfo is None:
+            return None
+        if time.time() - groupInfo.fetchedAt >= self.ttl:
+            # no need to save for this, expired info is dropped again once loaded
+            del self.groups[groupJid]
+            return None
+        self.groups.move_to_end(groupJid)
+        return groupInfo
+
+    def putInfo(self, infoEntity):
+        """
+        :type infoEntity: InfoGroupsResultIqProtocolEntity
+        """
+        groupJid = self.getJid(infoEntity.getGroupId())
+        groupInfo = YowGroupInfo(groupJid, infoEntity.getSubject(), dict(infoEntity.getParticipants()), time.time())
+        self.groups[groupJid] = groupInfo
+        self.groups.move_to_end(groupJid)
+        while len(self.groups) > self.maxGroups:
+            self.groups.popitem(last=False)
+        self.changed()
+        return groupInfo
+
+    def addParticipants(self, groupJid, jids):
+        self.update(groupJid, lambda groupInfo: groupInfo.participants.update((jid, None) for jid in jids))
+
+    def removeParticipants(self, groupJid, jids):
+        self.update(groupJid, lambda groupInfo: [groupInfo.participants.pop(jid, None) for jid in jids])
+
+    def setParticipantsType(self, groupJid, jids, _type):
+        def setType(groupInfo):
+            for jid in jids:
+                if jid in groupInfo.participants:
+                    groupInfo.participants[jid] = _type
+        self.update(groupJid, setType)
+
+    def setSubject(self, groupJid, subject):
+        def setSubject(groupInfo):
+            groupInfo.subject = subject
+        self.update(groupJid, setSubject)
+
+    def update(self, groupJid, fn):
+        groupInfo = self.groups.get(self.getJid(groupJid))
+        if groupInfo is not None:
+            fn(groupInfo)
+            self.changed()
+
+    def invalidate(self, groupJid):
+        if self.groups.pop(self.getJid(groupJid), None) is not None:
+            self.changed()
+
+    def changed(self):
+        if self.storePath is None:
+            return
+        if self.dirtySince is None:
+            self.dirtySince = time.monotonic()
+            if self.callLater is not None and self.saveInterval > 0:
+                self.saveTimer = self.callLater(self.saveInterval, self.flush)
+        if time.monotonic() - self.dirtySince >= self.saveInterval:
+            self.flush()
+
+    def flush(self):
+        """
+        Saves unsaved changes
+        """
+        if self.saveTimer is not None:
+            self.saveTimer.cancel()
+            self.saveTimer = None
+        if self.dirtySince is not None:
+            self.dirtySince = None
+            self.save()
+
+    def load(self):
+        if self.storePath is None or not os.path.isfile(self.storePath):
+            return
+        try:
+            with open(self.storePath) as storeFile:
+                data = json.load(storeFile)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable groups cache %s: %s" % (self.storePath, e))
+            return
+        now = time.time()
+        for groupJid, groupInfo in sorted(data.items(), key=lambda item: item[1].get("fetchedAt", 0)):
+            if now - groupInfo.get("fetchedAt", 0) < self.ttl:
+                self.groups[groupJid] = YowGroupInfo.fromDict(groupJid, groupInfo)
+
+    def save(self):
+        if self.storePath is None:
+            return
+        data = dict((groupJid, groupInfo.toDict()) for groupJid, groupInfo in self.groups.items())
+        tmpPath = "%s.%s.%s.tmp" % (self.storePath, os.getpid(), threading.get_ident())
+        try:
+            with open(tmpPath, "w") as storeFile:
+                json.dump(data, storeFile)
+            os.replace(tmpPath, self.storePath)
+        except OSError as e:
+            logger.warning("Could not save groups cache to %s: %s" % (self.storePath, e))
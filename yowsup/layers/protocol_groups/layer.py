@@ -1,9 +1,11 @@
 # -*- coding utf-8 -*-
 
-from yowsup.layers import YowProtocolLayer
+from yowsup.layers import YowProtocolLayer, EventCallback
+from yowsup.layers.network import YowNetworkLayer
 from yowsup.layers.protocol_iq.protocolentities import ErrorIqProtocolEntity
 from yowsup.layers.protocol_iq.protocolentities.iq_result import ResultIqProtocolEntity
 from .protocolentities import *
+from .groupscache import YowGroupsCache, YowGroupInfo
 import logging
 logger = logging.getLogger(__name__)
 
@@ -33,6 +35,12 @@ class YowGroupsProtocolLayer(YowProtocolLayer):
     def __str__(self):
         return "Groups Iq Layer"
 
+    @EventCallback(YowNetworkLayer.EVENT_STATE_DISCONNECTED)
+    def onDisconnected(self, event):
+        groupsCache = self.getProp(YowGroupsCache.PROP_GROUPS_CACHE)
+        if isinstance(groupsCache, YowGroupsCache):
+            groupsCache.flush()
+
     def sendIq(self, entity):
         if entity.__class__ in self.__class__.HANDLE:
             if entity.__class__ == SubjectGroupsIqProtocolEntity:
@@ -79,6 +87,7 @@ class YowGroupsProtocolLayer(YowProtocolLayer):
 
     def onAddParticipantsSuccess(self, node, originalIqEntity):
         logger.info("Group add participants success")
+        self.invalidateGroups([originalIqEntity.group_jid])
         self.toUpper(SuccessAddParticipantsIqProtocolEntity.fromProtocolTreeNode(node))
 
     def onRemoveParticipantsFailed(self, node, originalIqEntity):
@@ -87,6 +96,7 @@ class YowGroupsProtocolLayer(YowProtocolLayer):
 
     def onRemoveParticipantsSuccess(self, node, originalIqEntity):
         logger.info("Group remove participants success")
+        self.invalidateGroups([originalIqEntity.group_jid])
         self.toUpper(SuccessRemoveParticipantsIqProtocolEntity.fromProtocolTreeNode(node))
 
     def onPromoteParticipantsFailed(self, node, originalIqEntity):
@@ -95,6 +105,7 @@ class YowGroupsProtocolLayer(YowProtocolLayer):
 
     def onPromoteParticipantsSuccess(self, node, originalIqEntity):
         logger.info("Group promote participants success")
+        self.invalidateGroups([originalIqEntity.group_jid])
         self.toUpper(ResultIqProtocolEntity.fromProtocolTreeNode(node))
 
     def onDemoteParticipantsFailed(self, node, originalIqEntity):
@@ -103,6 +114,7 @@ class YowGroupsProtocolLayer(YowProtocolLayer):
 
     def onDemoteParticipantsSuccess(self, node, originalIqEntity):
         logger.info("Group demote participants success")
+        self.invalidateGroups([originalIqEntity.group_jid])
         self.toUpper(ResultIqProtocolEntity.fromProtocolTreeNode(node))
 
     def onAddParticipantsFailed(self, node, originalIqEntity):
@@ -114,6 +126,7 @@ class YowGroupsProtocolLayer(YowProtocolLayer):
 
     def onLeaveGroupSuccess(self, node, originalIqEntity):
         logger.info("Group leave success")
+        self.invalidateGroups(originalIqEntity.groupList)
         self.toUpper(SuccessLeaveGroupsIqProtocolEntity.fromProtocolTreeNode(node))
 
     def onLeaveGroupFailed(self, node, originalIqEntity):
@@ -122,23 +135,50 @@ class YowGroupsProtocolLayer(YowProtocolLayer):
 
     def onInfoGroupSuccess(self, node, originalIqEntity):
         logger.info("Group info success")
-        self.toUpper(InfoGroupsResultIqProtocolEntity.fromProtocolTreeNode(node))
+        entity = InfoGroupsResultIqProtocolEntity.fromProtocolTreeNode(node)
+        groupsCache = YowGroupsCache.fromLayer(self)
+        if groupsCache is not None:
+            groupsCache.putInfo(entity)
+        self.toUpper(entity)
 
     def onInfoGroupFailed(self, node, originalIqEntity):
         logger.error("Group info failed")
         self.toUpper(ErrorIqProtocolEntity.fromProtocolTreeNode(node))
 
+    def invalidateGroups(self, groupJids):
+        groupsCache = YowGroupsCache.fromLayer(self)
+        if groupsCache is not None:
+            for groupJid in groupJids:
+                groupsCache.invalidate(groupJid)
+
     def recvNotification(self, node):
         if node["type"] == "w:gp2":
+            groupsCache = YowGroupsCache.fromLayer(self)
             if node.getChild("subject"):
-                self.toUpper(SubjectGroupsNotificationProtocolEntity.fromProtocolTreeNode(node))
+                entity = SubjectGroupsNotificationProtocolEntity.fromProtocolTreeNode(node)
+                if groupsCache is not None:
+                    groupsCache.setSubject(entity.getGroupId(), entity.getSubject())
             elif node.getChild("create"):
-                self.toUpper(CreateGroupsNotificationProtocolEntity.fromProtocolTreeNode(node))
+                entity = CreateGroupsNotificationProtocolEntity.fromProtocolTreeNode(node)
+                if groupsCache is not None:
+                    groupsCache.invalidate(entity.getGroupId())
             elif node.getChild("remove"):
-                self.toUpper(RemoveGroupsNotificationProtocolEntity.fromProtocolTreeNode(node))
+                entity = RemoveGroupsNotificationProtocolEntity.fromProtocolTreeNode(node)
+                if groupsCache is not None:
+                    groupsCache.removeParticipants(entity.getGroupId(), entity.getParticipants())
             elif node.getChild("add"):
-                self.toUpper(AddGroupsNotificationProtocolEntity.fromProtocolTreeNode(node))
+                entity = AddGroupsNotificationProtocolEntity.fromProtocolTreeNode(node)
+                if groupsCache is not None:
+                    groupsCache.addParticipants(entity.getGroupId(), entity.getParticipants())
             elif node.getChild("promote"):
-                self.toUpper(PromoteGroupsNotificationProtocolEntity.fromProtocolTreeNode(node))
-            elif node.getChild("remote"):
-                self.toUpper(DemoteGroupsNotificationProtocolEntity.fromProtocolTreeNode(node))
+                entity = PromoteGroupsNotificationProtocolEntity.fromProtocolTreeNode(node)
+                if groupsCache is not None:
+                    groupsCache.setParticipantsType(entity.getGroupId(), entity.getParticipants(),
+                                                    YowGroupInfo.TYPE_PARTICIPANT_ADMIN)
+            elif node.getChild("demote"):
+                entity = DemoteGroupsNotificationProtocolEntity.fromProtocolTreeNode(node)
+                if groupsCache is not None:
+                    groupsCache.setParticipantsType(entity.getGroupId(), entity.getParticipants(), None)
+            else:
+                return
+            self.toUpper(entity)
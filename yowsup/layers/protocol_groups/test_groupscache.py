@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from yowsup.layers import YowLayer, YowLayerEvent
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.protocol_groups import YowGroupsProtocolLayer
+from yowsup.layers.protocol_groups.groupscache import YowGroupsCache
+from yowsup.layers.protocol_groups.protocolentities import InfoGroupsIqProtocolEntity, \
+    InfoGroupsResultIqProtocolEntity
+from yowsup.stacks import YowStack
+from yowsup.structs import ProtocolTreeNode
+
+GROUP_JID = "491234567890-1500000000@g.us"
+
+
+def getInfoEntity(_id="1"):
+    return InfoGroupsResultIqProtocolEntity(_id, GROUP_JID, GROUP_JID.split("@")[0], 1500000000,
+                                            "491234567890@s.whatsapp.net", "subject", 1500000000,
+                                            "491234567890@s.whatsapp.net",
+                                            {"491234567890@s.whatsapp.net": "admin",
+                                             "491234567891@s.whatsapp.net": None})
+
+
+def getNotificationNode(action, jids, **attributes):
+    return ProtocolTreeNode("notification", {"type": "w:gp2", "from": GROUP_JID, "id": "n", "t": "1500000001",
+                                             "participant": "491234567890@s.whatsapp.net", "notify": "n"},
+                            [ProtocolTreeNode(action, attributes,
+                                              [ProtocolTreeNode("participant", {"jid": jid}) for jid in jids])])
+
+
+class YowGroupsCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def test_put_get(self):
+        groupsCache = YowGroupsCache()
+        groupsCache.putInfo(getInfoEntity())
+        groupInfo = groupsCache.get(GROUP_JID)
+        self.assertIs(groupsCache.get(GROUP_JID.split("@")[0]), groupInfo)
+        self.assertEqual(groupInfo.getSubject(), "subject")
+        self.assertEqual(groupInfo.getGroupAdmins(), ["491234567890@s.whatsapp.net"])
+
+    def test_ttl(self):
+        groupsCache = YowGroupsCache(ttl=60)
+        groupsCache.putInfo(getInfoEntity()).fetchedAt -= 61
+        self.assertIsNone(groupsCache.get(GROUP_JID))
+        self.assertEqual(len(groupsCache.groups), 0)
+
+    def test_max_groups(self):
+        groupsCache = YowGroupsCache(maxGroups=1)
+        groupsCache.putInfo(getInfoEntity())
+        other = getInfoEntity()
+        other.groupId = "491234567890-1600000000"
+        groupsCache.putInfo(other)
+        self.assertIsNone(groupsCache.get(GROUP_JID))
+        self.assertIsNotNone(groupsCache.get(other.groupId))
+
+    def test_persist(self):
+        storePath = os.path.join(self.tmpDir, "groups.json")
+        calls = []
+        groupsCache = YowGroupsCache(storePath=storePath, callLater=lambda *args: calls.append(args))
+        groupsCache.putInfo(getInfoEntity())
+        groupsCache.addParticipants(GROUP_JID, ["491234567892@s.whatsapp.net"])
+        # saved once, later
+        self.assertEqual(calls, [(5.0, groupsCache.flush)])
+        self.assertFalse(os.path.exists(storePath))
+        groupsCache.flush()
+        restored = YowGroupsCache(storePath=storePath).get(GROUP_JID)
+        self.assertEqual(restored.getParticipants(), groupsCache.get(GROUP_JID).getParticipants())
+
+        with open(storePath, "w") as storeFile:
+            storeFile.write("{")
+        self.assertEqual(len(YowGroupsCache(storePath=storePath).groups), 0)
+
+    def test_save_interval(self):
+        storePath = os.path.join(self.tmpDir, "groups.json")
+        groupsCache = YowGroupsCache(storePath=storePath, saveInterval=0)
+        groupsCache.putInfo(getInfoEntity()).fetchedAt -= 3600
+        self.assertEqual(len(YowGroupsCache(storePath=storePath).groups), 1)
+        mtime = os.stat(storePath).st_mtime_ns
+        # expiring does not save
+        self.assertIsNone(groupsCache.get(GROUP_JID))
+        self.assertEqual(os.stat(storePath).st_mtime_ns, mtime)
+
+
+class RecordingLayer(YowLayer):
+    def __init__(self):
+        super(RecordingLayer, self).__init__()
+        self.sent = []
+        self.received = []
+
+    def send(self, data):
+        self.sent.append(data)
+
+    def receive(self, data):
+        self.received.append(data)
+
+
+class YowGroupsProtocolLayerCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.stack = YowStack((RecordingLayer, YowGroupsProtocolLayer, RecordingLayer), reversed=False)
+        self.layer = self.stack.getLayer(1)
+        self.groupsCache = YowGroupsCache.fromLayer(self.layer)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def test_info_result(self):
+        self.layer.send(InfoGroupsIqProtocolEntity(GROUP_JID, _id="1"))
+        self.layer.receive(getInfoEntity().toProtocolTreeNode())
+        self.assertEqual(len(self.groupsCache.get(GROUP_JID).getParticipants()), 2)
+        self.assertEqual(len(self.stack.getLayer(2).received), 1)
+
+    def test_notifications(self):
+        self.groupsCache.putInfo(getInfoEntity())
+        self.layer.receive(getNotificationNode("add", ["491234567892@s.whatsapp.net"]))
+        self.layer.receive(getNotificationNode("remove", ["491234567891@s.whatsapp.net"], subject="subject"))
+        self.layer.receive(getNotificationNode("promote", ["491234567892@s.whatsapp.net"], subject="subject"))
+        self.layer.receive(getNotificationNode("demote", ["491234567890@s.whatsapp.net"], subject="subject"))
+        self.assertEqual(self.groupsCache.get(GROUP_JID).getParticipants(),
+                         {"491234567890@s.whatsapp.net": None, "491234567892@s.whatsapp.net": "admin"})
+        self.assertEqual(len(self.stack.getLayer(2).received), 4)
+
+    def test_save_on_disconnect(self):
+        storePath = os.path.join(self.tmpDir, "groups.json")
+        groupsCache = YowGroupsCache(storePath=storePath)
+        self.stack.setProp(YowGroupsCache.PROP_GROUPS_CACHE, groupsCache)
+        self.layer.send(InfoGroupsIqProtocolEntity(GROUP_JID, _id="1"))
+        self.layer.receive(getInfoEntity().toProtocolTreeNode())
+        self.assertIsNotNone(groupsCache.saveTimer)
+        self.assertFalse(os.path.exists(storePath))
+        self.stack.broadcastEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECTED))
+        self.assertEqual(len(YowGroupsCache(storePath=storePath).groups), 1)
+
+    def test_disabled(self):
+        self.stack.setProp(YowGroupsCache.PROP_GROUPS_CACHE, False)
+        self.assertIsNone(YowGroupsCache.fromLayer(self.layer))
+        self.layer.receive(getNotificationNode("add", ["491234567892@s.whatsapp.net"]))
+        self.assertEqual(len(self.stack.getLayer(2).received), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,6 @@
 # -*- coding utf-8 -*-
 
-import time
 import logging
-from threading import Thread, Lock
 from yowsup.layers import YowProtocolLayer, YowLayerEvent, EventCallback
 from yowsup.common import YowConstants
 from yowsup.layers.network import YowNetworkLayer
@@ -17,9 +15,8 @@ class YowIqProtocolLayer(YowProtocolLayer):
         handleMap = {
             "iq": (self.recvIq, self.sendIq)
         }
-        self._pingThread = None
+        self._pingTimer = None
         self._pingQueue = {}
-        self._pingQueueLock = Lock()
         self.__logger = logging.getLogger(__name__)
         super(YowIqProtocolLayer, self).__init__(handleMap)
 
@@ -42,16 +39,12 @@ class YowIqProtocolLayer(YowProtocolLayer):
             self.toLower(entity.toProtocolTreeNode())
 
     def gotPong(self, pingId):
-        self._pingQueueLock.acquire()
         if pingId in self._pingQueue:
             self._pingQueue = {}
-        self._pingQueueLock.release()
 
     def waitPong(self, id):
-        self._pingQueueLock.acquire()
         self._pingQueue[id] = None
         pingQueueSize = len(self._pingQueue)
-        self._pingQueueLock.release()
         self.__logger.debug("ping queue size: %d" % pingQueueSize)
         if pingQueueSize >= 2:
             self.getStack().broadcastEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECT, reason="Ping Timeout"))
@@ -59,51 +52,30 @@ class YowIqProtocolLayer(YowProtocolLayer):
     @EventCallback(YowAuthenticationProtocolLayer.EVENT_AUTHED)
     def onAuthed(self, event):
         interval = self.getProp(self.__class__.PROP_PING_INTERVAL, 50)
-        if not self._pingThread and interval > 0:
+        if not self._pingTimer and interval > 0:
             self._pingQueue = {}
-            self._pingThread = YowPingThread(self, interval)
-            self.__logger.debug("starting ping thread.")
-            self._pingThread.start()
-
-    def stop_thread(self):
-        if self._pingThread:
-            self.__logger.debug("stopping ping thread")
-            if self._pingThread:
-                self._pingThread.stop()
-                self._pingThread = None
+            self.__logger.debug("scheduling pings every %ss" % interval)
+            self._pingTimer = self.getStack().callLater(interval, self.ping, interval)
+
+    def ping(self, interval):
+        ping = PingIqProtocolEntity()
+        self.waitPong(ping.getId())
+        # a ping timeout disconnects and stops pinging
+        if self._pingTimer is not None:
+            self.sendIq(ping)
+            self._pingTimer = self.getStack().callLater(interval, self.ping, interval)
+
+    def stopPing(self):
+        if self._pingTimer:
+            self.__logger.debug("stopping pings")
+            self._pingTimer.cancel()
+            self._pingTimer = None
             self._pingQueue = {}
 
     @EventCallback(YowNetworkLayer.EVENT_STATE_DISCONNECT)
     def onDisconnect(self, event):
-        self.stop_thread()
+        self.stopPing()
 
     @EventCallback(YowNetworkLayer.EVENT_STATE_DISCONNECTED)
     def onDisconnected(self, event):
-        self.stop_thread()
-
-
-class YowPingThread(Thread):
-    def __init__(self, layer, interval):
-        assert type(layer) is YowIqProtocolLayer, "layer must be a YowIqProtocolLayer, got %s instead." % type(layer)
-        self._layer = layer
-        self._interval = interval
-        self._stop = False
-        self.__logger = logging.getLogger(__name__)
-        super(YowPingThread, self).__init__()
-        self.daemon = True
-        self.name = "YowPing%s" % self.name
-
-    def run(self):
-        while not self._stop:
-            for i in range(0, self._interval):
-                time.sleep(1)
-                if self._stop:
-                    self.__logger.debug("%s - ping thread stopped" % self.name)
-                    return
-            ping = PingIqProtocolEntity()
-            self._layer.waitPong(ping.getId())
-            if not self._stop:
-                self._layer.sendIq(ping)
-
-    def stop(self):
-        self._stop = True
+        self.stopPing()
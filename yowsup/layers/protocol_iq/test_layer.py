@@ -0,0 +1,60 @@
+import time
+import unittest
+
+from yowsup.layers import YowLayer, YowLayerEvent
+from yowsup.layers.auth import YowAuthenticationProtocolLayer
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.protocol_iq import YowIqProtocolLayer
+from yowsup.stacks import YowStack
+from yowsup.structs import ProtocolTreeNode
+
+
+class SinkLayer(YowLayer):
+    def __init__(self):
+        super(SinkLayer, self).__init__()
+        self.sent = []
+        self.events = []
+
+    def send(self, data):
+        self.sent.append(data)
+
+    def onEvent(self, yowLayerEvent):
+        self.events.append(yowLayerEvent.getName())
+        return False
+
+
+class YowIqProtocolLayerTest(unittest.TestCase):
+    def setUp(self):
+        self.stack = YowStack((SinkLayer, YowIqProtocolLayer), reversed=False)
+        self.stack.setProp(YowIqProtocolLayer.PROP_PING_INTERVAL, 0.01)
+        self.sink = self.stack.getLayer(0)
+        self.layer = self.stack.getLayer(1)
+
+    def runScheduler(self, until, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not until() and time.monotonic() < deadline:
+            self.stack.scheduler.runReady()
+            time.sleep(0.005)
+        self.assertTrue(until())
+
+    def test_ping(self):
+        self.stack.broadcastEvent(YowLayerEvent(YowAuthenticationProtocolLayer.EVENT_AUTHED))
+        self.runScheduler(lambda: len(self.sink.sent) == 1)
+        ping = self.sink.sent[0]
+        self.assertEqual(ping["xmlns"], "w:p")
+
+        self.layer.receive(ProtocolTreeNode("iq", {"id": ping["id"], "type": "result", "from": "s.whatsapp.net"}))
+        self.runScheduler(lambda: len(self.sink.sent) == 2)
+        self.assertNotIn(YowNetworkLayer.EVENT_STATE_DISCONNECT, self.sink.events)
+
+    def test_ping_timeout(self):
+        self.stack.broadcastEvent(YowLayerEvent(YowAuthenticationProtocolLayer.EVENT_AUTHED))
+        self.runScheduler(lambda: YowNetworkLayer.EVENT_STATE_DISCONNECT in self.sink.events)
+        self.assertEqual(len(self.sink.sent), 1)
+        self.assertIsNone(self.layer._pingTimer)
+        self.stack.scheduler.runReady()
+        self.assertEqual(self.sink.events.count(YowNetworkLayer.EVENT_STATE_DISCONNECT), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,3 @@
-import inspect
 from copy import deepcopy
 
 from yowsup.layers.protocol_receipts.protocolentities import OutgoingReceiptProtocolEntity
@@ -90,6 +89,18 @@ class MessageContext(object):
 
 
 class MessageProtocolEntity(ProtocolEntity):
+    # names of the properties each class declares itself, filled in once per class by __init_subclass__
+    _properties = ()
+    __slots__ = ("_participant", "_destination", "_retry", "_offline", "_notify", "_timestamp", "_sender",
+                 "_message_id", "_message_type", "_media_type", "_context")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._properties = cls.getOwnProperties()
+
+    @classmethod
+    def getOwnProperties(cls):
+        return tuple(name for name, value in vars(cls).items() if isinstance(value, property))
 
     def __init__(self, ptn=None, **kwargs):
 
@@ -102,12 +113,14 @@ class MessageProtocolEntity(ProtocolEntity):
         assert (self.sender or self.destination), "Must specify either to or _from jids to create the message"
         assert not (self.sender and self.destination), "Can't set both attributes to message at same time (to, _from)"
 
-    def load_properties(self, **kwargs):
-        stack = inspect.stack()
-        caller_class = stack[1][0].f_locals['__class__']
-        props = [name for name, value in vars(caller_class).items() if isinstance(value, property)]
-        for p in props:
-            setattr(self, p, kwargs[p] if p in kwargs else None)
+    @classmethod
+    def load_properties(cls, entity, **kwargs):
+        """
+        Sets the properties declared by cls (not inherited ones) on entity from kwargs, None when missing.
+        Called as SomeMessageProtocolEntity.load_properties(self, **kwargs)
+        """
+        for p in cls._properties:
+            setattr(entity, p, kwargs.get(p))
 
     @property
     def participant(self):
@@ -280,3 +293,6 @@ class MessageProtocolEntity(ProtocolEntity):
             attribs["participant"] = self.participant
 
         return self._createProtocolTreeNode(attribs, children=None, data=None)
+
+
+MessageProtocolEntity._properties = MessageProtocolEntity.getOwnProperties()
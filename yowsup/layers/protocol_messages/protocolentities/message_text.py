@@ -3,6 +3,7 @@ from .message import MessageProtocolEntity
 
 
 class TextMessageProtocolEntity(MessageProtocolEntity):
+    __slots__ = ("_text",)
 
     def __init__(self, ptn=None, **kwargs):
         super().__init__(ptn, message_type="text", **kwargs)
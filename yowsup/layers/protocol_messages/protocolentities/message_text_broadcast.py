@@ -23,8 +23,8 @@ class BroadcastTextMessage(TextMessageProtocolEntity):
 
     @staticmethod
     def fromProtocolTreeNode(node):
-        entity = TextMessageProtocolEntity.fromProtocolTreeNode(node)
-        entity.__class__ = BroadcastTextMessage
+        entity = BroadcastTextMessage.__new__(BroadcastTextMessage)
+        TextMessageProtocolEntity.__init__(entity, node)
         jids = [toNode.getAttributeValue("jid") for toNode in node.getChild("broadcast").getAllChildren()]
         entity.setBroadcastProps(jids)
         return entity
@@ -0,0 +1,30 @@
+import unittest
+
+from yowsup.layers.protocol_messages.protocolentities import TextMessageProtocolEntity, \
+    ImageMessageProtocolEntity, MessageProtocolEntity
+from yowsup.layers.protocol_messages.protocolentities.message_downloadable import \
+    DownloadableMessageProtocolEntity
+
+
+class MessageProtocolEntityPropertiesTest(unittest.TestCase):
+    def test_own_properties(self):
+        self.assertEqual(TextMessageProtocolEntity._properties, ("text",))
+        self.assertIn("destination", MessageProtocolEntity._properties)
+        self.assertNotIn("destination", DownloadableMessageProtocolEntity._properties)
+        self.assertIn("url", DownloadableMessageProtocolEntity._properties)
+
+    def test_load_properties(self):
+        entity = ImageMessageProtocolEntity(destination="491234567890@s.whatsapp.net", url="https://mmg",
+                                            mimetype="image/jpeg", height=100, width="120", caption="hi")
+        self.assertEqual(entity.destination, "491234567890@s.whatsapp.net")
+        self.assertIsNone(entity.sender)
+        self.assertIsNotNone(entity.message_id)
+        self.assertEqual(entity.url, "https://mmg")
+        self.assertEqual(entity.width, 120)
+        self.assertEqual(entity.caption, "hi")
+
+    def test_text(self):
+        entity = TextMessageProtocolEntity(text="hello", destination="491234567890@s.whatsapp.net")
+        node = entity.toProtocolTreeNode()
+        self.assertEqual(node["to"], "491234567890@s.whatsapp.net")
+        self.assertEqual(node.getChild("body").getData(), "hello")
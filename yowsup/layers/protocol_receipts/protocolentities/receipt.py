@@ -13,6 +13,7 @@ class ReceiptProtocolEntity(ProtocolEntity):
     INCOMING
     <receipt offline="0" from="4915225256022@s.whatsapp.net" id="1415577964-1" t="1415578027" type="played?"></receipt>
     """
+    __slots__ = ("_id",)
 
     def __init__(self, _id):
         super(ReceiptProtocolEntity, self).__init__("receipt")
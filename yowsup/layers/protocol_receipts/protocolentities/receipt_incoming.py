@@ -38,6 +38,7 @@ class IncomingReceiptProtocolEntity(ReceiptProtocolEntity):
     INCOMING
     <receipt offline="0" from="xxxxxxxxxx@s.whatsapp.net" id="1415577964-1" t="1415578027"></receipt>
     """
+    __slots__ = ("_from", "timestamp", "type", "participant", "offline", "items")
 
     def __init__(self, _id, _from, timestamp, offline=None, type=None, participant=None, items=None):
         super(IncomingReceiptProtocolEntity, self).__init__(_id)
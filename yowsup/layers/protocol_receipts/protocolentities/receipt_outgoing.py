@@ -21,7 +21,7 @@ class OutgoingReceiptProtocolEntity(ReceiptProtocolEntity):
         </list>
     </receipt>
     '''
-
+    __slots__ = ("messageIds", "to", "read", "participant", "callId")
 
     def __init__(self, messageIds, to, read = False, participant = None, callId = None):
         if type(messageIds) in (list, tuple):
@@ -78,7 +78,7 @@ class OutgoingReceiptProtocolEntity(ReceiptProtocolEntity):
         listNode = node.getChild("list")
         messageIds = []
         if listNode:
-            messageIds = [child["id"] for child in listNode.getChildren()]
+            messageIds = [child["id"] for child in listNode.getAllChildren()]
         else:
             messageIds = [node["id"]]
 
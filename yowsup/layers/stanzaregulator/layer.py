@@ -5,52 +5,91 @@ from yowsup.layers.network import YowNetworkLayer
 class YowStanzaRegulator(YowLayer):
     """
         send:       bytearray -> bytearray
-        receive:    bytearray -> bytearray
+        receive:    bytearray -> memoryview
     """
 
+    # max frames handed upwards in one go when running on an asyncio loop,
+    # the rest is processed on a later loop iteration so stacks sharing the loop take turns
+    PROP_FRAMES_PER_TICK = "org.openwhatsapp.yowsup.prop.stanzaregulator.framesPerTick"
+
+    # consumed bytes kept at the head of buf before they are discarded
+    COMPACT_THRESHOLD = 64 * 1024
+
     def __init__(self):
         super(YowStanzaRegulator, self).__init__()
         self.buf = bytearray()
+        self.offset = 0
         self.enabled = False
+        self.processScheduled = False
 
     @EventCallback(YowNetworkLayer.EVENT_STATE_CONNECTED)
     def onConnected(self, yowLayerEvent):
         self.enabled = True
         self.buf = bytearray()
+        self.offset = 0
+        self.processScheduled = False
 
     @EventCallback(YowNetworkLayer.EVENT_STATE_DISCONNECTED)
     def onDisconnected(self, yowLayerEvent):
         self.enabled = False
 
-    def send(self, data):
-        self.toLower(data)
-
     def receive(self, data):
         if self.enabled:
-            self.buf.extend(data)
-            self.processReceived()
+            self.append(data)
+            if not self.processScheduled:
+                self.processReceived()
         else:
             self.toLower(data)
 
+    def append(self, data):
+        try:
+            self.buf.extend(data)
+        except BufferError:
+            # an upper layer still holds a view of a frame, continue on a fresh buffer
+            self.buf = self.buf[self.offset:]
+            self.offset = 0
+            self.buf.extend(data)
+
+    def getFrameBudget(self):
+        stack = self.getStack()
+        if stack is None or stack.getEventLoop() is None:
+            return None
+        return stack.getProp(self.__class__.PROP_FRAMES_PER_TICK)
+
     def processReceived(self):
-        metaData = self.buf[:3]
-        recvData = self.buf[3:]
+        self.processScheduled = False
+        budget = self.getFrameBudget()
+        # buf and offset are re-read every round as an upper layer may reset them (reconnect)
+        while self.enabled and len(self.buf) - self.offset >= 3:
+            buf = self.buf
+            start = self.offset
+            firstByte = buf[start]
+            stanzaSize = ((buf[start + 1] << 8) + buf[start + 2]) | ((firstByte & 0x0F) << 16)
+            end = start + 3 + stanzaSize
 
-        firstByte = metaData[0]
-        stanzaFlag = (firstByte & 0xF0) >> 4
-        stanzaSize = ((metaData[1] << 8) + metaData[2]) | ((firstByte & 0x0F) << 16)
+            if len(buf) < end:
+                # will in leave in buf till receive remaining data
+                break
 
-        if len(recvData) < stanzaSize:
-            # will in leave in buf till receive remaining data
-            return
+            if budget is not None:
+                if budget <= 0:
+                    self.processScheduled = True
+                    self.getStack().execDetached(self.processReceived)
+                    break
+                budget -= 1
 
-        oneMessageData = metaData + recvData[:stanzaSize]
-        self.buf = self.buf[len(oneMessageData):]
+            self.offset = end
+            self.toUpper(memoryview(buf)[start:end])
 
-        self.toUpper(oneMessageData)
+        self.compact()
 
-        if len(self.buf) > 3:  # min required if has processable data yet
-            self.processReceived()
+    def compact(self):
+        if self.offset and (self.offset == len(self.buf) or self.offset >= self.__class__.COMPACT_THRESHOLD):
+            try:
+                del self.buf[:self.offset]
+            except BufferError:
+                self.buf = self.buf[self.offset:]
+            self.offset = 0
 
     def __str__(self):
         return "Stanza Regulator Layer"
@@ -0,0 +1,69 @@
+from yowsup.layers import YowLayerTest, YowLayerEvent
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.stanzaregulator import YowStanzaRegulator
+
+
+class YowStanzaRegulatorTest(YowLayerTest, YowStanzaRegulator):
+    def setUp(self):
+        YowStanzaRegulator.__init__(self)
+        self.onEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_CONNECTED))
+
+    @staticmethod
+    def frame(payload, flag=0):
+        size = len(payload)
+        return bytearray([(flag << 4) | (size >> 16), (size >> 8) & 0xFF, size & 0xFF]) + payload
+
+    def test_receive_split(self):
+        frame = self.frame(b"hello")
+        self.receive(frame[:2])
+        self.receive(frame[2:6])
+        self.assertEqual(self.upperSink, [])
+        self.receive(frame[6:])
+        self.assertEqual(bytes(self.upperSink.pop()), bytes(frame))
+
+    def test_receive_burst(self):
+        frames = [self.frame(bytes([i % 256]) * (i * 7)) for i in range(0, 3000)]
+        self.receive(b"".join(frames))
+        self.assertEqual([bytes(f) for f in self.upperSink], [bytes(f) for f in frames])
+        self.assertEqual(len(self.buf) - self.offset, 0)
+
+    def test_compact(self):
+        received = []
+        self.toUpper = lambda data: received.append(bytes(data))
+        frame = self.frame(b"x" * 1000)
+        for i in range(0, 200):
+            self.receive(frame + frame[:10])
+            self.assertEqual(len(self.buf) - self.offset, 10)
+            self.receive(frame[10:])
+            self.assertTrue(self.offset < self.__class__.COMPACT_THRESHOLD)
+        self.assertEqual(len(received), 400)
+
+    def test_frame_held_upwards(self):
+        held = []
+        self.toUpper = held.append
+        self.receive(self.frame(b"abc") + self.frame(b"de")[:2])
+        self.receive(self.frame(b"de")[2:])
+        self.assertEqual([bytes(f) for f in held], [bytes(self.frame(b"abc")), bytes(self.frame(b"de"))])
+
+    def test_frames_per_tick(self):
+        scheduled = []
+
+        class Stack(object):
+            def getEventLoop(self):
+                return True
+
+            def getProp(self, key, default=None):
+                return 2 if key == YowStanzaRegulator.PROP_FRAMES_PER_TICK else default
+
+            def execDetached(self, fn):
+                scheduled.append(fn)
+
+        self.setStack(Stack())
+        frames = [self.frame(bytes([i])) for i in range(0, 5)]
+        self.receive(b"".join(frames[:4]))
+        self.assertEqual(len(self.upperSink), 2)
+        self.receive(frames[4])
+        self.assertEqual(len(self.upperSink), 2)
+        while scheduled:
+            scheduled.pop(0)()
+        self.assertEqual([bytes(f) for f in self.upperSink], [bytes(f) for f in frames])
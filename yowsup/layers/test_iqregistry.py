@@ -0,0 +1,88 @@
+import time
+import unittest
+
+from yowsup.layers import YowLayer, YowLayerEvent, YowParallelLayer, YowProtocolLayer, YowIqRegistry
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.protocol_iq.protocolentities import IqProtocolEntity
+from yowsup.stacks import YowStack
+from yowsup.structs import ProtocolTreeNode
+
+
+class SinkLayer(YowLayer):
+    def __init__(self):
+        super(SinkLayer, self).__init__()
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+class IqLayer(YowProtocolLayer):
+    pass
+
+
+class YowIqRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.stack = YowStack((SinkLayer, YowParallelLayer((IqLayer,))), reversed=False)
+        self.sink = self.stack.getLayer(0)
+        self.parallel = self.stack.getLayer(1)
+        self.layer = self.parallel.sublayers[0]
+        self.results = []
+        self.errors = []
+
+    def sendIq(self, _id):
+        self.layer._sendIq(IqProtocolEntity("w:test", _id=_id, _type="get", to="s.whatsapp.net"),
+                           lambda node, iq: self.results.append(node["id"]),
+                           lambda node, iq: self.errors.append((iq.getId(), node.getChild("error")["code"])))
+
+    def test_timeout(self):
+        self.stack.setProp(YowIqRegistry.PROP_IQ_TIMEOUT, 0.01)
+        self.sendIq("1")
+        self.assertEqual(len(self.sink.sent), 1)
+        deadline = time.monotonic() + 2
+        while not self.errors and time.monotonic() < deadline:
+            self.stack.scheduler.runReady()
+            time.sleep(0.005)
+        self.assertEqual(self.errors, [("1", YowIqRegistry.CODE_TIMEOUT)])
+        self.assertEqual(len(self.layer.iqRegistry), 0)
+        self.assertEqual(self.parallel.iqIndex, {})
+
+    def test_max_pending(self):
+        self.stack.setProp(YowIqRegistry.PROP_IQ_MAX_PENDING, 2)
+        for _id in ("1", "2", "3"):
+            self.sendIq(_id)
+        self.assertEqual([node["id"] for node in self.sink.sent], ["1", "2"])
+
+        self.parallel.receive(ProtocolTreeNode("iq", {"id": "1", "type": "result"}))
+        self.assertEqual(self.results, ["1"])
+        self.assertEqual([node["id"] for node in self.sink.sent], ["1", "2", "3"])
+        self.assertEqual(sorted(self.parallel.iqIndex.keys()), ["2", "3"])
+
+    def test_max_waiting(self):
+        self.stack.setProp(YowIqRegistry.PROP_IQ_MAX_PENDING, 1)
+        self.stack.setProp(YowIqRegistry.PROP_IQ_MAX_WAITING, 1)
+        for _id in ("1", "2", "3"):
+            self.sendIq(_id)
+        self.assertEqual([node["id"] for node in self.sink.sent], ["1"])
+        self.assertEqual(self.errors, [("3", YowIqRegistry.CODE_OVERLOADED)])
+        self.assertEqual(len(self.layer.iqRegistry.waiting), 1)
+
+        self.parallel.receive(ProtocolTreeNode("iq", {"id": "1", "type": "result"}))
+        self.assertEqual([node["id"] for node in self.sink.sent], ["1", "2"])
+
+    def test_disconnect(self):
+        self.stack.setProp(YowIqRegistry.PROP_IQ_MAX_PENDING, 1)
+        self.sendIq("1")
+        self.sendIq("2")
+        self.stack.emitEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECTED))
+        self.assertEqual(self.errors, [("1", YowIqRegistry.CODE_DISCONNECTED), ("2", YowIqRegistry.CODE_DISCONNECTED)])
+        self.assertEqual(len(self.layer.iqRegistry), 0)
+        self.assertEqual(self.parallel.iqIndex, {})
+        self.assertEqual(len(self.sink.sent), 1)
+        # timers were cancelled
+        expired = self.stack.scheduler.wheel.advance(time.monotonic() + 120)
+        self.assertTrue(all(handle.isCancelled() for handle in expired))
+
+
+if __name__ == "__main__":
+    unittest.main()
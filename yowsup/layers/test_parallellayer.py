@@ -0,0 +1,91 @@
+import unittest
+
+from yowsup.layers import YowParallelLayer, YowProtocolLayer, YowLayer
+from yowsup.structs import ProtocolTreeNode
+
+
+class TaggedLayer(YowProtocolLayer):
+    TAGS = ()
+
+    def __init__(self):
+        self.received = []
+        self.sent = []
+        super(TaggedLayer, self).__init__(dict((tag, (self.received.append, self.sent.append)) for tag in self.TAGS))
+
+
+class ALayer(TaggedLayer):
+    TAGS = ("a",)
+
+
+class IqLayer(TaggedLayer):
+    TAGS = ("iq",)
+
+
+class CatchAllLayer(YowLayer):
+    def __init__(self):
+        super(CatchAllLayer, self).__init__()
+        self.received = []
+        self.sent = []
+
+    def receive(self, data):
+        self.received.append(data)
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+class IqEntity(object):
+    tag = "iq"
+
+    def __init__(self, _id):
+        self._id = _id
+
+    def getId(self):
+        return self._id
+
+    def toProtocolTreeNode(self):
+        return ProtocolTreeNode("iq", {"id": self._id, "type": "get"})
+
+
+class YowParallelLayerTest(unittest.TestCase):
+    def setUp(self):
+        self.layer = YowParallelLayer((ALayer, IqLayer, CatchAllLayer))
+        self.a, self.iq, self.catchAll = self.layer.sublayers
+        self.lowerSink = []
+        self.layer.toLower = self.lowerSink.append
+
+    def test_receive_routed_by_tag(self):
+        node = ProtocolTreeNode("a")
+        self.layer.receive(node)
+        self.assertEqual(self.a.received, [node])
+        self.assertEqual(self.iq.received, [])
+        self.assertEqual(self.catchAll.received, [node])
+
+        other = ProtocolTreeNode("b")
+        self.layer.receive(other)
+        self.assertEqual(self.a.received, [node])
+        self.assertEqual(self.catchAll.received, [node, other])
+
+    def test_send_routed_by_tag(self):
+        entity = ProtocolTreeNode("a")
+        self.layer.send(entity)
+        self.assertEqual(self.a.sent, [entity])
+        self.assertEqual(self.iq.sent, [])
+        self.assertEqual(self.catchAll.sent, [entity])
+
+    def test_iq_result_to_sender(self):
+        results = []
+        self.a._sendIq(IqEntity("1"), lambda node, iq: results.append(node))
+        self.assertEqual(self.layer.iqIndex, {"1": self.a})
+
+        result = ProtocolTreeNode("iq", {"id": "1", "type": "result"})
+        self.layer.receive(result)
+        self.assertEqual(results, [result])
+        self.assertEqual(self.iq.received, [])
+        self.assertEqual(self.catchAll.received, [])
+        self.assertEqual(self.layer.iqIndex, {})
+
+        # not pending anymore, routed by tag again
+        self.layer.receive(result)
+        self.assertEqual(results, [result])
+        self.assertEqual(self.iq.received, [result])
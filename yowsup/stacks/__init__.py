@@ -17,6 +17,8 @@ from yowsup.layers.protocol_profiles import YowProfilesProtocolLayer
 from yowsup.layers.protocol_receipts import YowReceiptProtocolLayer
 from yowsup.layers.stanzaregulator import YowStanzaRegulator
 from .yowstack import YowStack, YowStackBuilder
+from .yowstackhost import YowStackHost
+from .yowstacksupervisor import YowStackSupervisor
 
 YOWSUP_CORE_LAYERS = (
     YowLoggerLayer,
@@ -0,0 +1,66 @@
+import random
+import time
+import unittest
+
+from yowsup.stacks.yowscheduler import YowTimerHandle, YowTimerWheel, YowScheduler
+
+
+class YowTimerWheelTest(unittest.TestCase):
+    def test_expire_in_order(self):
+        wheel = YowTimerWheel(tick=1, slotBits=2, levels=3, now=0)
+        # spans all levels and beyond the reach of the top one
+        deadlines = list(range(1, 100)) + [0.5, 63.2, 64, 250]
+        random.shuffle(deadlines)
+        for when in deadlines:
+            wheel.add(YowTimerHandle(when, None, ()))
+        self.assertEqual(len(wheel), len(deadlines))
+
+        expired = []
+        for now in range(0, 300):
+            for handle in wheel.advance(now):
+                self.assertEqual(handle.tick, now)
+                self.assertGreaterEqual(now, handle.when)
+                expired.append(handle.when)
+        self.assertEqual(sorted(expired), sorted(deadlines))
+        self.assertEqual(len(wheel), 0)
+
+    def test_jump(self):
+        wheel = YowTimerWheel(tick=0.01, now=1000)
+        wheel.add(YowTimerHandle(1000.5, None, ()))
+        wheel.add(YowTimerHandle(1090, None, ()))
+        self.assertEqual(len(wheel.advance(1001)), 1)
+        self.assertEqual(len(wheel.advance(1089.99)), 0)
+        self.assertEqual(len(wheel.advance(1090)), 1)
+        # empty wheel catches up without turning
+        wheel.advance(10 ** 9)
+        self.assertEqual(wheel.current, 10 ** 11)
+
+    def test_timeout(self):
+        wheel = YowTimerWheel(tick=1, slotBits=2, levels=3, now=0)
+        self.assertIsNone(wheel.getTimeout(0))
+        wheel.add(YowTimerHandle(2, None, ()))
+        self.assertEqual(wheel.getTimeout(0.5), 1.5)
+        wheel.advance(2)
+        wheel.add(YowTimerHandle(10, None, ()))
+        # on level 1, wake up when it cascades
+        self.assertEqual(wheel.getTimeout(2), 2)
+
+
+class YowSchedulerTest(unittest.TestCase):
+    def test_run(self):
+        scheduler = YowScheduler()
+        calls = []
+        scheduler.schedule(YowTimerHandle(0, calls.append, ("soon",)))
+        cancelled = YowTimerHandle(0, calls.append, ("cancelled",))
+        scheduler.schedule(cancelled)
+        cancelled.cancel()
+        scheduler.schedule(YowTimerHandle(time.monotonic() + 3600, calls.append, ("later",)))
+        self.assertEqual(scheduler.getTimeout(), 0)
+        scheduler.runReady()
+        self.assertEqual(calls, ["soon"])
+        self.assertFalse(scheduler.hasReady())
+        self.assertGreater(scheduler.getTimeout(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
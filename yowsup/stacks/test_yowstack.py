@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import socket
+import threading
+import time
+import unittest
+
+try:
+    import asyncore
+except ImportError:
+    asyncore = None
+
+from yowsup.layers import YowLayer
+from yowsup.layers.logger import YowLoggerLayer
+from yowsup.layers.logger.layer import logger as loggerLayerLogger
+from yowsup.stacks import YowStack
+
+
+class RecordingLayer(YowLayer):
+    def __init__(self):
+        super(RecordingLayer, self).__init__()
+        self.sent = []
+        self.received = []
+
+    def send(self, data):
+        self.sent.append(data)
+        self.toLower(data)
+
+    def receive(self, data):
+        self.received.append(data)
+        self.toUpper(data)
+
+
+class ThreadRecordingLayer(YowLayer):
+    def __init__(self):
+        super(ThreadRecordingLayer, self).__init__()
+        self.sent = []
+        self.threads = set()
+
+    def send(self, data):
+        self.sent.append(data)
+        self.threads.add(threading.get_ident())
+
+
+class CountingLayer(YowLayer):
+    transparent = False
+
+    def __init__(self):
+        super(CountingLayer, self).__init__()
+        self.calls = 0
+
+    def isTransparent(self, method):
+        return self.transparent
+
+    def send(self, data):
+        self.calls += 1
+        self.toLower(data)
+
+    def receive(self, data):
+        self.calls += 1
+        self.toUpper(data)
+
+
+class TransparentLayer(CountingLayer):
+    transparent = True
+
+
+class YowStackCompileTest(unittest.TestCase):
+    def setUp(self):
+        self.level = loggerLayerLogger.level
+        loggerLayerLogger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        loggerLayerLogger.setLevel(self.level)
+
+    def test_skip_transparent(self):
+        stack = YowStack((RecordingLayer, TransparentLayer, YowLayer, CountingLayer, TransparentLayer, RecordingLayer),
+                         reversed=False)
+        bottom, transparent, plain, counting, topTransparent, top = [stack.getLayer(i) for i in range(0, 6)]
+        self.assertTrue(plain.isTransparent("send") and plain.isTransparent("receive"))
+        self.assertFalse(top.isTransparent("send"))
+
+        stack.send("down")
+        stack.receive("up")
+        top.toLower("down")
+        self.assertEqual(bottom.sent, ["down", "down"])
+        self.assertEqual(top.received, ["up"])
+        self.assertEqual(bottom.received, ["up"])
+        self.assertEqual(counting.calls, 3)
+        self.assertEqual(transparent.calls + topTransparent.calls, 0)
+
+        plain.send = lambda data: bottom.sent.append("plain")
+        stack.compile()
+        top.toLower("down")
+        self.assertEqual(bottom.sent[-1], "plain")
+
+    def test_logger_at_debug(self):
+        stack = YowStack((RecordingLayer, YowLoggerLayer, RecordingLayer), reversed=False)
+        logger = stack.getLayer(1)
+        calls = []
+        logger.send = lambda data: calls.append(data) or YowLoggerLayer.send(logger, data)
+        stack.compile()
+        stack.send("down")
+        self.assertEqual(calls, [])
+
+        loggerLayerLogger.setLevel(logging.DEBUG)
+        stack.compile()
+        stack.send("down")
+        self.assertEqual(calls, ["down"])
+        self.assertEqual(stack.getLayer(0).sent, ["down", "down"])
+
+    def test_post_construct_layer(self):
+        stack = YowStack((RecordingLayer, YowLayer), reversed=False)
+        top = RecordingLayer()
+        stack.addPostConstructLayer(top)
+        stack.receive("up")
+        self.assertEqual(top.received, ["up"])
+        top.toLower("down")
+        self.assertEqual(stack.getLayer(0).sent, ["down"])
+
+
+class YowStackIngressTest(unittest.TestCase):
+    @staticmethod
+    def sendFromThreads(layer, threads=4, count=100):
+        def send(i):
+            for j in range(0, count):
+                layer.toLower((i, j))
+
+        senders = [threading.Thread(target=send, args=(i,)) for i in range(0, threads)]
+        for sender in senders:
+            sender.start()
+        return senders
+
+    def assertInOrder(self, sent, threads=4, count=100):
+        self.assertEqual(len(sent), threads * count)
+        for i in range(0, threads):
+            self.assertEqual([j for k, j in sent if k == i], list(range(0, count)))
+
+    def test_direct_when_not_looping(self):
+        stack = YowStack((ThreadRecordingLayer, YowLayer, RecordingLayer), reversed=False)
+        for sender in self.sendFromThreads(stack.getLayer(2)):
+            sender.join()
+        self.assertInOrder(stack.getLayer(0).sent)
+
+    def test_asyncio(self):
+        stack = YowStack((ThreadRecordingLayer, YowLayer, RecordingLayer), reversed=False)
+        bottom = stack.getLayer(0)
+
+        async def run():
+            stack.setEventLoop(asyncio.get_running_loop())
+            stack.setLoopThread(True)
+            senders = self.sendFromThreads(stack.getLayer(2))
+            while len(bottom.sent) < 400:
+                await asyncio.sleep(0.01)
+            for sender in senders:
+                sender.join()
+            stack.setLoopThread(False)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(asyncio.wait_for(run(), 5))
+        finally:
+            loop.close()
+        self.assertInOrder(bottom.sent)
+        self.assertEqual(bottom.threads, {threading.get_ident()})
+
+    @unittest.skipIf(asyncore is None, "asyncore is not available")
+    def test_asyncore(self):
+        stack = YowStack((ThreadRecordingLayer, YowLayer, RecordingLayer), reversed=False)
+        bottom = stack.getLayer(0)
+        channelMap = {}
+        reader, writer = socket.socketpair()
+        channel = asyncore.dispatcher(reader, channelMap)
+        channel.writable = lambda: False
+
+        def sendAndClose():
+            for sender in self.sendFromThreads(stack.getLayer(2)):
+                sender.join()
+            stack.execInLoop(channel.close)
+
+        closer = threading.Thread(target=sendAndClose)
+        stack.setLoopThread(True)
+        closer.start()
+        stack.asyncoreLoop(timeout=5, map=channelMap)
+        stack.setLoopThread(False)
+        closer.join()
+        writer.close()
+        self.assertInOrder(bottom.sent)
+        self.assertEqual(bottom.threads, {threading.get_ident()})
+
+
+class YowStackSchedulerTest(unittest.TestCase):
+    @unittest.skipIf(asyncore is None, "asyncore is not available")
+    def test_asyncore(self):
+        stack = YowStack((YowLayer,), reversed=False)
+        channelMap = {}
+        reader, writer = socket.socketpair()
+        channel = asyncore.dispatcher(reader, channelMap)
+        channel.writable = lambda: False
+        calls = []
+
+        def later():
+            calls.append(("later", time.monotonic() - startedAt))
+            stack.execDetached(lambda: calls.append(("detached", None)))
+            stack.callLater(0.05, channel.close)
+
+        startedAt = time.monotonic()
+        stack.callLater(0.1, later)
+        stack.callLater(0.05, calls.append, ("sooner", None)).cancel()
+        stack.callSoon(calls.append, ("soon", None))
+        stack.setLoopThread(True)
+        stack.asyncoreLoop(timeout=5, map=channelMap)
+        stack.setLoopThread(False)
+        writer.close()
+
+        self.assertEqual([name for name, _ in calls], ["soon", "later", "detached"])
+        self.assertGreaterEqual(calls[1][1], 0.1)
+        self.assertLess(time.monotonic() - startedAt, 2)
+
+    def test_asyncio(self):
+        stack = YowStack((YowLayer,), reversed=False)
+        calls = []
+
+        async def run():
+            stack.setEventLoop(asyncio.get_running_loop())
+            done = asyncio.get_running_loop().create_future()
+            # before the stack runs on the loop, from another thread
+            thread = threading.Thread(target=lambda: stack.callLater(0.05, done.get_loop().call_soon_threadsafe,
+                                                                     done.set_result, True))
+            thread.start()
+            thread.join()
+            stack.setLoopThread(True)
+            stack.callLater(0.01, calls.append, "later")
+            stack.callLater(0.01, calls.append, "cancelled").cancel()
+            stack.callSoon(calls.append, "soon")
+            await done
+            stack.setLoopThread(False)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(asyncio.wait_for(run(), 5))
+        finally:
+            loop.close()
+        self.assertEqual(calls, ["soon", "later"])
+
+
+if __name__ == "__main__":
+    unittest.main()
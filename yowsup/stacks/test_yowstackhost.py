@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+
+from yowsup.layers import YowLayer, YowLayerEvent, EventCallback
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.stanzaregulator import YowStanzaRegulator
+from yowsup.stacks import YowStack, YowStackHost
+
+
+class PingLayer(YowLayer):
+    def __init__(self):
+        super(PingLayer, self).__init__()
+        self.received = bytearray()
+        self.connects = 0
+
+    @EventCallback(YowNetworkLayer.EVENT_STATE_CONNECTED)
+    def onConnected(self, event):
+        self.connects += 1
+        self.received = bytearray()
+        self.toLower(bytearray(b"ping"))
+
+    def receive(self, data):
+        self.received.extend(data)
+        if self.received == b"ping":
+            self.getProp("onPong")(self)
+
+
+class YowStackHostTest(unittest.TestCase):
+    @staticmethod
+    async def echo(reader, writer):
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                break
+            writer.write(data)
+        writer.close()
+
+    @staticmethod
+    def buildStack(credentials):
+        return YowStack((YowNetworkLayer, PingLayer), reversed=False)
+
+    def runHost(self, host, onPong, accounts=("a", "b", "c")):
+        async def run():
+            server = await asyncio.start_server(self.echo, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            for username in accounts:
+                stack = host.addAccount((username, "password"))
+                stack.setProp(YowNetworkLayer.PROP_ENDPOINT, ("127.0.0.1", port))
+                stack.setProp("onPong", onPong)
+            await asyncio.wait_for(host.run(), 5)
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(run())
+
+    def test_accounts_isolated(self):
+        host = YowStackHost(stackFactory=self.buildStack)
+        ponged = set()
+
+        def onPong(layer):
+            ponged.add(layer.getStack())
+            if len(ponged) == 3:
+                host.stop()
+
+        self.runHost(host, onPong)
+        self.assertEqual(len(ponged), 3)
+        self.assertEqual(host.getAccounts(), [])
+        for stack in ponged:
+            self.assertEqual(stack.getProp(YowStanzaRegulator.PROP_FRAMES_PER_TICK), 32)
+            self.assertEqual(stack.getLayer(0).state, YowNetworkLayer.STATE_DISCONNECTED)
+        stacks = list(ponged)
+        stacks[0].setProp("isolated", True)
+        self.assertIsNone(stacks[1].getProp("isolated"))
+
+    def test_add_remove_while_running(self):
+        host = YowStackHost(stackFactory=self.buildStack)
+
+        def onPong(layer):
+            stack = layer.getStack()
+            if stack is host.getStack("a"):
+                host.removeAccount("a")
+                late = host.addAccount(("late", "password"))
+                late.setProp(YowNetworkLayer.PROP_ENDPOINT, stack.getProp(YowNetworkLayer.PROP_ENDPOINT))
+                late.setProp("onPong", onPong)
+            elif stack is host.getStack("late"):
+                host.stop()
+
+        self.runHost(host, onPong, accounts=("a",))
+        self.assertEqual(host.getAccounts(), [])
+
+    def test_reconnect(self):
+        host = YowStackHost(stackFactory=self.buildStack, reconnectDelay=0)
+
+        def onPong(layer):
+            if layer.connects < 3:
+                layer.broadcastEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECT))
+            else:
+                host.stop()
+
+        self.runHost(host, onPong, accounts=("a",))
+
+    def test_stop_while_backing_off(self):
+        host = YowStackHost(stackFactory=self.buildStack, reconnectDelay=300)
+
+        def onPong(layer):
+            layer.broadcastEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECT))
+            asyncio.get_running_loop().call_later(0.1, host.stop)
+
+        # would time out if stop() waited for the reconnect delay
+        self.runHost(host, onPong, accounts=("a",))
+        self.assertEqual(host.getAccounts(), [])
+
+    def test_duplicate_account(self):
+        host = YowStackHost(stackFactory=self.buildStack)
+        host.addAccount(("a", "password"))
+        self.assertRaises(ValueError, host.addAccount, ("a", "password"))
@@ -0,0 +1,135 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import unittest
+
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.stacks import YowStack, YowStackSupervisor
+from yowsup.stacks.yowstacksupervisor import YowStackEventSender, YowStackRelayLayer
+
+
+def buildEchoStack(credentials):
+    stack = YowStack((YowNetworkLayer,), reversed=False)
+    stack.setProp(YowNetworkLayer.PROP_ENDPOINT, ("127.0.0.1", int(credentials[1])))
+    return stack
+
+
+class EchoServer(threading.Thread):
+    def __init__(self):
+        super(EchoServer, self).__init__()
+        self.daemon = True
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.port = None
+
+    @staticmethod
+    async def echo(reader, writer):
+        while True:
+            data = await reader.read(1024)
+            if not data:
+                break
+            writer.write(data)
+        writer.close()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(asyncio.start_server(self.echo, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class YowStackSupervisorTest(unittest.TestCase):
+    def setUp(self):
+        self.server = EchoServer()
+        self.server.start()
+        self.server.ready.wait(5)
+        self.supervisor = YowStackSupervisor(buildEchoStack, workers=2, reconnectDelay=0)
+
+    def tearDown(self):
+        self.supervisor.stop()
+        self.server.stop()
+
+    def waitConnected(self, usernames):
+        pending = set(usernames)
+
+        def onEvent(kind, username, payload):
+            if kind == YowStackSupervisor.MSG_EVENT and payload[0] == YowNetworkLayer.EVENT_STATE_CONNECTED:
+                pending.discard(username)
+            return not pending
+
+        self.assertTrue(self.supervisor.loop(onEvent, checkInterval=0.1, timeout=10))
+
+    def echo(self, username, data):
+        self.supervisor.send(username, data)
+        self.assertTrue(self.supervisor.loop(
+            lambda kind, user, payload: kind == YowStackSupervisor.MSG_RECEIVE and user == username
+            and payload == data, checkInterval=0.1, timeout=10))
+
+    def test_pick_worker_stable(self):
+        usernames = ["49%09d" % i for i in range(0, 1000)]
+        before = dict((username, self.supervisor.pickWorker(username)) for username in usernames)
+        self.assertEqual(set(before.values()), {0, 1})
+        after = dict((username, self.supervisor.pickWorker(username, (0, 1, 2))) for username in usernames)
+        for username in usernames:
+            # accounts only ever move onto the new worker
+            self.assertIn(after[username], (before[username], 2))
+
+    def test_send_receive(self):
+        port = str(self.server.port)
+        usernames = ["a", "b", "c", "d"]
+        self.supervisor.start()
+        for username in usernames:
+            self.supervisor.addAccount((username, port))
+        self.waitConnected(usernames)
+        for username in usernames:
+            self.echo(username, b"hello " + username.encode())
+
+    def test_restart_crashed_worker(self):
+        port = str(self.server.port)
+        self.supervisor.start()
+        self.supervisor.addAccount(("a", port))
+        self.waitConnected(["a"])
+        worker = self.supervisor.getWorker("a")
+        os.kill(worker.process.pid, 9)
+        worker.process.join()
+        self.waitConnected(["a"])
+        self.assertEqual(worker.restarts, 1)
+        self.echo("a", b"back")
+
+    def test_rebalance(self):
+        port = str(self.server.port)
+        usernames = ["49%09d" % i for i in range(0, 12)]
+        self.supervisor.start()
+        for username in usernames:
+            self.supervisor.addAccount((username, port))
+        self.waitConnected(usernames)
+
+        workerId = self.supervisor.addWorker()
+        moved = [u for u in usernames if self.supervisor.getWorker(u).workerId == workerId]
+        self.assertTrue(moved)
+        self.waitConnected(moved)
+        self.echo(moved[0], b"moved")
+
+        self.supervisor.removeWorker(workerId)
+        self.waitConnected(moved)
+        self.echo(moved[0], b"moved back")
+
+
+class YowStackRelayLayerTest(unittest.TestCase):
+    def test_unpicklable(self):
+        reader, writer = multiprocessing.Pipe(duplex=False)
+        sender = YowStackEventSender(writer)
+        relay = YowStackRelayLayer("a", sender)
+        # dropped, instead of raising on the worker's loop
+        relay.receive(lambda: None)
+        relay.receive(b"data")
+        sender.close()
+        self.assertEqual(reader.recv(), (YowStackSupervisor.MSG_RECEIVE, "a", b"data"))
+        self.assertFalse(reader.poll())
+        reader.close()
+        writer.close()
@@ -0,0 +1,152 @@
+# -*- coding utf-8 -*-
+
+import collections
+import math
+import time
+
+
+class YowTimerHandle(object):
+    """
+    Returned by YowStack.callSoon/callLater, cancel() it to keep the callback from running
+    """
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        # tick the timer expires at, once filed in a YowTimerWheel
+        self.tick = None
+        # asyncio.TimerHandle when scheduled on an asyncio loop
+        self.loopHandle = None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.loopHandle is not None:
+            self.loopHandle.cancel()
+
+    def isCancelled(self):
+        return self.cancelled
+
+    def run(self):
+        if not self.cancelled:
+            self.callback(*self.args)
+
+
+class YowTimerWheel(object):
+    """
+    Hierarchical timer wheel. Level 0 has a slot per tick, each slot of a higher level spans a whole turn of
+    the level below. Timers are filed at the lowest level reaching their deadline and cascade down as the wheel
+    turns, adding a timer and expiring one cost the same whatever the number of timers.
+    """
+
+    def __init__(self, tick=0.01, slotBits=6, levels=4, now=None):
+        """
+        :param tick: resolution in seconds, timers expire on the first tick at or after their deadline
+        :param slotBits: log2 of the number of slots per level
+        :param levels: timers further away than the top level reaches are parked at its far end
+        """
+        self.tick = tick
+        self.slotBits = slotBits
+        self.slotMask = (1 << slotBits) - 1
+        self.levels = [[[] for _ in range(0, 1 << slotBits)] for _ in range(0, levels)]
+        self.reach = 1 << (slotBits * levels)
+        self.current = int((time.monotonic() if now is None else now) / tick)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, handle):
+        handle.tick = max(int(math.ceil(handle.when / self.tick)), self.current + 1)
+        self.file(handle)
+        self.count += 1
+
+    def file(self, handle):
+        delta = min(handle.tick - self.current, self.reach - 1)
+        level = 0
+        while delta >> (self.slotBits * (level + 1)):
+            level += 1
+        tick = self.current + delta
+        self.levels[level][(tick >> (self.slotBits * level)) & self.slotMask].append(handle)
+
+    def advance(self, now):
+        """
+        Turns the wheel up to now
+        :return: timers that expired, in order
+        """
+        target = int(now / self.tick)
+        expired = []
+        while self.current < target:
+            if not self.count:
+                self.current = target
+                break
+            self.current += 1
+            tick = self.current
+            for level in range(1, len(self.levels)):
+                if tick & ((1 << (self.slotBits * level)) - 1):
+                    break
+                # the level below completed a turn, bring down the timers of this level's next slot
+                slots = self.levels[level]
+                index = (tick >> (self.slotBits * level)) & self.slotMask
+                handles, slots[index] = slots[index], []
+                for handle in handles:
+                    self.file(handle)
+
+            slots = self.levels[0]
+            index = tick & self.slotMask
+            if slots[index]:
+                handles, slots[index] = slots[index], []
+                self.count -= len(handles)
+                expired.extend(handles)
+        return expired
+
+    def getTimeout(self, now):
+        """
+        :return: seconds until the wheel next has to turn, None if it holds no timers
+        """
+        if not self.count:
+            return None
+        slots = self.levels[0]
+        for tick in range(self.current + 1, self.current + len(slots) + 1):
+            if slots[tick & self.slotMask]:
+                break
+        else:
+            # nothing on level 0, wake up when the next slot of level 1 comes down
+            tick = (self.current | self.slotMask) + 1
+        return max(tick * self.tick - now, 0)
+
+
+class YowScheduler(object):
+    """
+    Runs callbacks soon or later on the thread looping the stack, when it runs on asyncore.
+    Not thread safe, YowStack hands it calls made from other threads through its ingress queue.
+    """
+
+    def __init__(self, tick=0.01):
+        self.ready = collections.deque()
+        self.wheel = YowTimerWheel(tick)
+
+    def schedule(self, handle):
+        if handle.when <= time.monotonic():
+            self.ready.append(handle)
+        else:
+            self.wheel.add(handle)
+
+    def hasReady(self):
+        return len(self.ready) > 0
+
+    def getTimeout(self):
+        """
+        :return: seconds the loop may wait for before runReady has something to do, None for as long as it likes
+        """
+        return 0 if self.ready else self.wheel.getTimeout(time.monotonic())
+
+    def runReady(self):
+        """
+        Runs the callbacks that are due. Callbacks they schedule to run soon run on the next call.
+        """
+        if self.wheel:
+            self.ready.extend(self.wheel.advance(time.monotonic()))
+        for _ in range(0, len(self.ready)):
+            self.ready.popleft().run()
@@ -1,14 +1,22 @@
 # -*- coding utf-8 -*-
 
-import asyncore
+import asyncio
+import collections
 import inspect
 import logging
 import random
+import socket
+import threading
 import time
 
+try:
+    import asyncore
+except ImportError:  # removed in python 3.12, stacks can only run on asyncio there
+    asyncore = None
+
 from yowsup.common.constants import YowConstants
 from yowsup.env import YowsupEnv
-from yowsup.layers import YowLayer
+from yowsup.layers import YowLayer, YowLayerEvent
 from yowsup.layers import YowParallelLayer
 from yowsup.layers.auth import YowCryptLayer, YowAuthenticationProtocolLayer
 from yowsup.layers.coder import YowCoderLayer
@@ -28,11 +36,8 @@ from yowsup.layers.protocol_privacy import YowPrivacyProtocolLayer
 from yowsup.layers.protocol_profiles import YowProfilesProtocolLayer
 from yowsup.layers.protocol_receipts import YowReceiptProtocolLayer
 from yowsup.layers.stanzaregulator import YowStanzaRegulator
+from .yowscheduler import YowScheduler, YowTimerHandle
 
-try:
-    import Queue
-except ImportError:
-    import queue as Queue
 logger = logging.getLogger(__name__)
 
 YOWSUP_PROTOCOL_LAYERS_BASIC = (
@@ -125,16 +130,54 @@ class YowStackBuilder(object):
         return layers
 
 
-class YowStack(object):
-    __stack = []
-    __stackInstances = []
-    __detachedQueue = Queue.Queue()
+class YowStackWaker(asyncore.dispatcher if asyncore else object):
+    """
+    Wakes an asyncore loop up from other threads, to drain the stack's ingress queue
+    """
+
+    def __init__(self, stack, map=None):
+        self.stack = stack
+        reader, self.writer = socket.socketpair()
+        self.writer.setblocking(False)
+        asyncore.dispatcher.__init__(self, reader, map)
+
+    def wake(self):
+        try:
+            self.writer.send(b"\0")
+        except BlockingIOError:
+            # plenty of wake ups pending already
+            pass
 
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        self.recv(4096)
+        self.stack.drainIngress()
+
+    def close(self):
+        asyncore.dispatcher.close(self)
+        self.writer.close()
+
+
+class YowStack(object):
     def __init__(self, stackClassesArr=None, reversed=True, props=None):
         stackClassesArr = stackClassesArr or ()
         self.__stack = stackClassesArr[::-1] if reversed else stackClassesArr
         self.__stackInstances = []
-        self._props = props or {}
+        # entry points of the compiled pipeline, see compile()
+        self.__send = None
+        self.__receive = None
+        # copied so stacks built from the same builder don't share their props
+        self._props = dict(props) if props else {}
+        # runs callbacks when looping on asyncore, on asyncio the loop does
+        self.scheduler = YowScheduler()
+        self._eventLoop = None
+        # calls made from other threads than the one running the loop, executed by it in order
+        self.__ingress = collections.deque()
+        self.__ingressScheduled = False
+        self.__loopThread = None
+        self.__waker = None
 
         self.setProp(YowNetworkLayer.PROP_ENDPOINT,
                      YowConstants.ENDPOINTS[random.randint(0, len(YowConstants.ENDPOINTS) - 1)])
@@ -152,10 +195,12 @@ class YowStack(object):
                     return res
 
     def send(self, data):
-        self.__stackInstances[-1].send(data)
+        if self.__send:
+            self.__send(data)
 
     def receive(self, data):
-        self.__stackInstances[0].receive(data)
+        if self.__receive:
+            self.__receive(data)
 
     def setCredentials(self, credentials):
         self.getLayerInterface(YowAuthenticationProtocolLayer).setCredentials(*credentials)
@@ -164,9 +209,12 @@ class YowStack(object):
         self.__stack.push(layerClass)
 
     def addPostConstructLayer(self, layer):
-        self.__stackInstances[-1].setLayers(layer, self.__stackInstances[-2])
+        lowerLayer = self.__stackInstances[-2] if len(self.__stackInstances) > 1 else None
+        self.__stackInstances[-1].setLayers(layer, lowerLayer)
+        layer.setStack(self)
         layer.setLayers(None, self.__stackInstances[-1])
         self.__stackInstances.append(layer)
+        self.compile()
 
     def setProp(self, key, value):
         self._props[key] = value
@@ -183,22 +231,157 @@ class YowStack(object):
             self.__stackInstances[-1].broadcastEvent(yowLayerEvent)
 
     def execDetached(self, fn):
-        self.__class__.__detachedQueue.put(fn)
+        self.callSoon(fn)
 
-    def loop(self, *args, **kwargs):
-        if "discrete" in kwargs:
-            discreteVal = kwargs["discrete"]
-            del kwargs["discrete"]
-            while True:
-                asyncore.loop(*args, **kwargs)
-                time.sleep(discreteVal)
-                try:
-                    callback = self.__class__.__detachedQueue.get(False)  # doesn't block
-                    callback()
-                except Queue.Empty:
-                    pass
+    def callSoon(self, fn, *args):
+        """
+        Runs fn on the loop thread once the current callback returned, callable from any thread
+        :return: YowTimerHandle
+        """
+        return self.callLater(0, fn, *args)
+
+    def callLater(self, delay, fn, *args):
+        """
+        Runs fn on the loop thread after delay seconds, callable from any thread
+        :return: YowTimerHandle
+        """
+        handle = YowTimerHandle(time.monotonic() + delay, fn, args)
+        self.execInLoop(self.schedule, handle)
+        return handle
+
+    def schedule(self, handle):
+        if handle.cancelled:
+            return
+        if self._eventLoop is None:
+            self.scheduler.schedule(handle)
+        elif self.__loopThread is None:
+            # not called from the asyncio loop's thread for sure, hand it over
+            self._eventLoop.call_soon_threadsafe(self.scheduleOnEventLoop, handle)
         else:
-            asyncore.loop(*args, **kwargs)
+            self.scheduleOnEventLoop(handle)
+
+    def scheduleOnEventLoop(self, handle):
+        delay = handle.when - time.monotonic()
+        if delay > 0:
+            handle.loopHandle = self._eventLoop.call_later(delay, handle.run)
+        else:
+            handle.loopHandle = self._eventLoop.call_soon(handle.run)
+
+    def isLoopThread(self):
+        """
+        :return: True when called from the thread running this stack's loop, or the stack isn't looping
+        """
+        return self.__loopThread is None or self.__loopThread == threading.get_ident()
+
+    def execInLoop(self, fn, *args):
+        """
+        Calls fn right away when on the loop thread, otherwise queues it for the loop thread to call.
+        Queued calls run in the order they were made, so layers never run concurrently and need no locking.
+        """
+        if self.isLoopThread():
+            fn(*args)
+            return
+
+        self.__ingress.append((fn, args))
+        if not self.__ingressScheduled:
+            self.__ingressScheduled = True
+            if self._eventLoop is not None:
+                self._eventLoop.call_soon_threadsafe(self.drainIngress)
+            elif self.__waker is not None:
+                self.__waker.wake()
+
+    def drainIngress(self):
+        # reset before draining, calls queued meanwhile either get drained here or schedule another drain
+        self.__ingressScheduled = False
+        ingress = self.__ingress
+        while ingress:
+            fn, args = ingress.popleft()
+            fn(*args)
+
+    def setLoopThread(self, running):
+        """
+        Marks the calling thread as the one running the loop, or no thread once the loop stopped.
+        Calls queued meanwhile are made now.
+        """
+        self.__loopThread = threading.get_ident() if running else None
+        if not running:
+            self.drainIngress()
+
+    def setEventLoop(self, loop):
+        """
+        Runs this stack on the given asyncio loop instead of asyncore. Must be set before connecting,
+        run_async() sets it to the running loop.
+        """
+        self._eventLoop = loop
+
+    def getEventLoop(self):
+        return self._eventLoop
+
+    async def run_async(self):
+        """
+        Connects if not yet connected and serves this stack on the running asyncio loop until its
+        connection is closed without being re-established. Any number of stacks may run side by side:
+
+            await asyncio.gather(stackA.run_async(), stackB.run_async())
+        """
+        loop = asyncio.get_running_loop()
+        if self._eventLoop is None:
+            self._eventLoop = loop
+        elif self._eventLoop is not loop:
+            raise ValueError("Stack is bound to another event loop")
+
+        self.setLoopThread(True)
+        try:
+            networkLayer = self.getLayer(0)
+            if networkLayer.state == YowNetworkLayer.STATE_DISCONNECTED:
+                self.broadcastEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_CONNECT))
+
+            while networkLayer.state != YowNetworkLayer.STATE_DISCONNECTED:
+                await networkLayer.waitClosed()
+                # let the detached disconnected event run, upper layers might reconnect from there
+                await asyncio.sleep(0)
+        finally:
+            self.setLoopThread(False)
+
+    def loop(self, *args, **kwargs):
+        """
+        Serves the stack on asyncore, or on asyncio with asyncio=True. Returns once the connection is closed
+        and no callbacks are due, unless discrete is given: then keeps looping for the stack to reconnect.
+        discrete used to be the seconds slept between polls, callbacks now run as soon as they are due.
+        """
+        if kwargs.pop("asyncio", False) or asyncore is None:
+            asyncio.run(self.run_async())
+            return
+
+        forever = kwargs.pop("discrete", None) is not None
+        self.setLoopThread(True)
+        try:
+            self.asyncoreLoop(*args, forever=forever, **kwargs)
+        finally:
+            self.setLoopThread(False)
+
+    def asyncoreLoop(self, timeout=30.0, use_poll=False, map=None, count=None, forever=False):
+        """
+        asyncore.loop that also runs the stack's scheduled callbacks, and is woken up by calls queued from
+        other threads
+        :param forever: don't return once there are no channels left
+        """
+        map = asyncore.socket_map if map is None else map
+        self.__waker = YowStackWaker(self, map)
+        # calls queued while there was no waker
+        self.drainIngress()
+        try:
+            while count is None or count > 0:
+                self.scheduler.runReady()
+                # as asyncore.loop, runs while there are channels besides the waker
+                if len(map) <= 1 and not forever and not self.scheduler.hasReady():
+                    break
+                wait = self.scheduler.getTimeout()
+                asyncore.loop(timeout if wait is None else min(wait, timeout), use_poll, map, 1)
+                count = count - 1 if count is not None else None
+        finally:
+            self.__waker.close()
+            self.__waker = None
 
     def _construct(self):
         logger.debug("Initializing stack")
@@ -226,6 +409,30 @@ class YowStack(object):
             upperLayer = self.__stackInstances[i + 1] if (i + 1) < len(self.__stackInstances) else None
             lowerLayer = self.__stackInstances[i - 1] if i > 0 else None
             self.__stackInstances[i].setLayers(upperLayer, lowerLayer)
+        self.compile()
+
+    def compile(self):
+        """
+        Wires each layer's toUpper/toLower straight to the receive/send of the nearest layer above/below that
+        isn't transparent in that direction, so data skips layers that would only pass it on
+        (see YowLayer.isTransparent). Done when the stack is built, do it again after changing what decides
+        a layer's transparency, e.g. the logging level for YowLoggerLayer.
+        """
+        layers = self.__stackInstances
+        upperReceives = [None] * len(layers)
+        target = None
+        for i in range(len(layers) - 1, -1, -1):
+            upperReceives[i] = target
+            if not layers[i].isTransparent("receive"):
+                target = layers[i].receive
+        self.__receive = target
+
+        target = None
+        for i, layer in enumerate(layers):
+            layer.setTargets(upperReceives[i], target)
+            if not layer.isTransparent("send"):
+                target = layer.send
+        self.__send = target
 
     def getLayer(self, layerIndex):
         return self.__stackInstances[layerIndex]
@@ -0,0 +1,153 @@
+# -*- coding utf-8 -*-
+
+import asyncio
+import logging
+import time
+
+from yowsup.layers import YowLayerEvent
+from yowsup.layers.network import YowNetworkLayer
+from yowsup.layers.stanzaregulator import YowStanzaRegulator
+from .yowstack import YowStackBuilder
+
+logger = logging.getLogger(__name__)
+
+
+class YowStackHostAccount(object):
+    def __init__(self, username, stack):
+        self.username = username
+        self.stack = stack
+        self.active = True
+        self.task = None
+        # set once the account is removed, wakes up the supervisor while it waits to reconnect
+        self.removed = None
+        self.connects = 0
+
+    def __str__(self):
+        return "Account %s" % self.username
+
+
+class YowStackHost(object):
+    """
+    Runs many YowStacks, one per account, on a single asyncio event loop.
+
+    Every stack keeps its own props and detached queue. Stacks take turns on the loop: each hands at most
+    framesPerTick stanzas upwards before yielding to the others. A stack whose connection closes is
+    reconnected with exponential backoff until its account is removed.
+
+        host = YowStackHost(stackFactory=lambda credentials: YowStackBuilder.getDefaultStack(MyLayer))
+        host.addAccount(("491234567890", "password"))
+        asyncio.run(host.run())
+    """
+
+    def __init__(self, stackFactory=None, framesPerTick=32, reconnect=True,
+                 reconnectDelay=1, reconnectDelayMax=300):
+        """
+        :param stackFactory: callable(credentials) -> YowStack with credentials set, default stack if omitted
+        :param framesPerTick: max stanzas a stack processes before yielding to the others, None for no limit
+        :param reconnect: reconnect stacks whose connection was closed
+        """
+        self.stackFactory = stackFactory or self.__class__.buildDefaultStack
+        self.loop = None
+        self.framesPerTick = framesPerTick
+        self.reconnect = reconnect
+        self.reconnectDelay = reconnectDelay
+        self.reconnectDelayMax = reconnectDelayMax
+        self.accounts = {}
+        self.stopped = None
+
+    @staticmethod
+    def buildDefaultStack(credentials):
+        stack = YowStackBuilder().pushDefaultLayers(True).build()
+        stack.setCredentials(credentials)
+        return stack
+
+    def isRunning(self):
+        return self.stopped is not None and not self.stopped.done()
+
+    def addAccount(self, credentials, stack=None):
+        """
+        Builds a stack for the account unless one is given, and starts it once the host runs.
+        :param credentials: (username, password)
+        :param stack: YowStack with its credentials already set
+        :return: YowStack
+        """
+        username = credentials[0]
+        if username in self.accounts:
+            raise ValueError("Account %s is already hosted" % username)
+
+        stack = stack or self.stackFactory(credentials)
+        if self.framesPerTick is not None:
+            stack.setProp(YowStanzaRegulator.PROP_FRAMES_PER_TICK, self.framesPerTick)
+
+        account = YowStackHostAccount(username, stack)
+        self.accounts[username] = account
+        logger.debug("Added %s" % account)
+        if self.isRunning():
+            self.startAccount(account)
+        return stack
+
+    def startAccount(self, account):
+        account.stack.setEventLoop(self.loop)
+        account.removed = asyncio.Event()
+        account.task = self.loop.create_task(self.supervise(account))
+
+    def removeAccount(self, username):
+        """
+        Disconnects the account's stack and stops supervising it.
+        :return: the supervising task, completes once the stack is torn down
+        """
+        account = self.accounts.pop(username)
+        account.active = False
+        if account.removed is not None:
+            account.removed.set()
+        if account.task is not None:
+            account.stack.broadcastEvent(YowLayerEvent(YowNetworkLayer.EVENT_STATE_DISCONNECT,
+                                                       reason="Account removed"))
+        logger.debug("Removed %s" % account)
+        return account.task
+
+    def getStack(self, username):
+        return self.accounts[username].stack if username in self.accounts else None
+
+    def getAccounts(self):
+        return list(self.accounts.keys())
+
+    async def supervise(self, account):
+        delay = self.reconnectDelay
+        while account.active:
+            startedAt = time.time()
+            account.connects += 1
+            try:
+                await account.stack.run_async()
+            except Exception:
+                logger.exception("%s crashed" % account)
+
+            if not account.active or not self.reconnect:
+                break
+
+            if time.time() - startedAt > self.reconnectDelayMax:
+                # the connection was up for a while, start over with a short delay
+                delay = self.reconnectDelay
+            logger.debug("%s disconnected, reconnecting in %ss" % (account, delay))
+            try:
+                await asyncio.wait_for(account.removed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.reconnectDelayMax)
+
+    async def run(self):
+        """
+        Serves all accounts until stop() is called
+        """
+        self.loop = asyncio.get_running_loop()
+        self.stopped = self.loop.create_future()
+        for account in self.accounts.values():
+            self.startAccount(account)
+        await self.stopped
+
+        tasks = [self.removeAccount(username) for username in self.getAccounts()]
+        await asyncio.gather(*[task for task in tasks if task is not None])
+
+    def stop(self):
+        if self.stopped is not None and not self.stopped.done():
+            self.stopped.set_result(True)
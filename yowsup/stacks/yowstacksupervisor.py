@@ -0,0 +1,379 @@
+# -*- coding utf-8 -*-
+
+import asyncio
+import collections
+import hashlib
+import logging
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.reduction
+import pickle
+import queue
+import threading
+import time
+
+from yowsup.layers import YowLayer, YowLayerEvent
+from .yowstackhost import YowStackHost
+
+logger = logging.getLogger(__name__)
+
+
+class YowStackEventSender(object):
+    """
+    Writes a worker's messages to the supervisor from a thread of its own, so that the worker's loop does not
+    block on the pipe while the supervisor is slow to read it. Messages are pickled by send, in the caller's
+    thread, so that those that can't be are reported to it.
+    """
+
+    def __init__(self, events, maxQueued=65536):
+        """
+        :param events: write end of the worker's events pipe
+        :param maxQueued: max messages waiting to be written, send blocks beyond that
+        """
+        self.events = events
+        self.queue = queue.Queue(maxQueued)
+        self.thread = threading.Thread(target=self.run, name="yowsup-events")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def send(self, message):
+        data = multiprocessing.reduction.ForkingPickler.dumps(message)
+        try:
+            self.queue.put_nowait(data)
+        except queue.Full:
+            logger.warning("Supervisor is not keeping up with events, waiting for it")
+            self.queue.put(data)
+
+    def run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            try:
+                self.events.send_bytes(data)
+            except (OSError, ValueError) as e:
+                logger.error("Could not report to the supervisor: %s" % e)
+                break
+
+    def close(self):
+        """
+        Writes out what is queued still
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+
+class YowStackRelayLayer(YowLayer):
+    """
+    Put on top of every stack a worker hosts, forwards what reaches the top of the stack to the supervisor.
+    """
+
+    def __init__(self, username, events):
+        """
+        :param events: YowStackEventSender
+        """
+        super(YowStackRelayLayer, self).__init__()
+        self.username = username
+        self.events = events
+
+    def receive(self, data):
+        try:
+            self.events.send((YowStackSupervisor.MSG_RECEIVE, self.username, data))
+        except Exception as e:
+            # the stack must keep running
+            logger.warning("Dropping %s received for %s, can't pickle it: %s" % (data.__class__.__name__,
+                                                                               self.username, e))
+
+    def onEvent(self, yowLayerEvent):
+        args = {}
+        for key, value in yowLayerEvent.args.items():
+            try:
+                pickle.dumps(value)
+                args[key] = value
+            except Exception:
+                args[key] = str(value)
+        self.events.send((YowStackSupervisor.MSG_EVENT, self.username, (yowLayerEvent.getName(), args)))
+        return False
+
+    def __str__(self):
+        return "Relay Layer"
+
+
+class YowStackWorker(object):
+    """
+    Supervisor side handle of a worker process
+    """
+
+    def __init__(self, workerId):
+        self.workerId = workerId
+        self.process = None
+        self.commands = None
+        self.events = None
+        self.usernames = set()
+        self.restarts = 0
+
+    def isAlive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def __str__(self):
+        return "Worker %s" % self.workerId
+
+
+def serveWorker(workerId, commands, events, stackFactory, hostOptions):
+    """
+    Entry point of a worker process: runs a YowStackHost and executes the supervisor's commands on it.
+    :param events: write end of a pipe only this worker writes to, so a crashed worker can't
+    leave it locked for the others
+    """
+
+    sender = YowStackEventSender(events)
+
+    def buildStack(credentials):
+        stack = stackFactory(credentials)
+        stack.addPostConstructLayer(YowStackRelayLayer(credentials[0], sender))
+        return stack
+
+    host = YowStackHost(stackFactory=buildStack, **hostOptions)
+
+    def execute(command, username=None, payload=None):
+        if command == YowStackSupervisor.CMD_ADD:
+            if username not in host.accounts:
+                host.addAccount(payload)
+        elif command == YowStackSupervisor.CMD_REMOVE:
+            if username in host.accounts:
+                host.removeAccount(username)
+        elif command == YowStackSupervisor.CMD_SEND:
+            stack = host.getStack(username)
+            if stack is None:
+                logger.warning("Dropping data for %s, not hosted on worker %s" % (username, workerId))
+            else:
+                stack.send(payload)
+        elif command == YowStackSupervisor.CMD_BROADCAST:
+            stack = host.getStack(username)
+            if stack is not None:
+                name, args = payload
+                stack.broadcastEvent(YowLayerEvent(name, **args))
+
+    async def readCommands():
+        loop = asyncio.get_running_loop()
+        while True:
+            command = await loop.run_in_executor(None, commands.get)
+            if command[0] == YowStackSupervisor.CMD_STOP:
+                host.stop()
+                break
+            try:
+                execute(*command)
+            except Exception:
+                logger.exception("Worker %s failed to execute %s" % (workerId, command[0]))
+
+    async def serve():
+        await asyncio.gather(host.run(), readCommands())
+
+    sender.send((YowStackSupervisor.MSG_WORKER_STARTED, None, workerId))
+    try:
+        asyncio.run(serve())
+    finally:
+        sender.close()
+
+
+class YowStackSupervisor(object):
+    """
+    Shards accounts over worker processes, each running its own YowStackHost, so that the CPU bound parts
+    of the stacks (crypt, coder, axolotl) make use of all cores.
+
+    Accounts are placed with rendezvous hashing: adding or removing a worker only moves the accounts that
+    hash onto it. Crashed workers are restarted with their accounts. Whatever reaches the top of any
+    account's stack is reported to the supervisor, in one place:
+
+        supervisor = YowStackSupervisor(buildStack, workers=32)
+        supervisor.start()
+        supervisor.addAccount(("491234567890", "password"))
+        supervisor.send("491234567890", TextMessageProtocolEntity(text="hi", destination="31612345678@s.whatsapp.net"))
+        supervisor.loop(lambda kind, username, payload: ...)
+
+    stackFactory is called inside the workers, it must be picklable (a module level function) and return a
+    stack with its credentials set. Sent data and received entities cross processes, so must be picklable too.
+    """
+
+    CMD_ADD = "add"
+    CMD_REMOVE = "remove"
+    CMD_SEND = "send"
+    CMD_BROADCAST = "broadcast"
+    CMD_STOP = "stop"
+
+    MSG_RECEIVE = "receive"
+    MSG_EVENT = "event"
+    MSG_WORKER_STARTED = "worker_started"
+    MSG_WORKER_RESTARTED = "worker_restarted"
+
+    def __init__(self, stackFactory=None, workers=None, context=None, **hostOptions):
+        """
+        :param stackFactory: picklable callable(credentials) -> YowStack, default stack if omitted
+        :param workers: number of worker processes, defaults to the number of cores
+        :param context: multiprocessing context to start workers with
+        :param hostOptions: passed on to every worker's YowStackHost
+        """
+        self.stackFactory = stackFactory or YowStackHost.buildDefaultStack
+        self.context = context or multiprocessing.get_context()
+        self.hostOptions = hostOptions
+        self.pending = collections.deque()
+        self.accounts = {}
+        self.workers = {}
+        self.started = False
+        for workerId in range(0, workers or multiprocessing.cpu_count()):
+            self.workers[workerId] = YowStackWorker(workerId)
+
+    @staticmethod
+    def score(username, workerId):
+        key = ("%s:%s" % (username, workerId)).encode()
+        return hashlib.md5(key).digest()
+
+    def pickWorker(self, username, workerIds=None):
+        """
+        :return: id of the worker the account belongs on
+        """
+        workerIds = self.workers.keys() if workerIds is None else workerIds
+        return max(workerIds, key=lambda workerId: self.score(username, workerId))
+
+    def start(self):
+        self.started = True
+        for worker in self.workers.values():
+            self.startWorker(worker)
+
+    def startWorker(self, worker):
+        if worker.events is not None:
+            worker.events.close()
+        worker.commands = self.context.Queue()
+        worker.events, events = self.context.Pipe(duplex=False)
+        worker.process = self.context.Process(target=serveWorker, name="yowsup-worker-%s" % worker.workerId,
+                                              args=(worker.workerId, worker.commands, events,
+                                                    self.stackFactory, self.hostOptions))
+        worker.process.daemon = True
+        worker.process.start()
+        events.close()
+        for username in worker.usernames:
+            worker.commands.put((self.__class__.CMD_ADD, username, self.accounts[username]))
+
+    def stopWorker(self, worker, timeout=5):
+        if worker.isAlive():
+            worker.commands.put((self.__class__.CMD_STOP,))
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+        if worker.events is not None:
+            worker.events.close()
+            worker.events = None
+
+    def stop(self, timeout=5):
+        for worker in self.workers.values():
+            self.stopWorker(worker, timeout)
+        self.started = False
+
+    def addAccount(self, credentials):
+        username = credentials[0]
+        if username in self.accounts:
+            raise ValueError("Account %s is already hosted" % username)
+        self.accounts[username] = credentials
+        self.assign(username, self.workers[self.pickWorker(username)])
+
+    def removeAccount(self, username):
+        del self.accounts[username]
+        worker = self.getWorker(username)
+        worker.usernames.discard(username)
+        if worker.isAlive():
+            worker.commands.put((self.__class__.CMD_REMOVE, username))
+
+    def assign(self, username, worker):
+        worker.usernames.add(username)
+        if worker.isAlive():
+            worker.commands.put((self.__class__.CMD_ADD, username, self.accounts[username]))
+
+    def getWorker(self, username):
+        for worker in self.workers.values():
+            if username in worker.usernames:
+                return worker
+
+    def addWorker(self):
+        """
+        Starts another worker and moves over the accounts that now hash onto it
+        :return: the new worker's id
+        """
+        workerId = max(self.workers.keys()) + 1 if self.workers else 0
+        worker = YowStackWorker(workerId)
+        self.workers[workerId] = worker
+        if self.started:
+            self.startWorker(worker)
+        self.rebalance()
+        return workerId
+
+    def removeWorker(self, workerId):
+        """
+        Stops a worker, its accounts are moved to the remaining ones
+        """
+        if len(self.workers) == 1:
+            raise ValueError("Can't remove the last worker")
+        worker = self.workers.pop(workerId)
+        self.stopWorker(worker)
+        for username in worker.usernames:
+            self.assign(username, self.workers[self.pickWorker(username)])
+
+    def rebalance(self):
+        for worker in list(self.workers.values()):
+            for username in list(worker.usernames):
+                target = self.workers[self.pickWorker(username)]
+                if target is not worker:
+                    worker.usernames.discard(username)
+                    if worker.isAlive():
+                        worker.commands.put((self.__class__.CMD_REMOVE, username))
+                    self.assign(username, target)
+
+    def checkWorkers(self):
+        """
+        Restarts workers that died, along with their accounts
+        :return: ids of the restarted workers
+        """
+        restarted = []
+        if self.started:
+            for worker in self.workers.values():
+                if not worker.isAlive():
+                    logger.warning("%s exited with %s, restarting" % (worker, worker.process.exitcode))
+                    worker.restarts += 1
+                    self.startWorker(worker)
+                    restarted.append(worker.workerId)
+                    self.pending.append((self.__class__.MSG_WORKER_RESTARTED, None, worker.workerId))
+        return restarted
+
+    def send(self, username, data):
+        self.getWorker(username).commands.put((self.__class__.CMD_SEND, username, data))
+
+    def broadcastEvent(self, username, name, **args):
+        self.getWorker(username).commands.put((self.__class__.CMD_BROADCAST, username, (name, args)))
+
+    def getEvent(self, timeout=None):
+        """
+        :return: (kind, username, payload) or None if nothing arrived within timeout
+        """
+        if not self.pending:
+            readers = dict((worker.events, worker) for worker in self.workers.values() if worker.events is not None)
+            for reader in multiprocessing.connection.wait(list(readers.keys()), timeout):
+                try:
+                    self.pending.append(reader.recv())
+                except EOFError:
+                    # worker is gone, checkWorkers restarts it
+                    reader.close()
+                    readers[reader].events = None
+        return self.pending.popleft() if self.pending else None
+
+    def loop(self, callback, checkInterval=1, timeout=None):
+        """
+        Hands every event to callback(kind, username, payload) and restarts crashed workers,
+        until callback returns True or timeout expires
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        while deadline is None or time.time() < deadline:
+            self.checkWorkers()
+            event = self.getEvent(checkInterval)
+            if event is not None and callback(*event):
+                return True
+        return False
@@ -6,6 +6,10 @@ from .protocoltreenode import ProtocolTreeNode
 
 
 class ProtocolEntity(object):
+    # subclasses that declare __slots__ all the way down get instances without a __dict__. A subclass
+    # retyped with entity.__class__ = ... in fromProtocolTreeNode must keep the layout of the class it is
+    # retyped from: either both keep a __dict__, or the base slots the subclass attributes too
+    __slots__ = ("_tag",)
     __ID_GEN = 0
 
     def __init__(self, tag):
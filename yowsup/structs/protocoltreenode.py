@@ -1,16 +1,28 @@
 import binascii
 import sys
+import types
 
 
 class ProtocolTreeNode(object):
+    # shared by all nodes without attributes / children, read only so they can't be filled by accident.
+    # setAttribute and addChild swap in a node's own dict / list on first write
+    EMPTY_ATTRIBUTES = types.MappingProxyType({})
+    EMPTY_CHILDREN = ()
+
+    __slots__ = ("tag", "attributes", "children", "data")
+
     def __init__(self, tag, attributes=None, children=None, data=None):
 
         self.tag = tag
-        self.attributes = attributes or {}
-        self.children = children or []
+        self.attributes = attributes or ProtocolTreeNode.EMPTY_ATTRIBUTES
+        self.children = children or ProtocolTreeNode.EMPTY_CHILDREN
         self.data = data
 
-        assert type(self.children) is list, "Children must be a list, got %s" % type(self.children)
+        assert children is None or type(children) is list, "Children must be a list, got %s" % type(children)
+
+    def __reduce__(self):
+        # used by copy and pickle, the read only sentinels themselves can't be copied
+        return self.__class__, (self.tag, dict(self.attributes) or None, list(self.children) or None, self.data)
 
     def __eq__(self, protocolTreeNode):
         """
@@ -136,6 +148,8 @@ class ProtocolTreeNode(object):
         return len(self.children) > 0
 
     def addChild(self, childNode):
+        if self.children is ProtocolTreeNode.EMPTY_CHILDREN:
+            self.children = []
         self.children.append(childNode)
 
     def addChildren(self, children):
@@ -153,6 +167,8 @@ class ProtocolTreeNode(object):
             del self.attributes[key]
 
     def setAttribute(self, key, value):
+        if self.attributes is ProtocolTreeNode.EMPTY_ATTRIBUTES:
+            self.attributes = {}
         self.attributes[key] = value
 
     def getAllChildren(self, tag=None):
@@ -0,0 +1,44 @@
+import copy
+import pickle
+import unittest
+
+from yowsup.layers.protocol_acks.protocolentities import IncomingAckProtocolEntity, OutgoingAckProtocolEntity
+from yowsup.layers.protocol_messages.protocolentities import TextMessageProtocolEntity
+from yowsup.layers.protocol_receipts.protocolentities import IncomingReceiptProtocolEntity, \
+    OutgoingReceiptProtocolEntity
+
+
+class ProtocolEntitySlotsTest(unittest.TestCase):
+    def setUp(self):
+        self.entities = [
+            IncomingAckProtocolEntity("1", "message", "31612345678@s.whatsapp.net", "1500000000"),
+            OutgoingAckProtocolEntity("1", "receipt", "read", "31612345678@s.whatsapp.net"),
+            IncomingReceiptProtocolEntity("1", "31612345678@s.whatsapp.net", "1500000000", offline="0"),
+            OutgoingReceiptProtocolEntity("1", "31612345678@s.whatsapp.net", read=True),
+            TextMessageProtocolEntity(text="hi", destination="31612345678@s.whatsapp.net"),
+        ]
+
+    def test_no_dict(self):
+        for entity in self.entities:
+            self.assertFalse(hasattr(entity, "__dict__"), type(entity))
+
+    def test_from_node(self):
+        for entity in self.entities:
+            node = entity.toProtocolTreeNode()
+            if isinstance(entity, TextMessageProtocolEntity):
+                other = TextMessageProtocolEntity(node)
+            else:
+                other = type(entity).fromProtocolTreeNode(node)
+            self.assertIs(type(other), type(entity))
+            self.assertEqual(other.toProtocolTreeNode(), node)
+
+    def test_copy_pickle(self):
+        for entity in self.entities:
+            node = entity.toProtocolTreeNode()
+            for other in (copy.deepcopy(entity), pickle.loads(pickle.dumps(entity))):
+                self.assertIs(type(other), type(entity))
+                self.assertEqual(other.toProtocolTreeNode(), node)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import copy
+import pickle
+import unittest
+
+from yowsup.structs import ProtocolTreeNode
+
+
+class ProtocolTreeNodeTest(unittest.TestCase):
+    def test_empty_sentinels(self):
+        a = ProtocolTreeNode("a")
+        b = ProtocolTreeNode("b", {}, [])
+        self.assertIs(a.attributes, b.attributes)
+        self.assertIs(a.children, ProtocolTreeNode.EMPTY_CHILDREN)
+        with self.assertRaises(TypeError):
+            a.attributes["x"] = "1"
+
+        a["x"] = "1"
+        a.addChild(ProtocolTreeNode("c"))
+        self.assertEqual(a["x"], "1")
+        self.assertEqual(a.getChild(0).tag, "c")
+        self.assertEqual(len(b.attributes), 0)
+        self.assertEqual(len(b.children), 0)
+
+    def test_slots(self):
+        node = ProtocolTreeNode("a")
+        self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_copy_pickle(self):
+        node = ProtocolTreeNode("message", {"id": "1"}, [ProtocolTreeNode("body", data="hi"), ProtocolTreeNode("x")])
+        for other in (copy.copy(node), copy.deepcopy(node), pickle.loads(pickle.dumps(node))):
+            self.assertEqual(node, other)
+        leaf = copy.deepcopy(ProtocolTreeNode("leaf"))
+        self.assertIs(leaf.children, ProtocolTreeNode.EMPTY_CHILDREN)